@@ -3,17 +3,18 @@ Main application file
 """
 import streamlit as st
 from streamlit_option_menu import option_menu
-import pandas as pd
 from datetime import datetime, timedelta
 from utils.db_manager import (
     get_user_by_id, 
     update_user_profile, 
     DatabaseManager,
-    get_db,
+    db_connection,
     verify_user,
     create_user
 )
-import plotly.express as px
+from utils.rate_limiter import set_current_user
+from utils.cache_policy import cached
+from utils.page_registry import NAV_LABELS, NAV_ICONS, LOGIN_PAGE, load_page
 import config
 import os
 import sys
@@ -21,8 +22,9 @@ import sys
 # Add the parent directory to sys.path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+@cached('user_summary', user_arg='user_id')
 def get_user_summary(user_id):
-    """Get summary of user's fitness data"""
+    """Get summary of user's fitness data (cached per user until one of their writes)"""
     try:
         # Get user profile
         user_data = get_user_by_id(user_id)
@@ -30,45 +32,43 @@ def get_user_summary(user_id):
             return None
         
         # Get recent workout logs
-        conn = get_db()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Get workout logs
-        cursor.execute('''
-            SELECT * FROM workout_logs 
-            WHERE user_id = ? 
-            ORDER BY date DESC 
-            LIMIT 5
-        ''', (user_id,))
-        workout_logs = [dict(row) for row in cursor.fetchall()]
+            # Get workout logs
+            cursor.execute('''
+                SELECT * FROM workout_logs 
+                WHERE user_id = ? 
+                ORDER BY date DESC 
+                LIMIT 5
+            ''', (user_id,))
+            workout_logs = [dict(row) for row in cursor.fetchall()]
         
-        # Get nutrition logs
-        cursor.execute('''
-            SELECT * FROM nutrition_logs 
-            WHERE user_id = ? 
-            ORDER BY date DESC 
-            LIMIT 5
-        ''', (user_id,))
-        nutrition_logs = [dict(row) for row in cursor.fetchall()]
+            # Get nutrition logs
+            cursor.execute('''
+                SELECT * FROM nutrition_logs 
+                WHERE user_id = ? 
+                ORDER BY date DESC 
+                LIMIT 5
+            ''', (user_id,))
+            nutrition_logs = [dict(row) for row in cursor.fetchall()]
         
-        # Get progress tracking data
-        cursor.execute('''
-            SELECT * FROM progress_tracking 
-            WHERE user_id = ? 
-            ORDER BY date DESC
-        ''', (user_id,))
-        progress_data = [dict(row) for row in cursor.fetchall()]
+            # Get progress tracking data
+            cursor.execute('''
+                SELECT * FROM progress_tracking 
+                WHERE user_id = ? 
+                ORDER BY date DESC
+            ''', (user_id,))
+            progress_data = [dict(row) for row in cursor.fetchall()]
         
-        # Get current daily goals
-        cursor.execute('''
-            SELECT * FROM daily_goals 
-            WHERE user_id = ? 
-            ORDER BY date_modified DESC 
-            LIMIT 1
-        ''', (user_id,))
-        current_goals = cursor.fetchone()
-        
-        conn.close()
+            # Get current daily goals
+            cursor.execute('''
+                SELECT * FROM daily_goals 
+                WHERE user_id = ? 
+                ORDER BY date_modified DESC 
+                LIMIT 1
+            ''', (user_id,))
+            current_goals = cursor.fetchone()
         
         return {
             'user_data': user_data,
@@ -85,7 +85,11 @@ def create_progress_chart(progress_data):
     """Create a progress tracking chart"""
     if not progress_data:
         return None
-        
+
+    # Charting libraries are only imported when a chart is drawn
+    import pandas as pd
+    import plotly.express as px
+
     df = pd.DataFrame(progress_data)
     df['date'] = pd.to_datetime(df['date'])
     
@@ -115,8 +119,8 @@ def main():
         layout="wide"
     )
 
-    # Clear cache and session state for fresh reload
-    st.cache_data.clear()
+    # Start each browser session with fresh session state; cached datasets stay
+    # warm across reruns and are invalidated by the write APIs (utils/cache_policy.py)
     if not st.session_state.get('app_init'):
         for key in list(st.session_state.keys()):
             del st.session_state[key]
@@ -129,6 +133,9 @@ def main():
     if 'user' not in st.session_state:
         st.session_state.user = None
 
+    # Attribute this run's Gemini calls to the user for fair queuing
+    set_current_user((st.session_state.user or {}).get('id'))
+
     # Initialize session state for fitness goals based on user data if authenticated
     if st.session_state.authenticated and st.session_state.user:
         user = st.session_state.user
@@ -178,31 +185,19 @@ def main():
     # Add URL parameter handling using the new st.query_params
     if 'nav' in st.query_params:
         nav_value = st.query_params['nav']
-        if nav_value in ["Exercise Library", "Workout Planner", "Nutrition Tracker", "AI Coach", "Food Vision"]:
+        if nav_value in NAV_LABELS[1:]:
             st.session_state.nav_selection = nav_value
             # Clear the URL parameter after handling
             st.query_params.clear()
 
-    # Initialize session state for data refresh
-    if 'last_refresh' not in st.session_state:
-        st.session_state.last_refresh = datetime.now()
-    
-    # Add auto-refresh every 30 seconds
-    if (datetime.now() - st.session_state.last_refresh).seconds > 30:
-        st.session_state.last_refresh = datetime.now()
-        st.rerun()
-
-    try:
-        # Import pages
-        from pages.auth import app as auth_app
-        from pages.exercise_library import app as exercise_library_app
-        from pages.workout_planner import app as workout_planner_app
-        from pages.nutrition_tracker import app as nutrition_tracker_app
-        from pages.ai_coach import app as ai_coach_app
-        from pages.food_vision import app as food_vision_app
-    except ImportError as e:
-        st.error(f"Error importing pages: {str(e)}")
-        st.stop()
+    def show_page(label):
+        """Import (on first use) and render one page"""
+        try:
+            page_app = load_page(label)
+        except ImportError as e:
+            st.error(f"Error importing pages: {str(e)}")
+            st.stop()
+        page_app()
 
     # Load external CSS
     def load_css(css_file):
@@ -333,7 +328,7 @@ def main():
 
     # Check authentication
     if not st.session_state.authenticated:
-        auth_app()
+        show_page(LOGIN_PAGE[0])
     else:
         # Initialize session state for navigation
         if 'nav_selection' not in st.session_state:
@@ -422,13 +417,13 @@ def main():
             """, unsafe_allow_html=True)
 
         # Get the current navigation index
-        current_index = ["Home", "Exercise Library", "Workout Planner", "Nutrition Tracker", "AI Coach", "Food Vision"].index(st.session_state.nav_selection)
+        current_index = NAV_LABELS.index(st.session_state.nav_selection)
 
         # Top Navigation
         selected = option_menu(
             menu_title=None,
-            options=["Home", "Exercise Library", "Workout Planner", "Nutrition Tracker", "AI Coach", "Food Vision"],
-            icons=["house", "activity", "calendar-check", "calculator", "robot", "camera"],
+            options=NAV_LABELS,
+            icons=NAV_ICONS,
             menu_icon="cast",
             default_index=current_index,
             orientation="horizontal",
@@ -514,6 +509,23 @@ def main():
                 if st.button("AI Coach", use_container_width=True):
                     navigate_to("AI Coach")
 
+            # Progress Dashboard (served from the per-user data cache)
+            summary = get_user_summary(st.session_state.user['id'])
+            if summary:
+                st.header("Your Progress")
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Recent Workouts", len(summary['workout_logs']))
+                with col2:
+                    st.metric("Recent Food Logs", len(summary['nutrition_logs']))
+                with col3:
+                    goals = summary['current_goals']
+                    st.metric("Daily Calorie Goal", f"{goals['calories']:.0f} kcal" if goals and goals.get('calories') else "Not set")
+
+                progress_chart = create_progress_chart(summary['progress_data'])
+                if progress_chart:
+                    st.plotly_chart(progress_chart, use_container_width=True)
+
             # Motivation Section
             st.markdown("""
                 <div class="motivation-section">
@@ -734,16 +746,9 @@ def main():
                 </style>
             """, unsafe_allow_html=True)
             
-        elif st.session_state.nav_selection == "Exercise Library":
-            exercise_library_app()
-        elif st.session_state.nav_selection == "Workout Planner":
-            workout_planner_app()
-        elif st.session_state.nav_selection == "Nutrition Tracker":
-            nutrition_tracker_app()
-        elif st.session_state.nav_selection == "AI Coach":
-            ai_coach_app()
-        elif st.session_state.nav_selection == "Food Vision":
-            food_vision_app()
+        else:
+            # Only the selected page's module is imported
+            show_page(st.session_state.nav_selection)
 
 if __name__ == "__main__":
     main()
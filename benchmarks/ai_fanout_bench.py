@@ -0,0 +1,100 @@
+"""
+Form tips for a whole workout day: sequential AITrainer calls versus the
+AsyncAITrainer fan-out.
+
+Starts a stub generateContent server on 127.0.0.1 with a fixed response
+latency and fetches generate_form_tips for N exercises, first one after the
+other (the per-exercise "Show Form Tips" buttons) and then through
+form_tips_for_many. Each mode uses its own empty response cache.
+
+Usage: python benchmarks/ai_fanout_bench.py [--exercises 6] [--latency 0.3] [--concurrency 4]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ai_cache import AIResponseCache  # noqa: E402
+from utils.ai_trainer import AITrainer  # noqa: E402
+from utils.async_trainer import AsyncAITrainer  # noqa: E402
+
+TIPS = {
+    'setup': ['Feet shoulder width apart'],
+    'execution': ['Brace before each rep'],
+    'common_mistakes': ['Knees caving in'],
+    'safety_tips': ['Warm up first'],
+    'breathing': 'Inhale down, exhale up',
+    'variations': ['Goblet squat']
+}
+
+
+def make_server(latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency)
+            text = json.dumps(TIPS)
+            data = json.dumps({'candidates': [{'content': {'parts': [{'text': text}]}}]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_trainer(tmp, label, port):
+    cache = AIResponseCache(db_path=os.path.join(tmp, f"{label}.db"))
+    trainer = AITrainer('stub', cache=cache)
+    trainer.base_url = f"http://127.0.0.1:{port}/v1beta/models"
+    return trainer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--exercises', type=int, default=6)
+    parser.add_argument('--latency', type=float, default=0.3, help='stub response time (s)')
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    names = [f"Exercise {i + 1}" for i in range(args.exercises)]
+    server = make_server(args.latency)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        trainer = make_trainer(tmp, 'sequential', server.server_port)
+        started = time.perf_counter()
+        sequential = {name: trainer.generate_form_tips(name) for name in names}
+        rows.append(('sequential', time.perf_counter() - started, sum(map(bool, sequential.values()))))
+
+        trainer = make_trainer(tmp, 'fanout', server.server_port)
+        fanout = AsyncAITrainer(trainer, max_concurrency=args.concurrency)
+        started = time.perf_counter()
+        parallel = fanout.form_tips_for_many_sync(names)
+        rows.append((f"fan-out x{args.concurrency}", time.perf_counter() - started,
+                     sum(map(bool, parallel.values()))))
+    server.shutdown()
+
+    print(f"{args.exercises} exercises, {args.latency * 1000:.0f} ms per call\n")
+    print(f"{'mode':<14} {'seconds':>8} {'tips':>5}")
+    for label, seconds, count in rows:
+        print(f"{label:<14} {seconds:>8.2f} {count:>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+On-device food classifier: CPU load time, latency and batched throughput.
+
+Builds the MobileNetV2 FoodClassifier and times one-off model construction,
+single-photo latency (what the Upload and Take Photo tabs pay) and throughput
+at several batch sizes (what Batch Upload pays per photo). Photos are the
+repository images (static/images/*.jpg) after the upload pipeline's
+downscaling, so preprocessing is included in every timing.
+
+Timings do not depend on the weights, so the default --weights none uses a
+randomly initialised network and runs offline. Pass --weights imagenet (or
+a weights file) to also print the top predictions for the repository photos.
+
+Usage: python benchmarks/food_classifier_bench.py [--weights none] [--alpha 1.0 0.35] [--rounds 20]
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.food_db import FoodDatabase  # noqa: E402
+from utils.food_classifier import FoodClassifier  # noqa: E402
+from utils.image_pipeline import decode  # noqa: E402
+
+
+def photos(count):
+    paths = sorted(glob.glob(os.path.join(ROOT, 'static', 'images', '*.jpg')))
+    images = [decode(open(path, 'rb').read()) for path in paths]
+    return [images[i % len(images)] for i in range(count)], paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--weights', default='none', help="'none', 'imagenet' or a weights file")
+    parser.add_argument('--alpha', type=float, nargs='+', default=[1.0, 0.35])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+    weights = None if args.weights == 'none' else args.weights
+
+    food_db = FoodDatabase(os.path.join(ROOT, 'data', 'food_database.csv'))
+    images, paths = photos(max(args.batch_sizes))
+
+    print(f"{'alpha':>6} {'load s':>7} {'1 photo p50 ms':>15} {'p95 ms':>7}   "
+          + '  '.join(f"{'b=' + str(size) + ' img/s':>11}" for size in args.batch_sizes))
+    for alpha in args.alpha:
+        classifier = FoodClassifier(food_db, weights=weights, alpha=alpha, batch_size=max(args.batch_sizes))
+        started = time.perf_counter()
+        if not classifier.available:
+            print(f"{alpha:>6} model could not be built (see log)")
+            continue
+        load = time.perf_counter() - started
+
+        single = []
+        for round_number in range(args.rounds):
+            started = time.perf_counter()
+            classifier.classify([images[round_number % len(images)]])
+            single.append((time.perf_counter() - started) * 1000)
+        single.sort()
+
+        throughput = []
+        for size in args.batch_sizes:
+            classifier.batch_size = size
+            batch = images[:size]
+            classifier.classify(batch)  # first call at a new shape retraces
+            started = time.perf_counter()
+            for _ in range(max(1, args.rounds // size) + 1):
+                classifier.classify(batch)
+            elapsed = time.perf_counter() - started
+            throughput.append(size * (max(1, args.rounds // size) + 1) / elapsed)
+
+        print(f"{alpha:>6} {load:>7.1f} {statistics.median(single):>15.1f} "
+              f"{single[int(len(single) * 0.95) - 1]:>7.1f}   "
+              + '  '.join(f"{rate:>11.1f}" for rate in throughput))
+
+        if weights is not None:
+            unique = images[:len(paths)]
+            for path, prediction in zip(paths, classifier.classify(unique)):
+                verdict = 'local' if prediction['confident'] else 'Gemini'
+                print(f"    {os.path.basename(path):<28} {prediction['label']:<16} "
+                      f"{prediction['confidence']:.2f} -> {verdict}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Food search latency: pandas str.contains versus the prebuilt FoodSearchIndex.
+
+Builds a synthetic food table, then replays every keystroke prefix of a set of
+typical queries (what the food_search text input sends on each rerun) through
+both the old search_food implementation and the token/prefix index.
+
+Misspelled queries are also replayed through the index in fuzzy mode.
+
+Usage: python benchmarks/food_search_bench.py [--rows 100000] [--limit 10]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.food_search import FoodSearchIndex  # noqa: E402
+
+ADJECTIVES = ['raw', 'boiled', 'fried', 'baked', 'roasted', 'canned', 'fresh', 'frozen',
+              'dried', 'smoked', 'grilled', 'steamed', 'whole', 'skim', 'low-fat', 'sweetened']
+FOODS = ['chicken', 'breast', 'oatmeal', 'rice', 'beans', 'salmon', 'tuna', 'apple', 'banana',
+         'milk', 'cheese', 'yogurt', 'bread', 'potato', 'carrot', 'spinach', 'broccoli', 'beef',
+         'pork', 'egg', 'almond', 'peanut', 'butter', 'pasta', 'tomato', 'orange', 'lentil']
+FORMS = ['slice', 'cup', 'patty', 'fillet', 'soup', 'salad', 'stew', 'pie', 'juice', 'sandwich']
+
+QUERIES = ['chicken breast', 'oatmeal', 'milk', 'peanut butter', 'salmon fillet', 'rice', 'egg']
+TYPOS = ['chiken brest', 'oatmeel', 'peenut buter', 'salmn filet', 'brocoli', 'bananna']
+
+
+def synthetic_names(rows, seed=7):
+    rng = random.Random(seed)
+    return [
+        f"{rng.choice(ADJECTIVES).title()} {rng.choice(FOODS)} {rng.choice(FOODS)} "
+        f"{rng.choice(FORMS)}"
+        for _ in range(rows)
+    ]
+
+
+def contains_search(df, query, limit):
+    """search_food as it was before the index: lowercase the column on every call"""
+    mask = df['Food'].str.lower().str.contains(query.lower(), na=False)
+    return df[mask].head(limit).to_dict('records')
+
+
+def keystrokes(queries=QUERIES):
+    for query in queries:
+        for end in range(1, len(query) + 1):
+            yield query[:end]
+
+
+def timed(fn, queries):
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {
+        'mean_ms': 1000 * sum(samples) / len(samples),
+        'p95_ms': 1000 * samples[int(0.95 * (len(samples) - 1))],
+        'max_ms': 1000 * samples[-1]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    names = synthetic_names(args.rows)
+    df = pd.DataFrame({'Food': names, 'Calories': 100.0})
+    records = df.to_dict('records')
+
+    started = time.perf_counter()
+    index = FoodSearchIndex(names)
+    build_ms = 1000 * (time.perf_counter() - started)
+
+    queries = list(keystrokes())
+    results = {
+        'str.contains': timed(lambda q: contains_search(df, q, args.limit), queries),
+        'index': timed(lambda q: [records[i] for i in index.search(q, args.limit)], queries),
+        'index fuzzy': timed(
+            lambda q: [records[i] for i in index.search(q, args.limit, fuzzy=True)],
+            list(keystrokes(TYPOS))
+        ),
+    }
+
+    print(f"{args.rows} foods, {len(queries)} keystroke queries, index built in {build_ms:.0f} ms\n")
+    print(f"{'search':<14} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for label, stats in results.items():
+        print(f"{label:<14} {stats['mean_ms']:>9.3f} {stats['p95_ms']:>9.3f} {stats['max_ms']:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Cold versus warm FoodDatabase load time.
+
+A cold load parses the CSV with pandas, cleans the numeric columns and writes
+the compiled snapshot; a warm load memory-maps that snapshot. The table can be
+scaled up by repeating the rows of data/food_database.csv.
+
+Usage: python benchmarks/food_snapshot_load.py [--repeat 1] [--runs 5]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.food_db import FoodDatabase  # noqa: E402
+
+SOURCE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'food_database.csv')
+
+
+def make_csv(path, repeat):
+    with open(SOURCE_CSV) as src:
+        header, *rows = src.read().splitlines()
+    with open(path, 'w') as out:
+        out.write(header + '\n')
+        for _ in range(repeat):
+            out.write('\n'.join(rows) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=1, help='copies of the CSV rows to load')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'food_database.csv')
+        snapshot_dir = os.path.join(tmp, 'cache')
+        make_csv(csv_path, args.repeat)
+
+        cold, warm = [], []
+        for _ in range(args.runs):
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            db = FoodDatabase(csv_path, snapshot_dir)
+            assert db.load_stats['source'] == 'csv'
+            cold.append(db.load_stats['seconds'])
+
+            db = FoodDatabase(csv_path, snapshot_dir)
+            assert db.load_stats['source'] == 'snapshot'
+            warm.append(db.load_stats['seconds'])
+
+        rows = db.load_stats['rows']
+
+    print(f"{rows} foods, median of {args.runs} runs\n")
+    print(f"{'load':<10} {'ms':>9}")
+    print(f"{'cold':<10} {1000 * statistics.median(cold):>9.2f}")
+    print(f"{'warm':<10} {1000 * statistics.median(warm):>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
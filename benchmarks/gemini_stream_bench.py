@@ -0,0 +1,121 @@
+"""
+Time to first token: streamGenerateContent (SSE) versus blocking generateContent.
+
+Starts a fake Gemini server on 127.0.0.1 that produces a reply as a number of
+chunks with a fixed delay between them (simulated generation). generateContent
+answers once the whole reply is generated; streamGenerateContent?alt=sse sends
+each chunk as a server-sent event as soon as it is generated. Both are called
+through AITrainer, as the AI Coach chat does.
+
+Usage: python benchmarks/gemini_stream_bench.py [--chunks 20] [--delay 0.05] [--runs 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ai_cache import AIResponseCache  # noqa: E402
+from utils.ai_trainer import AITrainer  # noqa: E402
+
+
+def reply_chunks(count):
+    return [f"**Point {i + 1}** - keep the bar over mid-foot. " for i in range(count)]
+
+
+def make_server(chunks, delay):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if ':streamGenerateContent' in self.path:
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                # Chunked, like the real endpoint: one HTTP chunk per event
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for text in reply_chunks(chunks):
+                    time.sleep(delay)
+                    event = {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}}]}
+                    data = f"data: {json.dumps(event)}\r\n\r\n".encode()
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                time.sleep(delay * chunks)
+                text = ''.join(reply_chunks(chunks))
+                data = json.dumps({'candidates': [{'content': {'parts': [{'text': text}]}}]}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def blocking(trainer):
+    started = time.perf_counter()
+    response = trainer._make_api_request('How do I squat deeper?', 'You are a coach.')
+    text = response['candidates'][0]['content']['parts'][0]['text']
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed, text
+
+
+def streaming(trainer):
+    started = time.perf_counter()
+    first = None
+    parts = []
+    for chunk in trainer.stream_api_request('How do I squat deeper?', 'You are a coach.'):
+        if first is None:
+            first = time.perf_counter() - started
+        parts.append(chunk)
+    return first, time.perf_counter() - started, ''.join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--chunks', type=int, default=20)
+    parser.add_argument('--delay', type=float, default=0.05, help='seconds to generate each chunk')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    server = make_server(args.chunks, args.delay)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = AIResponseCache(db_path=os.path.join(tmp, 'ai_cache.db'))
+        trainer = AITrainer('stub', cache=cache)
+        trainer.base_url = f"http://127.0.0.1:{server.server_port}/v1beta/models"
+
+        results = {}
+        texts = {}
+        for label, call in (('blocking', blocking), ('streaming', streaming)):
+            runs = [call(trainer) for _ in range(args.runs)]
+            results[label] = runs
+            texts[label] = runs[-1][2]
+        trainer.transport.close()
+    server.shutdown()
+
+    assert texts['blocking'] == texts['streaming'], 'streamed text differs from the blocking reply'
+    print(f"{args.chunks} chunks x {args.delay * 1000:.0f} ms, {args.runs} runs\n")
+    print(f"{'mode':<10} {'first text ms':>14} {'complete ms':>12}")
+    for label, runs in results.items():
+        first = statistics.mean(r[0] for r in runs) * 1000
+        total = statistics.mean(r[1] for r in runs) * 1000
+        print(f"{label:<10} {first:>14.1f} {total:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Gemini transport behaviour against a local stub of generateContent.
+
+Starts an HTTP server on 127.0.0.1 that answers like the Gemini REST API and
+can be told to add latency, return 429/503 for a number of calls, or hang.
+Runs these scenarios through GeminiTransport:
+
+  keep-alive   N sequential calls: new TCP connections and mean latency, compared
+               with bare requests.post (one connection per call)
+  retry        the first calls return 429/503; the call succeeds after backoff
+  timeout      the server hangs; the call fails after the read timeout instead
+               of blocking the worker thread
+  breaker      the server keeps failing; after the threshold, calls fail fast
+
+Usage: python benchmarks/gemini_transport_bench.py [--calls 50] [--latency 0.005]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.gemini_transport import GeminiTransport, CircuitBreaker, CircuitOpenError  # noqa: E402
+
+REPLY = {'candidates': [{'content': {'parts': [{'text': 'Keep your back straight.'}]}}]}
+
+
+class StubState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = 0.0
+        self.fail_next = 0          # number of upcoming calls to fail
+        self.fail_status = 503
+        self.hang = 0.0             # seconds to stall before answering
+        self.requests = 0
+        self.connections = set()
+
+    def configure(self, **settings):
+        with self.lock:
+            for name, value in settings.items():
+                setattr(self, name, value)
+            self.requests = 0
+            self.connections = set()
+
+
+def make_server(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'   # keep-alive
+        disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            with state.lock:
+                state.requests += 1
+                state.connections.add(self.client_address)
+                failing = state.fail_next > 0
+                if failing:
+                    state.fail_next -= 1
+            time.sleep(state.hang or state.latency)
+            if failing:
+                status, body = state.fail_status, {'error': {'code': state.fail_status}}
+            else:
+                status, body = 200, REPLY
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            if status == 429:
+                self.send_header('Retry-After', '0.05')
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except OSError:
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def timed(fn):
+    started = time.perf_counter()
+    try:
+        outcome = fn()
+    except requests.exceptions.RequestException as e:
+        outcome = type(e).__name__
+    return outcome, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.005, help='stub server think time (s)')
+    args = parser.parse_args()
+
+    state = StubState()
+    server = make_server(state)
+    url = f"http://127.0.0.1:{server.server_port}/v1beta/models/gemini-2.0-flash:generateContent"
+    payload = {'contents': [{'parts': [{'text': 'Form tips for squats'}]}]}
+    rows = []
+
+    # keep-alive: bare requests.post versus the pooled session
+    state.configure(latency=args.latency)
+    _, elapsed = timed(lambda: [requests.post(url, json=payload).json() for _ in range(args.calls)])
+    rows.append(('requests.post', f"{len(state.connections)} connections",
+                 f"{elapsed / args.calls * 1000:.2f} ms/call"))
+
+    transport = GeminiTransport(backoff_base=0.05, read_timeout=1.0)
+    state.configure(latency=args.latency)
+    _, elapsed = timed(lambda: [transport.post_json(url, payload) for _ in range(args.calls)])
+    rows.append(('keep-alive', f"{len(state.connections)} connections",
+                 f"{elapsed / args.calls * 1000:.2f} ms/call"))
+
+    # retry: 429 then 503 before success
+    state.configure(latency=0, fail_next=1, fail_status=429)
+    outcome, elapsed = timed(lambda: transport.post_json(url, payload))
+    rows.append(('retry 429', 'ok' if isinstance(outcome, dict) else outcome,
+                 f"{state.requests} attempts in {elapsed * 1000:.0f} ms"))
+    state.configure(latency=0, fail_next=2, fail_status=503)
+    outcome, elapsed = timed(lambda: transport.post_json(url, payload))
+    rows.append(('retry 503', 'ok' if isinstance(outcome, dict) else outcome,
+                 f"{state.requests} attempts in {elapsed * 1000:.0f} ms"))
+
+    # timeout: the stub stalls longer than the read timeout
+    hung = GeminiTransport(read_timeout=0.2, max_retries=0)
+    state.configure(hang=2.0)
+    outcome, elapsed = timed(lambda: hung.post_json(url, payload))
+    rows.append(('hung server', outcome, f"gave up after {elapsed * 1000:.0f} ms"))
+    state.configure(hang=0.0)
+
+    # breaker: persistent 503s open the circuit
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.5)
+    failing = GeminiTransport(max_retries=1, backoff_base=0.01, breaker=breaker)
+    state.configure(fail_next=10 ** 6, fail_status=503)
+    outcomes = [timed(lambda: failing.post_json(url, payload)) for _ in range(6)]
+    fast = [elapsed for outcome, elapsed in outcomes if outcome == CircuitOpenError.__name__]
+    rows.append(('breaker', f"{len(fast)}/6 short-circuited",
+                 f"{state.requests} server hits, fast fail {max(fast, default=0) * 1e6:.0f} us"))
+    state.configure(fail_next=0)
+    time.sleep(0.5)
+    outcome, _ = timed(lambda: failing.post_json(url, payload))
+    rows.append(('breaker reset', 'ok' if isinstance(outcome, dict) else outcome, f"state {breaker.state}"))
+
+    server.shutdown()
+    print(f"{args.calls} calls, stub latency {args.latency * 1000:.1f} ms\n")
+    print(f"{'scenario':<14} {'result':<24} {'detail'}")
+    for name, result, detail in rows:
+        print(f"{name:<14} {result:<24} {detail}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Food Vision image preparation: old path versus utils/image_pipeline.
+
+Builds phone-sized JPEGs (default 4032x3024, quality 92, EXIF orientation 6)
+from the repository photos and prepares each for upload:
+
+  old       Image.open + convert + LANCZOS thumbnail, done twice (display and
+            analyze_food_image), then the SDK's lossless WebP encode of the PIL image
+  pipeline  prepare_image: one draft-mode decode, EXIF transpose, thumbnail and
+            a JPEG quality search within VISION_BYTE_BUDGET
+
+Usage: python benchmarks/image_pipeline_bench.py [--width 4032] [--height 3024] [--repeat 5]
+"""
+import argparse
+import glob
+import io
+import os
+import statistics
+import sys
+import time
+
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import VISION_BYTE_BUDGET  # noqa: E402
+from utils.image_pipeline import prepare_image  # noqa: E402
+
+
+def phone_jpeg(path, width, height):
+    """A large JPEG stored sideways with an EXIF 'rotate 90' tag, like a phone camera's"""
+    image = Image.open(path).convert('RGB').resize((width, height), Image.Resampling.BICUBIC)
+    image = image.transpose(Image.Transpose.ROTATE_90)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=92, exif=exif)
+    return buffer.getvalue()
+
+
+def old_process(data):
+    image = Image.open(io.BytesIO(data))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.thumbnail((800, 800), Image.Resampling.LANCZOS)
+    return image
+
+
+def old_path(data):
+    started = time.perf_counter()
+    old_process(data)                      # preview in app()
+    image = old_process(data)              # again inside analyze_food_image
+    decoded = time.perf_counter()
+    buffer = io.BytesIO()
+    image.save(buffer, format='webp', lossless=True)   # what the SDK does with a PIL image
+    return (decoded - started) * 1000, (time.perf_counter() - started) * 1000, buffer.tell(), image.size
+
+
+def new_path(data):
+    started = time.perf_counter()
+    prepared = prepare_image(data)
+    return prepared.decode_ms, (time.perf_counter() - started) * 1000, prepared.bytes_sent, prepared.image.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    photos = sorted(glob.glob(os.path.join(ROOT, 'static', 'images', '*.jpg')))
+    inputs = [phone_jpeg(path, args.width, args.height) for path in photos]
+    print(f"{len(inputs)} photos, {args.width}x{args.height} JPEG, "
+          f"{statistics.mean(map(len, inputs)) / 1024:.0f} KB each; budget {VISION_BYTE_BUDGET / 1024:.0f} KB\n")
+    print(f"{'path':<10} {'decode ms':>10} {'total ms':>9} {'KB sent':>8}  size")
+    for label, run in (('old', old_path), ('pipeline', new_path)):
+        results = [run(data) for _ in range(args.repeat) for data in inputs]
+        decode_ms = statistics.mean(r[0] for r in results)
+        total_ms = statistics.mean(r[1] for r in results)
+        sent_kb = statistics.mean(r[2] for r in results) / 1024
+        width, height = results[0][3]
+        print(f"{label:<10} {decode_ms:>10.1f} {total_ms:>9.1f} {sent_kb:>8.0f}  {width}x{height}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Import-time budget for app start-up and page navigation.
+
+Each scenario runs in a fresh interpreter under python -X importtime, so
+nothing is cached between them:
+
+  app shell   what every script run imports before a page renders (app.py
+              and its direct imports; the login screen adds pages.auth)
+  <page>      app shell plus loading that one page through the page registry,
+              i.e. the cost of the first visit to it in a session's process
+
+Later reruns of an already visited page import nothing new, so these numbers
+are the whole import cost a user can see. For each scenario the script
+prints the total import time (best of --runs) and which heavy libraries got
+loaded (--verbose adds the heaviest root packages), and exits with status 1
+if any scenario is over its budget, so it can guard cold-start regressions.
+
+Usage: python benchmarks/import_budget.py [--runs 3] [--scale 1.0] [--verbose]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ['pandas', 'plotly', 'google.generativeai', 'tensorflow', 'PIL', 'cv2', 'sklearn', 'openai']
+
+# (name, statements, budget in ms)
+SCENARIOS = [
+    ('app shell', 'import app', 900),
+    ('Login', "import app; from utils.page_registry import load_page; load_page('Login')", 1000),
+    ('Exercise Library', "import app; from utils.page_registry import load_page; load_page('Exercise Library')", 1000),
+    ('Workout Planner', "import app; from utils.page_registry import load_page; load_page('Workout Planner')", 1100),
+    ('Nutrition Tracker', "import app; from utils.page_registry import load_page; load_page('Nutrition Tracker')", 1600),
+    ('AI Coach', "import app; from utils.page_registry import load_page; load_page('AI Coach')", 1100),
+    ('Food Vision', "import app; from utils.page_registry import load_page; load_page('Food Vision')", 1200),
+]
+
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def profile(statements):
+    """(total ms, {root package: cumulative ms}, heavy libraries loaded) for one fresh interpreter"""
+    probe = f"{statements}; import sys; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    env = dict(os.environ, GEMINI_API_KEY=os.environ.get('GEMINI_API_KEY', 'import-budget'))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-W', 'ignore', '-c', probe],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    total, packages = 0.0, {}
+    for match in LINE.finditer(proc.stderr):
+        cumulative = int(match.group(2)) / 1000
+        if len(match.group(3)) == 1:
+            # Modules imported by the statements themselves
+            total += cumulative
+        elif '.' not in match.group(4):
+            # A root package appears once, where it is first imported, with its whole subtree
+            packages[match.group(4)] = cumulative
+    loaded = proc.stdout.strip().splitlines()[-1] if proc.stdout.strip() else ''
+    return total, packages, [m for m in loaded.split(',') if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3, help='fresh interpreters per scenario (best is kept)')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply every budget, e.g. for slow CI machines')
+    parser.add_argument('--verbose', action='store_true', help='list the five heaviest packages per scenario')
+    args = parser.parse_args()
+
+    over = []
+    print(f"{'scenario':<18} {'import ms':>10} {'budget':>7}  heavy libraries loaded")
+    for name, statements, budget in SCENARIOS:
+        runs = [profile(statements) for _ in range(args.runs)]
+        total, packages, loaded = min(runs, key=lambda run: run[0])
+        budget *= args.scale
+        flag = '' if total <= budget else '  OVER'
+        if flag:
+            over.append(name)
+        print(f"{name:<18} {total:>10.0f} {budget:>7.0f}  {', '.join(loaded) or '-'}{flag}")
+        if args.verbose:
+            for package, ms in sorted(packages.items(), key=lambda item: -item[1])[:5]:
+                print(f"{'':<20}{package:<28} {ms:>7.0f} ms")
+
+    if over:
+        print(f"\nOver budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Gemini rate limiter under contention: priority classes and per-user fairness.
+
+Simulates sessions sharing one API key without touching the network. One
+"heavy" user bursts background plan generations while several other users
+send interactive chat messages. The request bucket starts empty, so every
+admission has to wait for quota, and each admitted call is charged its token
+estimate and then settled with a "reported" usage.
+
+Prints the admission rate against the RPM budget and per-class and per-user
+waits, plus the limiter's own metrics.
+
+Usage: python benchmarks/rate_limiter_bench.py [--rpm 600] [--heavy 30] [--users 3] [--chats 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.rate_limiter import GeminiRateLimiter, INTERACTIVE, BACKGROUND, estimate_tokens  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rpm', type=int, default=600)
+    parser.add_argument('--tpm', type=int, default=10_000_000)
+    parser.add_argument('--heavy', type=int, default=30, help='background requests from the heavy user')
+    parser.add_argument('--users', type=int, default=3, help='interactive users')
+    parser.add_argument('--chats', type=int, default=5, help='chat messages per interactive user')
+    args = parser.parse_args()
+
+    limiter = GeminiRateLimiter(rpm=args.rpm, tpm=args.tpm, queue_timeouts={})
+    now = time.monotonic()
+    limiter.requests.take(limiter.requests.capacity, now)
+
+    admissions = []
+    lock = threading.Lock()
+
+    def call(user, priority, prompt):
+        started = time.monotonic()
+        ticket = limiter.acquire(estimate_tokens(prompt), priority, user=user)
+        with lock:
+            admissions.append((ticket.admitted, user, priority, ticket.admitted - started))
+        limiter.settle(ticket, len(prompt) // 4 + 200)
+
+    threads = [threading.Thread(target=call, args=('heavy', BACKGROUND, 'Create a 12-week program ' * 40))
+               for _ in range(args.heavy)]
+    for u in range(args.users):
+        threads += [threading.Thread(target=call, args=(f"user{u + 1}", INTERACTIVE, 'How deep should I squat?'))
+                    for _ in range(args.chats)]
+
+    started = time.monotonic()
+    # Background burst first, chats arrive just after it
+    for thread in threads[:args.heavy]:
+        thread.start()
+    time.sleep(0.05)
+    for thread in threads[args.heavy:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    admissions.sort()
+    total = len(admissions)
+    print(f"{total} requests, budget {args.rpm} RPM ({args.rpm / 60:.1f}/s), bucket drained\n")
+    print(f"admitted {total / elapsed:.2f} req/s over {elapsed:.2f}s\n")
+    print(f"{'who':<10} {'class':<12} {'n':>3} {'mean wait s':>12} {'max wait s':>11}")
+    groups = {}
+    for _, user, priority, waited in admissions:
+        groups.setdefault((user, priority), []).append(waited)
+    for (user, priority), waits in sorted(groups.items(), key=lambda item: statistics.mean(item[1])):
+        print(f"{user:<10} {priority:<12} {len(waits):>3} {statistics.mean(waits):>12.2f} {max(waits):>11.2f}")
+
+    order = ' '.join(user[-1] if user != 'heavy' else 'H' for _, user, _, _ in admissions)
+    print(f"\nadmission order: {order}")
+    stats = limiter.get_stats()
+    print(f"\nlimiter: admitted={stats['admitted']} max_queue_depth={stats['max_queue_depth']} "
+          f"interactive p95={stats[INTERACTIVE + '_wait_p95']:.2f}s "
+          f"background p95={stats[BACKGROUND + '_wait_p95']:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Per-session memory and file-handle overhead of the page service objects.
+
+Simulates N Streamlit sessions opening the nutrition tracker, workout planner
+and AI coach. "per-session" constructs FoodDatabase, DatabaseManager,
+WorkoutDatabase and AITrainer for every session, as the pages used to do via
+st.session_state; "shared" takes them from utils.resources.registry.
+
+Runs in a scratch directory with a copy of data/food_database.csv.
+
+Usage: python benchmarks/session_memory.py [--sessions 50]
+"""
+import argparse
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.food_db import FoodDatabase  # noqa: E402
+from utils.db_manager import DatabaseManager  # noqa: E402
+from utils.workout_db import WorkoutDatabase  # noqa: E402
+from utils.ai_trainer import AITrainer  # noqa: E402
+from utils.resources import registry, get_food_db, get_db_manager, get_workout_db, get_ai_trainer  # noqa: E402
+
+API_KEY = 'benchmark-key'
+
+
+def per_session():
+    return {
+        'food_db': FoodDatabase(),
+        'db_manager': DatabaseManager(),
+        'workout_db': WorkoutDatabase(),
+        'ai_trainer': AITrainer(API_KEY)
+    }
+
+
+def shared():
+    return {
+        'food_db': get_food_db(),
+        'db_manager': get_db_manager(),
+        'workout_db': get_workout_db(),
+        'ai_trainer': get_ai_trainer(API_KEY)
+    }
+
+
+def open_files():
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+def measure(make_session, sessions):
+    gc.collect()
+    files_before = open_files()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    states = [make_session() for _ in range(sessions)]
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    files_after = open_files()
+    handles = None if files_before is None else files_after - files_before
+
+    for state in states:
+        workout_db = state['workout_db']
+        if workout_db is not registry.get('workout_db'):
+            workout_db.close()
+    return used, handles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=50)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, 'data'))
+        shutil.copy(os.path.join(ROOT, 'data', 'food_database.csv'), os.path.join(tmp, 'data'))
+        os.chdir(tmp)
+        try:
+            # Create the database files and food snapshot outside the measurements
+            per_session()['workout_db'].close()
+            results = {
+                'per-session': measure(per_session, args.sessions),
+                'shared': measure(shared, args.sessions),
+            }
+            registry.shutdown()
+        finally:
+            os.chdir(cwd)
+
+    print(f"{args.sessions} simulated sessions\n")
+    print(f"{'objects':<12} {'total KiB':>10} {'KiB/session':>12} {'open files':>11}")
+    for label, (used, handles) in results.items():
+        handles = 'n/a' if handles is None else handles
+        print(f"{label:<12} {used / 1024:>10.0f} {used / 1024 / args.sessions:>12.1f} {handles:>11}")
+
+
+if __name__ == '__main__':
+    main()
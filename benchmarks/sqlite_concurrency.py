@@ -0,0 +1,115 @@
+"""
+Concurrent read/write throughput for the SQLite storage settings.
+
+Runs the same mixed workload (writer threads inserting nutrition log rows,
+reader threads running the daily summary query) against a scratch database
+twice: once with the old connection settings (rollback journal, no busy
+timeout) and once with the WAL/PRAGMA settings from config.SQLITE_SETTINGS.
+
+Usage: python benchmarks/sqlite_concurrency.py [--seconds 5] [--writers 4] [--readers 8]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db_storage import connect, stop_checkpointer  # noqa: E402
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS nutrition_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    date TEXT,
+    food_name TEXT,
+    calories REAL
+)
+'''
+
+
+def legacy_connect(db_path):
+    """Connection settings used before the storage layer existed"""
+    conn = sqlite3.connect(db_path, timeout=0, check_same_thread=False)
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def run_workload(open_connection, db_path, seconds, writers, readers):
+    setup = open_connection(db_path)
+    setup.execute(SCHEMA)
+    setup.commit()
+    setup.close()
+
+    counts = {'writes': 0, 'reads': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def writer(user_id):
+        conn = open_connection(db_path)
+        done = errors = 0
+        while time.monotonic() < deadline:
+            try:
+                conn.execute(
+                    "INSERT INTO nutrition_logs (user_id, date, food_name, calories) VALUES (?, date('now'), ?, ?)",
+                    (user_id, 'Oatmeal', 150.0)
+                )
+                conn.commit()
+                done += 1
+            except sqlite3.OperationalError:
+                conn.rollback()
+                errors += 1
+        conn.close()
+        with lock:
+            counts['writes'] += done
+            counts['errors'] += errors
+
+    def reader(user_id):
+        conn = open_connection(db_path)
+        done = errors = 0
+        while time.monotonic() < deadline:
+            try:
+                conn.execute(
+                    "SELECT SUM(calories) FROM nutrition_logs WHERE user_id = ? AND date = date('now')",
+                    (user_id,)
+                ).fetchone()
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        conn.close()
+        with lock:
+            counts['reads'] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers / {args.readers} readers for {args.seconds:.0f}s each\n")
+    print(f"{'settings':<10} {'writes/s':>10} {'reads/s':>10} {'lock errors':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, opener in (('legacy', legacy_connect), ('tuned', connect)):
+            db_path = os.path.join(tmp, f'{label}.db')
+            counts = run_workload(opener, db_path, args.seconds, args.writers, args.readers)
+            stop_checkpointer(db_path)
+            print(f"{label:<10} {counts['writes'] / args.seconds:>10.0f} "
+                  f"{counts['reads'] / args.seconds:>10.0f} {counts['errors']:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Perceptual-hash cache for Food Vision: match quality and lookup latency.
+
+Analyses are stored for the repository photos (static/images/*.jpg). The
+script then looks up edited copies of them: a JPEG re-encode, a re-upload at
+another size, a brightness change and a small crop should hit; a mirrored
+copy and a zoomed-in corner are different pictures and should miss. It prints each copy's dHash distance and whether it hit the cache.
+The cache is then filled with random hashes to time lookups at full size.
+
+Runs against a temporary database.
+
+Usage: python benchmarks/vision_cache_bench.py [--entries 2000] [--lookups 2000]
+"""
+import argparse
+import glob
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageEnhance, ImageOps
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.image_cache import ImageAnalysisCache, dhash, hamming, prompt_key  # noqa: E402
+
+
+def downscale(image):
+    """What process_image does before hashing"""
+    image = image.convert('RGB')
+    image.thumbnail((800, 800), Image.Resampling.LANCZOS)
+    return image
+
+
+def reencode(image, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return Image.open(io.BytesIO(buffer.getvalue()))
+
+
+def variants(image):
+    width, height = image.size
+    return {
+        'identical': image,
+        'jpeg q60': reencode(image, 60),
+        'resized 60%': image.resize((int(width * 0.6), int(height * 0.6))),
+        'brighter +15%': ImageEnhance.Brightness(image).enhance(1.15),
+        'crop 3%': image.crop((int(width * 0.03), int(height * 0.03), width, height)),
+        # Different pictures, which must miss
+        'mirrored': ImageOps.mirror(image),
+        'zoomed corner': image.crop((width // 2, height // 2, width, height)).resize((width, height)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entries', type=int, default=2000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    photos = sorted(glob.glob(os.path.join(ROOT, 'static', 'images', '*.jpg')))
+    originals = {os.path.basename(path): downscale(Image.open(path)) for path in photos}
+    key = prompt_key('gemini-1.5-flash', 'Analyze this food image')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ImageAnalysisCache(db_path=os.path.join(tmp, 'vision_cache.db'), max_entries=args.entries + 10)
+        for name, image in originals.items():
+            cache.store(dhash(image), key, f"analysis of {name}")
+
+        print(f"match threshold: {cache.max_distance} of 64 bits\n")
+        print(f"{'photo':<20} {'variant':<14} {'distance':>8}  result")
+        for name, image in originals.items():
+            for label, variant in variants(image).items():
+                variant_hash = dhash(downscale(variant))
+                response, distance = cache.lookup(variant_hash, key)
+                nearest = min(hamming(variant_hash, dhash(original)) for original in originals.values())
+                if response is None:
+                    result = 'miss'
+                else:
+                    result = 'hit' if response == f"analysis of {name}" else 'WRONG HIT'
+                print(f"{name:<20} {label:<14} {nearest if response is None else distance:>8}  {result}")
+
+        rng = random.Random(3)
+        for i in range(args.entries):
+            cache.store(rng.getrandbits(64), key, f"analysis {i}")
+        probes = [rng.getrandbits(64) for _ in range(args.lookups)]
+        started = time.perf_counter()
+        for probe in probes:
+            cache.lookup(probe, key)
+        miss_us = (time.perf_counter() - started) / args.lookups * 1e6
+
+        target = dhash(next(iter(originals.values())))
+        started = time.perf_counter()
+        for _ in range(args.lookups):
+            cache.lookup(target ^ 0b101, key)
+        hit_us = (time.perf_counter() - started) / args.lookups * 1e6
+
+        started = time.perf_counter()
+        for image in list(originals.values()) * 50:
+            dhash(image)
+        hash_us = (time.perf_counter() - started) / (len(originals) * 50) * 1e6
+
+    print(f"\n{args.entries + len(originals)} cached analyses")
+    print(f"dhash of an 800px image  {hash_us:8.0f} us")
+    print(f"lookup, near hit         {hit_us:8.0f} us")
+    print(f"lookup, miss             {miss_us:8.0f} us")
+
+
+if __name__ == '__main__':
+    main()
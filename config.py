@@ -11,6 +11,112 @@ GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 GEMINI_MODEL = "gemini-1.5-flash"
 GEMINI_VISION_MODEL = "gemini-1.5-flash"
 
+# Database connection pool
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))  # seconds to wait for a free connection
+DB_POOL_HEALTH_CHECK_INTERVAL = 60  # seconds idle before a connection is re-validated
+
+# SQLite storage settings shared by fitness_app.db and fitness_data.db
+SQLITE_SETTINGS = {
+    "journal_mode": os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    "synchronous": os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),  # OFF, NORMAL, FULL or EXTRA
+    "cache_size_kb": 16384,          # page cache per connection
+    "mmap_size": 64 * 1024 * 1024,   # bytes of the database file to memory-map
+    "busy_timeout_ms": 5000,         # how long SQLite waits on a lock before failing
+    "retry_attempts": 5,             # retries for "database is locked" after the busy timeout
+    "retry_base_delay": 0.05,        # seconds, doubled on each retry (with jitter)
+    "retry_max_delay": 1.0,
+    "checkpoint_interval": 300       # seconds between background WAL checkpoints (0 disables)
+}
+
+# Write-behind buffer for logged exercise sets
+EXERCISE_LOG_BUFFER_ROWS = 50      # flush once this many sets are buffered
+EXERCISE_LOG_BUFFER_SECONDS = 5.0  # or once the oldest buffered set is this old
+
+# Fuzzy food search (misspelled queries such as "chiken brest")
+FOOD_SEARCH_FUZZY_THRESHOLD = 0.3   # minimum trigram similarity for a candidate word
+FOOD_SEARCH_FUZZY_MAX_EDITS = None  # None allows one edit per four characters (at least one)
+
+# Compiled, memory-mapped copy of data/food_database.csv (rebuilt when the CSV changes)
+FOOD_SNAPSHOT_DIR = os.getenv('FOOD_SNAPSHOT_DIR', 'data/.food_cache')
+
+# In-process cache of read-mostly datasets, invalidated by their write APIs (utils/cache_policy.py)
+# "user" scope keys entries by user id; "global" data is shared by everyone
+DATA_CACHE_POLICIES = {
+    "user_summary": {"ttl": 300, "scope": "user"},
+    "workout_stats": {"ttl": 600, "scope": "global"},      # rollups over all workout logs
+    "food_categories": {"ttl": 24 * 3600, "scope": "global"},
+    "exercise_library": {"ttl": 3600, "scope": "global"},
+}
+DATA_CACHE_MAX_ENTRIES = 2000   # least recently used entries beyond this are evicted
+
+# Persistent cache of Gemini responses (utils/ai_cache.py)
+AI_CACHE_PATH = os.getenv('AI_CACHE_PATH', 'ai_cache.db')
+AI_CACHE_MAX_ENTRIES = 5000     # least recently used entries beyond this are evicted
+AI_CACHE_MEMORY_ENTRIES = 256   # in-process LRU in front of the SQLite table
+# Per-method opt-in; methods not listed (or with enabled False) always call the API
+AI_CACHE_POLICIES = {
+    "generate_form_tips": {"enabled": True, "ttl": 30 * 24 * 3600},
+    "generate_workout_program": {"enabled": True, "ttl": 24 * 3600},
+    "generate_nutrition_plan": {"enabled": True, "ttl": 24 * 3600},
+    "analyze_workout_performance": {"enabled": True, "ttl": 3600},
+    "suggest_workout_modifications": {"enabled": True, "ttl": 3600},
+    "analyze_nutrition_log": {"enabled": True, "ttl": 3600},
+    "chat": {"enabled": False}
+}
+
+# HTTP transport for the Gemini REST API (utils/gemini_transport.py)
+GEMINI_CONNECT_TIMEOUT = float(os.getenv('GEMINI_CONNECT_TIMEOUT', 5))   # seconds to open a connection
+GEMINI_READ_TIMEOUT = float(os.getenv('GEMINI_READ_TIMEOUT', 60))        # seconds between response bytes
+GEMINI_POOL_SIZE = 10            # keep-alive connections per host
+GEMINI_MAX_RETRIES = 3           # retries after the first attempt on 429/5xx and connection errors
+GEMINI_BACKOFF_BASE = 0.5        # seconds; retry n sleeps uniform(0, min(max, base * 2**n))
+GEMINI_BACKOFF_MAX = 8.0
+GEMINI_BREAKER_FAILURES = 5      # consecutive failed calls before the circuit opens
+GEMINI_BREAKER_RESET = 30.0      # seconds the circuit stays open before a trial call
+AI_MAX_CONCURRENCY = 4           # parallel Gemini calls per AsyncAITrainer batch
+
+# Process-wide Gemini quota shared by all sessions (utils/rate_limiter.py)
+GEMINI_RPM = int(os.getenv('GEMINI_RPM', 15))          # requests per minute for the API key
+GEMINI_TPM = int(os.getenv('GEMINI_TPM', 1000000))     # input + output tokens per minute
+GEMINI_OUTPUT_TOKEN_ESTIMATE = 512   # tokens charged up front for a reply, corrected from usageMetadata
+GEMINI_IMAGE_TOKENS = 258            # tokens Gemini bills per image
+# Longest a request may wait for quota before giving up, per priority class
+GEMINI_QUEUE_TIMEOUTS = {
+    "interactive": 30,
+    "background": 120
+}
+# AITrainer methods that yield to interactive calls (everything else is interactive)
+GEMINI_BACKGROUND_METHODS = ('generate_workout_program', 'generate_nutrition_plan')
+
+# Background jobs for slow AI generation (utils/job_queue.py)
+JOB_DB_PATH = os.getenv('JOB_DB_PATH', 'jobs.db')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))   # worker threads per server process
+JOB_MAX_ATTEMPTS = 3          # tries before a job is marked failed
+JOB_RETRY_DELAY = 5.0         # seconds before the first retry, doubled after each failure
+JOB_POLL_INTERVAL = 1.0       # seconds an idle worker sleeps between queue checks
+JOB_LEASE_SECONDS = 120.0     # running jobs without a heartbeat this long are requeued
+
+# Food Vision analyses reused for near-duplicate photos (utils/image_cache.py)
+VISION_CACHE_PATH = os.getenv('VISION_CACHE_PATH', 'vision_cache.db')
+VISION_CACHE_MAX_DISTANCE = 5     # dHash bits (of 64) two photos may differ by and still match; at most 7
+VISION_CACHE_MAX_ENTRIES = 2000   # least recently used analyses beyond this are evicted
+
+# Image preprocessing before upload to the vision model (utils/image_pipeline.py)
+VISION_MAX_SIZE = 800              # longest side in pixels
+VISION_BYTE_BUDGET = 150 * 1024    # largest JPEG sent per image
+VISION_MIN_QUALITY = 50            # quality search range; below the minimum the image is shrunk instead
+VISION_MAX_QUALITY = 90
+VISION_BATCH_CONCURRENCY = 4       # photos prepared and analyzed at once in Food Vision batch mode
+
+# On-device food classifier tried before Gemini Vision (utils/food_classifier.py)
+FOOD_CLASSIFIER_ENABLED = os.getenv('FOOD_CLASSIFIER_ENABLED', 'true').lower() == 'true'
+FOOD_CLASSIFIER_WEIGHTS = os.getenv('FOOD_CLASSIFIER_WEIGHTS', 'imagenet')  # 'imagenet' downloads once to ~/.keras; or a local weights file
+FOOD_CLASSIFIER_ALPHA = 1.0               # MobileNetV2 width multiplier (0.35 is ~4x cheaper, less accurate)
+FOOD_CLASSIFIER_MIN_CONFIDENCE = 0.6      # below this probability the photo goes to Gemini Vision instead
+FOOD_CLASSIFIER_TOP_K = 5                 # alternatives reported per photo
+FOOD_CLASSIFIER_BATCH_SIZE = 16           # photos per forward pass
+
 # Model configuration
 EXERCISE_DATA = {
     "Chest": {
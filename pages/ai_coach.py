@@ -3,8 +3,8 @@ AI Coach Module
 Provides AI-powered fitness coaching and guidance
 """
 import streamlit as st
-from utils.ai_trainer import AITrainer
-from utils.workout_db import WorkoutDatabase
+from utils.resources import get_workout_db, get_ai_trainer, get_job_queue
+from utils.ai_jobs import WORKOUT_PROGRAM
 import json
 import os
 from datetime import datetime
@@ -194,19 +194,35 @@ def get_quick_assist_response(topic):
     }
     return responses.get(topic, "Topic not found.")
 
+@st.fragment(run_every=2)
+def plan_job_status():
+    """Poll the queued workout plan and post it to the chat once it is ready"""
+    job_id = st.session_state.get('plan_job')
+    if job_id is None:
+        return
+    job = get_job_queue().get(job_id)
+    if job is None or job['status'] in ('queued', 'running'):
+        st.info("Creating your workout plan in the background...")
+        return
+    del st.session_state['plan_job']
+    if job['status'] == 'done':
+        content = format_workout_plan(job['result']['program'])
+    else:
+        content = "Error generating a workout plan. Try again."
+    st.session_state.chat_history.append({"role": "assistant", "content": content})
+    st.rerun()
+
 def app():
     st.title("AI Fitness Coach")
     
-    # Initialize database and AI trainer
-    if 'workout_db' not in st.session_state:
-        st.session_state.workout_db = WorkoutDatabase()
+    # Shared process-wide database and AI trainer (see utils.resources)
+    st.session_state.workout_db = get_workout_db()
     
-    if 'ai_trainer' not in st.session_state:
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            st.error("Please set the GEMINI_API_KEY environment variable to use AI features.")
-            return
-        st.session_state.ai_trainer = AITrainer(api_key)
+    ai_trainer = get_ai_trainer(os.getenv('GEMINI_API_KEY'))
+    if ai_trainer is None:
+        st.error("Please set the GEMINI_API_KEY environment variable to use AI features.")
+        return
+    st.session_state.ai_trainer = ai_trainer
     
     # Initialize chat history in session state if not exists
     if "chat_history" not in st.session_state:
@@ -330,19 +346,17 @@ def app():
             • **Point 4** - Specific detail with additional information
             """
             
-            # Generate AI response
-            response = st.session_state.ai_trainer._make_api_request(prompt, context)
-            if response and 'candidates' in response:
-                ai_response = response['candidates'][0]['content']['parts'][0]['text']
-            else:
-                ai_response = "Error generating response. Try again."
+            # Stream the AI response, rendering chunks as they arrive
+            with st.chat_message("assistant"):
+                ai_response = st.write_stream(
+                    st.session_state.ai_trainer.stream_api_request(prompt, context)
+                )
+                if not ai_response:
+                    ai_response = "Error generating response. Try again."
+                    st.markdown(ai_response)
             
             # Add AI response to chat history
             st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
-            
-            # Display AI response
-            with st.chat_message("assistant"):
-                st.markdown(ai_response)
         
         except Exception as e:
             st.error(f"Error: {str(e)}")
@@ -352,24 +366,21 @@ def app():
     col1, col2 = st.columns(2)
     
     with col1:
-        if st.button("Get Workout Plan"):
-            with st.spinner("Creating your workout plan..."):
-                user_input = {
-                    'goal': 'General Fitness',
-                    'fitness_level': 'Beginner',
-                    'days_per_week': 3,
-                    'time_per_session': 45,
-                    'duration_weeks': 4,
-                    'equipment': ['Bodyweight', 'Dumbbells']
-                }
-                program = st.session_state.ai_trainer.generate_workout_program(user_input)
-                if program:
-                    formatted_plan = format_workout_plan(program)
-                    st.session_state.chat_history.append({
-                        "role": "assistant",
-                        "content": formatted_plan
-                    })
-                    st.rerun()
+        if st.button("Get Workout Plan", disabled='plan_job' in st.session_state):
+            user_input = {
+                'goal': 'General Fitness',
+                'fitness_level': 'Beginner',
+                'days_per_week': 3,
+                'time_per_session': 45,
+                'duration_weeks': 4,
+                'equipment': ['Bodyweight', 'Dumbbells']
+            }
+            st.session_state.plan_job = get_job_queue().enqueue(
+                WORKOUT_PROGRAM,
+                {'user_input': user_input},
+                user_id=(st.session_state.get('user') or {}).get('id')
+            )
+        plan_job_status()
     
     with col2:
         if st.button("Clear Chat History"):
@@ -1,8 +1,8 @@
 import streamlit as st
+from utils.resources import get_db_manager
 from utils.db_manager import (
     create_user,
     verify_user,
-    DatabaseManager,
     reset_database,
     get_user_by_username
 )
@@ -26,7 +26,7 @@ def app():
         st.session_state.user = None
     
     # Initialize database
-    db_manager = DatabaseManager()
+    db_manager = get_db_manager()
     
     # Custom CSS
     st.markdown("""
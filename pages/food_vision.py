@@ -1,115 +1,219 @@
 import streamlit as st
-import google.generativeai as genai
 from PIL import Image
 import os
 from dotenv import load_dotenv
-import io
 import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import VISION_BATCH_CONCURRENCY
+from utils.image_pipeline import prepare_image, PreparedImage
+from utils.meal_schema import MEAL_TYPES, SchemaError
+from utils.nutrition_helper import analyze_meal, match_foods, meal_totals, meal_log_entries
+from utils.food_classifier import local_analysis
+from utils.resources import get_food_db, get_db_manager, get_food_classifier
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API
+# Gemini needs an API key (the SDK itself is configured on first use)
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 if not GEMINI_API_KEY:
     st.error("Please set your GEMINI_API_KEY in the .env file")
     st.stop()
 
-genai.configure(api_key=GEMINI_API_KEY)
-
 def process_image(image_data):
     """Process image data from either file upload or camera input"""
     try:
-        if isinstance(image_data, bytes):
-            # Convert bytes to PIL Image
-            image = Image.open(io.BytesIO(image_data))
-        elif isinstance(image_data, Image.Image):
-            # Already a PIL Image
-            image = image_data
-        else:
+        if not isinstance(image_data, (bytes, Image.Image)):
             raise ValueError("Unsupported image data type")
-        
-        # Convert to RGB if necessary (some images might be in RGBA or other modes)
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Resize if too large
-        max_size = (800, 800)
-        if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        return image
+        # Decode (JPEG draft mode), orient, downscale to 800px and encode within the byte budget
+        return prepare_image(image_data)
     except Exception as e:
         st.error(f"Error processing image: {str(e)}")
         return None
 
+def prepared_upload(uploaded, key):
+    """PreparedImage for an uploaded file, reused across reruns until a different file arrives"""
+    cached = st.session_state.setdefault('prepared_images', {}).get(key)
+    if cached and cached[0] == uploaded.file_id:
+        return cached[1]
+    prepared = process_image(uploaded.getvalue())
+    if prepared is not None:
+        st.session_state.prepared_images[key] = (uploaded.file_id, prepared)
+    return prepared
+
+def run_analysis(prepared, on_retry=None, use_local=True):
+    """
+    Structured analysis of a PreparedImage: the validated meal, its items mapped
+    onto the food database, and the cache distance (None when freshly analyzed).
+    A confident on-device classification answers without calling Gemini.
+    Makes no Streamlit calls, so batch worker threads can use it; raises on failure.
+    """
+    if use_local:
+        prediction = get_food_classifier().classify([prepared.image])[0]
+        if prediction and prediction['confident']:
+            return local_analysis(prediction)
+    meal, distance = analyze_meal(prepared, on_retry=on_retry)
+    return {'meal': meal, 'items': match_foods(meal, get_food_db()), 'distance': distance}
+
+def describe_error(e):
+    """User-facing message for an analysis failure"""
+    error_msg = str(e)
+    if isinstance(e, SchemaError):
+        return "The model returned an unexpected format. Please try again."
+    if "API key" in error_msg:
+        return "Invalid or missing API key. Please check your GEMINI_API_KEY in the .env file."
+    elif "quota" in error_msg.lower():
+        return "API quota exceeded. Please try again later."
+    elif "timeout" in error_msg.lower():
+        return "Request timed out. Please try again."
+    return f"Error analyzing image: {error_msg}"
+
 def analyze_food_image(image):
     """Analyze food image using Gemini 1.5 Flash"""
     try:
-        # Process the image first
-        processed_image = process_image(image)
+        # Process the image first, unless the caller already did
+        processed_image = image if isinstance(image, PreparedImage) else process_image(image)
         if processed_image is None:
             return None
         
-        # Initialize Gemini 1.5 Flash model
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Prepare the prompt
-        prompt = """Analyze this food image and provide the following information in a structured format:
-        1. Name of the food
-        2. Estimated calories per serving
-        3. Macronutrients (in grams):
-           - Carbohydrates
-           - Proteins
-           - Fats
-        4. Key micronutrients
-        5. Health benefits
-        Please be as accurate as possible with the nutritional information."""
-        
-        # Set up generation config with supported parameters
-        generation_config = {
-            "temperature": 0.4,  # Lower temperature for more focused responses
-            "top_p": 0.8,       # Nucleus sampling parameter
-            "top_k": 40,        # Top-k sampling parameter
-            "max_output_tokens": 1024,  # Maximum length of the response
-        }
-        
-        # Generate response with retry logic
-        max_retries = 3
-        retry_delay = 2  # seconds
-        
-        for attempt in range(max_retries):
-            try:
-                response = model.generate_content(
-                    [prompt, processed_image],
-                    generation_config=generation_config
-                )
-                
-                if response and response.text:
-                    return response.text
-                else:
-                    raise ValueError("Empty response from model")
-                    
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    st.warning(f"Attempt {attempt + 1} failed, retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                    continue
-                else:
-                    raise e
+        return run_analysis(
+            processed_image,
+            on_retry=lambda attempt, e: st.warning(f"Attempt {attempt} failed, retrying...")
+        )
                 
     except Exception as e:
-        error_msg = str(e)
-        if "API key" in error_msg:
-            st.error("Invalid or missing API key. Please check your GEMINI_API_KEY in the .env file.")
-        elif "quota" in error_msg.lower():
-            st.error("API quota exceeded. Please try again later.")
-        elif "timeout" in error_msg.lower():
-            st.error("Request timed out. Please try again.")
-        else:
-            st.error(f"Error analyzing image: {error_msg}")
+        st.error(describe_error(e))
         return None
 
+def show_analysis(analysis, key):
+    """Render a structured analysis with a button that logs it to the nutrition tracker"""
+    meal, items = analysis['meal'], analysis['items']
+    if analysis.get('local'):
+        st.caption("Recognized on-device, no API call needed")
+    if analysis['distance'] is not None:
+        st.caption("Matched an earlier analysis of this photo" + (" (near-duplicate)" if analysis['distance'] else ""))
+    if not items:
+        st.info("No food recognized in this photo.")
+        return
+    st.dataframe(
+        [{
+            'Food': item['food_name'],
+            'Grams': round(item['grams']),
+            'Calories': round(item['calories']),
+            'Protein (g)': round(item['protein'], 1),
+            'Carbs (g)': round(item['carbs'], 1),
+            'Fat (g)': round(item['fat'], 1),
+            'Source': 'Food database' if item['source'] == 'database' else 'Model estimate'
+        } for item in items],
+        hide_index=True, use_container_width=True
+    )
+    totals = meal_totals(items)
+    cols = st.columns(4)
+    cols[0].metric("Calories", f"{totals['calories']:.0f}")
+    cols[1].metric("Protein", f"{totals['protein']:.1f}g")
+    cols[2].metric("Carbs", f"{totals['carbs']:.1f}g")
+    cols[3].metric("Fat", f"{totals['fat']:.1f}g")
+    if meal.get('notes'):
+        st.write(meal['notes'])
+    st.caption(f"Confidence: {meal['confidence']:.0%}")
+
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        default = meal.get('meal_type', 'Snack')
+        meal_type = st.selectbox("Meal", MEAL_TYPES, index=MEAL_TYPES.index(default), key=f"meal_type_{key}")
+    with col2:
+        if st.button("Log this meal", key=f"log_{key}"):
+            user = st.session_state.get('user')
+            entries = meal_log_entries(items, meal_type, user_id=user.get('id') if user else None)
+            # All items are written in one transaction, so a meal is never half-logged
+            if get_db_manager().add_food_logs(entries):
+                st.success(f"Logged {len(entries)} item(s) as {meal_type}")
+            else:
+                st.error("Could not save this meal. Please try again.")
+
+def prepare_one(name, data):
+    """Batch worker: decode and encode one photo, capturing any failure"""
+    started = time.perf_counter()
+    result = {'name': name, 'prepared': None, 'analysis': None, 'error': None}
+    try:
+        result['prepared'] = prepare_image(data)
+    except Exception as e:
+        result['error'] = f"Error processing image: {str(e)}"
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+def analyze_one(result):
+    """Batch worker: send one prepared photo the local classifier was unsure of to Gemini"""
+    started = time.perf_counter()
+    try:
+        result['analysis'] = run_analysis(result['prepared'], use_local=False)
+    except Exception as e:
+        result['error'] = describe_error(e)
+    result['seconds'] += time.perf_counter() - started
+    return result
+
+def show_batch_result(result, key):
+    """Render one finished batch item"""
+    with st.container(border=True):
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            if result['prepared'] is not None:
+                st.image(result['prepared'].image, use_container_width=True)
+        with col2:
+            st.markdown(f"**{result['name']}** — {result['seconds']:.1f}s")
+            if result['error']:
+                st.error(result['error'])
+            else:
+                show_analysis(result['analysis'], key)
+
+def analyze_batch(files):
+    """
+    Prepare many photos on a worker pool, classify them on-device in one batch and
+    send only the uncertain ones to Gemini, rendering each result as it completes.
+    Workers only compute; all Streamlit calls stay on the script thread.
+    """
+    # Read uploads on the script thread; workers get plain bytes
+    items = [(f.name, f.getvalue()) for f in files]
+    progress = st.progress(0.0, text=f"Analyzing {len(items)} images...")
+    started = time.perf_counter()
+    results = []
+
+    def finish(result):
+        results.append(result)
+        show_batch_result(result, f"batch_{len(results)}")
+        progress.progress(len(results) / len(items), text=f"{len(results)} of {len(items)} analyzed")
+
+    with ThreadPoolExecutor(max_workers=VISION_BATCH_CONCURRENCY) as pool:
+        prepared = list(pool.map(prepare_one, *zip(*items)))
+        for result in prepared:
+            if result['error'] is not None:
+                finish(result)
+        # One batched on-device pass; only photos it is unsure of go to Gemini
+        ready = [result for result in prepared if result['error'] is None]
+        classify_started = time.perf_counter()
+        predictions = get_food_classifier().classify([result['prepared'].image for result in ready])
+        share = (time.perf_counter() - classify_started) / max(len(ready), 1)
+        pending = []
+        for result, prediction in zip(ready, predictions):
+            result['seconds'] += share
+            if prediction and prediction['confident']:
+                result['analysis'] = local_analysis(prediction)
+                finish(result)
+            else:
+                pending.append(result)
+        # Each worker runs in a copy of this run's context, keeping the user for fair queuing
+        futures = [pool.submit(contextvars.copy_context().run, analyze_one, result) for result in pending]
+        for future in as_completed(futures):
+            finish(future.result())
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for r in results if r['error'])
+    progress.progress(1.0, text=(
+        f"{len(results) - failed} analyzed, {failed} failed in {elapsed:.1f}s "
+        f"(sequential would take ~{sum(r['seconds'] for r in results):.1f}s)"
+    ))
+    return results
+
 def app():
     st.title("🍽️ Food Vision Analysis")
     st.write("Upload a food image or capture one using your camera to get detailed nutritional information.")
@@ -124,27 +228,30 @@ def app():
     """)
     
     # Create tabs for different input methods
-    tab1, tab2 = st.tabs(["📤 Upload Image", "📸 Take Photo"])
+    tab1, tab2, tab3 = st.tabs(["📤 Upload Image", "📸 Take Photo", "🗂️ Batch Upload"])
     
     with tab1:
         uploaded_file = st.file_uploader("Choose a food image...", type=["jpg", "jpeg", "png"])
         if uploaded_file is not None:
             try:
-                # Read image data
-                image_data = uploaded_file.getvalue()
-                # Process and display image
-                image = process_image(image_data)
+                # Process (once per file) and display image
+                image = prepared_upload(uploaded_file, "upload")
                 if image:
-                    st.image(image, caption="Uploaded Image", use_container_width=True)
+                    st.image(image.image, caption="Uploaded Image", use_container_width=True)
+                    st.caption(image.summary())
                     
+                    analyses = st.session_state.setdefault('vision_analyses', {})
                     if st.button("Analyze Uploaded Image"):
                         with st.spinner("Analyzing image... This may take a few seconds."):
-                            result = analyze_food_image(image_data)
+                            result = analyze_food_image(image)
                             if result:
-                                st.markdown("### Analysis Results")
-                                st.write(result)
+                                analyses["upload"] = (uploaded_file.file_id, result)
                             else:
                                 st.error("Failed to analyze the image. Please try again with a different image.")
+                    # The analysis stays on screen (and loggable) until a different photo arrives
+                    if analyses.get("upload", (None,))[0] == uploaded_file.file_id:
+                        st.markdown("### Analysis Results")
+                        show_analysis(analyses["upload"][1], "upload")
             except Exception as e:
                 st.error(f"Error processing image: {str(e)}")
                 st.info("Please try uploading a different image.")
@@ -153,24 +260,40 @@ def app():
         camera_input = st.camera_input("Take a photo of your food")
         if camera_input is not None:
             try:
-                # Read image data
-                image_data = camera_input.getvalue()
-                # Process and display image
-                image = process_image(image_data)
+                # Process (once per file) and display image
+                image = prepared_upload(camera_input, "camera")
                 if image:
-                    st.image(image, caption="Captured Image", use_container_width=True)
+                    st.image(image.image, caption="Captured Image", use_container_width=True)
+                    st.caption(image.summary())
                     
+                    analyses = st.session_state.setdefault('vision_analyses', {})
                     if st.button("Analyze Captured Image"):
                         with st.spinner("Analyzing image... This may take a few seconds."):
-                            result = analyze_food_image(image_data)
+                            result = analyze_food_image(image)
                             if result:
-                                st.markdown("### Analysis Results")
-                                st.write(result)
+                                analyses["camera"] = (camera_input.file_id, result)
                             else:
                                 st.error("Failed to analyze the image. Please try again with a different image.")
+                    # The analysis stays on screen (and loggable) until a different photo arrives
+                    if analyses.get("camera", (None,))[0] == camera_input.file_id:
+                        st.markdown("### Analysis Results")
+                        show_analysis(analyses["camera"][1], "camera")
             except Exception as e:
                 st.error(f"Error processing image: {str(e)}")
                 st.info("Please try taking a different photo.")
 
+    with tab3:
+        batch_files = st.file_uploader(
+            "Choose a day's meal photos...", type=["jpg", "jpeg", "png"], accept_multiple_files=True
+        )
+        if batch_files:
+            file_ids = tuple(f.file_id for f in batch_files)
+            if st.button(f"Analyze {len(batch_files)} Images"):
+                st.session_state.batch_results = (file_ids, analyze_batch(batch_files))
+            elif st.session_state.get('batch_results', (None,))[0] == file_ids:
+                # Results of the last run for these files survive reruns
+                for number, result in enumerate(st.session_state.batch_results[1], 1):
+                    show_batch_result(result, f"batch_{number}")
+
 if __name__ == "__main__":
-    app()
\ No newline at end of file
+    app()
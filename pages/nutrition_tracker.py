@@ -5,9 +5,7 @@ Handles nutrition tracking and meal planning functionality
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import plotly.express as px
-from utils import FoodDatabase
-from utils.db_manager import DatabaseManager
+from utils.resources import get_food_db, get_db_manager
 
 def format_food_info(food):
     """Format food information for display"""
@@ -20,15 +18,17 @@ def format_food_info(food):
 • Fiber: {food['Fiber']:.1f}g
     """
 
+def current_user_id():
+    """Id of the logged-in user, if any, for attributing food logs"""
+    user = st.session_state.get('user')
+    return user.get('id') if user else None
+
 def app():
     st.title("Nutrition Tracker")
     
-    # Initialize session states
-    if 'food_db' not in st.session_state:
-        st.session_state.food_db = FoodDatabase()
-    
-    if 'db_manager' not in st.session_state:
-        st.session_state.db_manager = DatabaseManager()
+    # Shared process-wide food table and database manager (see utils.resources)
+    st.session_state.food_db = get_food_db()
+    st.session_state.db_manager = get_db_manager()
     
     # Load daily goals from database
     if 'daily_goals' not in st.session_state:
@@ -58,6 +58,10 @@ def app():
             search_query = st.text_input("Search for a food", key="food_search")
             if search_query:
                 search_results = st.session_state.food_db.search_food(search_query)
+                if not search_results:
+                    search_results = st.session_state.food_db.search_food(search_query, fuzzy=True)
+                    if search_results:
+                        st.caption(f"No exact matches for \"{search_query}\". Did you mean one of these?")
                 if search_results:
                     st.subheader("Search Results")
                     for idx, food in enumerate(search_results):
@@ -83,12 +87,13 @@ def app():
                             if st.button("Add to Log", key=f"add_{idx}_{food['Food']}"):
                                 # Calculate nutrition for selected serving size
                                 adjusted_nutrition = st.session_state.food_db.calculate_serving(
-                                    food_id=search_results.index(food),
+                                    food_id=food['food_id'],
                                     desired_grams=serving_size
                                 )
                                 
                                 # Add to log
                                 log_entry = {
+                                    'user_id': current_user_id(),
                                     'time': datetime.now().strftime("%H:%M"),
                                     'date': datetime.now().date().isoformat(),
                                     'food_name': food['Food'],
@@ -132,7 +137,9 @@ def app():
             with col1:
                 if st.button("Yes, Reset", key="confirm_reset_yes", type="primary"):
                     # Clear today's logs from database
-                    st.session_state.db_manager.clear_logs_by_date(datetime.now().date().isoformat())
+                    st.session_state.db_manager.clear_logs_by_date(
+                        datetime.now().date().isoformat(), user_id=current_user_id()
+                    )
                     st.session_state.confirm_reset = False
                     st.success("Today's log has been reset!")
                     st.rerun()
@@ -141,17 +148,15 @@ def app():
                     st.session_state.confirm_reset = False
                     st.rerun()
         
-        # Get today's logs from database
-        today_logs = st.session_state.db_manager.get_logs_by_date(datetime.now().date().isoformat())
+        # Get today's totals from the per-day rollup
+        today = datetime.now().date().isoformat()
+        totals = st.session_state.db_manager.get_daily_totals(today, user_id=current_user_id())
         
-        if today_logs:
-            # Calculate totals
-            totals = {
-                'calories': sum(log['calories'] for log in today_logs),
-                'protein': sum(log['protein'] for log in today_logs),
-                'carbs': sum(log['carbs'] for log in today_logs),
-                'fat': sum(log['fat'] for log in today_logs)
-            }
+        if totals['entries']:
+            # Loaded on the first day with something to chart
+            import plotly.express as px
+
+            today_logs = st.session_state.db_manager.get_logs_by_date(today, user_id=current_user_id())
             
             # Display progress towards goals
             col1, col2, col3, col4 = st.columns(4)
@@ -208,7 +213,7 @@ def app():
                             df[['food_name', 'serving_size', 'calories', 'protein', 'carbs', 'fat']],
                             hide_index=True
                         )
-                        st.metric(f"Total {meal} Calories", f"{sum(log['calories'] for log in meal_logs):.0f}")
+                        st.metric(f"Total {meal} Calories", f"{totals['meals'].get(meal, {}).get('calories', 0):.0f}")
                     else:
                         st.info(f"No {meal.lower()} logged yet")
         else:
@@ -270,18 +275,22 @@ def app():
                     
                     if st.button("Add to Log", key=f"browse_{idx}_{food['Food']}"):
                         # Calculate adjusted nutrition based on serving size
-                        multiplier = serving_size / food['Grams']
+                        adjusted_nutrition = st.session_state.food_db.calculate_serving(
+                            food_id=food['food_id'],
+                            desired_grams=serving_size
+                        )
                         log_entry = {
+                            'user_id': current_user_id(),
                             'time': datetime.now().strftime("%H:%M"),
                             'date': datetime.now().date().isoformat(),
                             'food_name': food['Food'],
                             'meal_type': meal_type,
                             'serving_size': serving_size,
-                            'calories': food['Calories'] * multiplier,
-                            'protein': food['Protein'] * multiplier,
-                            'carbs': food['Carbs'] * multiplier,
-                            'fat': food['Fat'] * multiplier,
-                            'fiber': food['Fiber'] * multiplier
+                            'calories': adjusted_nutrition['Calories'],
+                            'protein': adjusted_nutrition['Protein'],
+                            'carbs': adjusted_nutrition['Carbs'],
+                            'fat': adjusted_nutrition['Fat'],
+                            'fiber': adjusted_nutrition['Fiber']
                         }
                         st.session_state.db_manager.add_food_log(log_entry)
                         st.success(f"Added {food['Food']} to your log!")
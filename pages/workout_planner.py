@@ -3,12 +3,10 @@ Workout Planner Module
 Handles workout planning and tracking functionality
 """
 import streamlit as st
-import pandas as pd
 from datetime import datetime, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
-from utils.workout_db import WorkoutDatabase
-from utils.ai_trainer import AITrainer
+from utils.resources import get_workout_db, get_ai_trainer, get_job_queue
+from utils.ai_jobs import WORKOUT_PROGRAM
+from utils.async_trainer import AsyncAITrainer
 import json
 import os
 
@@ -21,19 +19,53 @@ def format_exercise_info(exercise):
 • Difficulty: {exercise['difficulty']}
     """
 
+def show_form_tips(tips):
+    """Render generate_form_tips output for one exercise"""
+    with st.container():
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**Quick Setup**")
+            st.write(tips['setup'][0])
+            st.markdown("**Key Form Points**")
+            st.write("• " + tips['execution'][0])
+        with col2:
+            st.markdown("**Watch Out For**")
+            st.write("• " + tips['common_mistakes'][0])
+            st.markdown("**Safety First**")
+            st.write("• " + tips['safety_tips'][0])
+        st.markdown("**Quick Tips**")
+        st.write(f"Breathing: {tips['breathing']} | Variation: {tips['variations'][0]}")
+
+@st.fragment(run_every=2)
+def program_job_status():
+    """Poll the queued program generation and refresh the page once it has finished"""
+    job_id = st.session_state.get('program_job')
+    if job_id is None:
+        return
+    job = get_job_queue().get(job_id)
+    if job is None or job['status'] in ('queued', 'running'):
+        attempt = f" (attempt {job['attempts']})" if job and job['attempts'] > 1 else ""
+        st.info(f"Creating your personalized workout program in the background{attempt}...")
+        return
+    del st.session_state['program_job']
+    if job['status'] == 'done':
+        st.session_state.current_program = job['result']['program_id']
+        st.session_state.program_job_message = ('success', "Your personalized workout program has been created!")
+    else:
+        st.session_state.program_job_message = ('error', f"Could not create a program: {job['error']}")
+    st.rerun()
+
 def app():
     st.title("Smart Workout Planner")
     
-    # Initialize database and AI trainer
-    if 'workout_db' not in st.session_state:
-        st.session_state.workout_db = WorkoutDatabase()
+    # Shared process-wide database and AI trainer (see utils.resources)
+    st.session_state.workout_db = get_workout_db()
     
-    if 'ai_trainer' not in st.session_state:
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            st.error("Please set the GEMINI_API_KEY environment variable to use AI features.")
-            return
-        st.session_state.ai_trainer = AITrainer(api_key)
+    ai_trainer = get_ai_trainer(os.getenv('GEMINI_API_KEY'))
+    if ai_trainer is None:
+        st.error("Please set the GEMINI_API_KEY environment variable to use AI features.")
+        return
+    st.session_state.ai_trainer = ai_trainer
     
     # Create tabs for different sections
     tab1, tab2, tab3 = st.tabs([
@@ -84,59 +116,27 @@ def app():
                 default=["Bodyweight", "Dumbbells"]
             )
             
-            if st.form_submit_button("Generate Program"):
-                with st.spinner("Creating your personalized workout program..."):
-                    user_input = {
-                        'goal': goal,
-                        'fitness_level': fitness_level,
-                        'days_per_week': days_per_week,
-                        'time_per_session': time_per_session,
-                        'duration_weeks': duration_weeks,
-                        'equipment': equipment
-                    }
-                    
-                    program = st.session_state.ai_trainer.generate_workout_program(user_input)
-                    
-                    if program:
-                        program_id = st.session_state.workout_db.create_workout_program({
-                            'name': program['name'],
-                            'description': program['description'],
-                            'frequency': program['frequency'],
-                            'duration_weeks': program['duration_weeks'],
-                            'difficulty': program['difficulty'],
-                            'tags': program['tags']
-                        })
-                        
-                        for day in program['workout_days']:
-                            day_id = st.session_state.workout_db.add_workout_day(program_id, {
-                                'day_number': day['day_number'],
-                                'name': day['name']
-                            })
-                            
-                            for ex in day['exercises']:
-                                exercise_data = {
-                                    'name': ex['name'],
-                                    'description': '',
-                                    'muscle_group': 'Unknown',
-                                    'equipment': 'Unknown',
-                                    'difficulty': program['difficulty'],
-                                    'instructions': ex.get('notes', ''),
-                                    'is_custom': False
-                                }
-                                ex_id = st.session_state.workout_db.add_exercise(exercise_data)
-                                
-                                st.session_state.workout_db.add_workout_exercise(day_id, {
-                                    'exercise_id': ex_id,
-                                    'sets': ex['sets'],
-                                    'reps': ex['reps'],
-                                    'rest_seconds': ex.get('rest_seconds', 60),
-                                    'notes': ex.get('notes', ''),
-                                    'order_in_workout': ex['order']
-                                })
-                        
-                        st.success("Your personalized workout program has been created!")
-                        st.session_state.current_program = program_id
-                        st.rerun()
+            if st.form_submit_button("Generate Program", disabled='program_job' in st.session_state):
+                user_input = {
+                    'goal': goal,
+                    'fitness_level': fitness_level,
+                    'days_per_week': days_per_week,
+                    'time_per_session': time_per_session,
+                    'duration_weeks': duration_weeks,
+                    'equipment': equipment
+                }
+                
+                # Generated and imported by a background worker; program_job_status polls for it
+                st.session_state.program_job = get_job_queue().enqueue(
+                    WORKOUT_PROGRAM,
+                    {'user_input': user_input, 'save': True},
+                    user_id=(st.session_state.get('user') or {}).get('id')
+                )
+        
+        program_job_status()
+        if 'program_job_message' in st.session_state:
+            kind, message = st.session_state.pop('program_job_message')
+            getattr(st, kind)(message)
         
         # Display existing programs
         st.subheader("Your Programs")
@@ -161,6 +161,14 @@ def app():
                             st.subheader(f"Day {day['day_number']}: {day['name']}")
                             exercises = st.session_state.workout_db.get_workout_exercises(day['id'])
                             if exercises:
+                                # Fetch tips for the whole day in parallel rather than one call per click
+                                day_tips = st.session_state.setdefault('day_form_tips', {}).get(day['id'], {})
+                                if st.button("Show Form Tips for All Exercises", key=f"day_tips_{day['id']}"):
+                                    with st.spinner("Getting expert form tips for the whole day..."):
+                                        day_tips = AsyncAITrainer(st.session_state.ai_trainer).form_tips_for_many_sync(
+                                            [ex['name'] for ex in exercises]
+                                        )
+                                        st.session_state.day_form_tips[day['id']] = day_tips
                                 for ex in exercises:
                                     with st.container():
                                         st.markdown(f"**{ex['name']} - {ex['sets']} sets**")
@@ -169,24 +177,13 @@ def app():
                                         if ex['notes']:
                                             st.write(f"Notes: {ex['notes']}")
                                         
-                                        if st.button("Show Form Tips", key=f"tips_{ex['id']}"):
+                                        if day_tips.get(ex['name']):
+                                            show_form_tips(day_tips[ex['name']])
+                                        elif st.button("Show Form Tips", key=f"tips_{ex['id']}"):
                                             with st.spinner("Getting expert form tips..."):
                                                 tips = st.session_state.ai_trainer.generate_form_tips(ex['name'])
                                                 if tips:
-                                                    with st.container():
-                                                        col1, col2 = st.columns(2)
-                                                        with col1:
-                                                            st.markdown("**Quick Setup**")
-                                                            st.write(tips['setup'][0])
-                                                            st.markdown("**Key Form Points**")
-                                                            st.write("• " + tips['execution'][0])
-                                                        with col2:
-                                                            st.markdown("**Watch Out For**")
-                                                            st.write("• " + tips['common_mistakes'][0])
-                                                            st.markdown("**Safety First**")
-                                                            st.write("• " + tips['safety_tips'][0])
-                                                        st.markdown("**Quick Tips**")
-                                                        st.write(f"Breathing: {tips['breathing']} | Variation: {tips['variations'][0]}")
+                                                    show_form_tips(tips)
                                         st.divider()
                     
                     with st.form(f"feedback_{program['id']}"):
@@ -277,7 +274,7 @@ def app():
                 }
                 workout_log_id = st.session_state.workout_db.log_workout(workout_data)
                 
-                # Log all sets
+                # Buffer all sets and write them in one transaction at workout end
                 for idx, set_data in enumerate(st.session_state.active_workout['exercises'], 1):
                     log_data = {
                         'workout_log_id': workout_log_id,
@@ -288,11 +285,17 @@ def app():
                         'rpe': set_data['rpe'],
                         'notes': set_data.get('notes', '')
                     }
-                    st.session_state.workout_db.log_exercise_set(log_data)
+                    st.session_state.workout_db.queue_exercise_set(log_data)
                 
                 del st.session_state.active_workout
-                st.success("Workout completed and logged successfully!")
-                st.rerun()
+                try:
+                    st.session_state.workout_db.flush_exercise_sets()
+                except Exception as e:
+                    # The sets stay buffered and are retried by the next flush
+                    st.error(f"Workout saved, but its sets could not be written yet: {str(e)}")
+                else:
+                    st.success("Workout completed and logged successfully!")
+                    st.rerun()
     
     # Tab 3: Progress Tracking
     with tab3:
@@ -302,6 +305,10 @@ def app():
         workout_stats = st.session_state.workout_db.get_workout_statistics()
         
         if workout_stats:
+            # Charting libraries load only once there is something to chart
+            import pandas as pd
+            import plotly.express as px
+
             # Summary metrics
             col1, col2, col3, col4 = st.columns(4)
             with col1:
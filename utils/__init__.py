@@ -1,6 +1,26 @@
 # This file makes the utils directory a Python package
-from .ai_helper import generate_ai_response
-from .food_db import FoodDatabase
-from .nutrition_helper import estimate_nutrition_sync as estimate_nutrition
+import importlib
 
-__all__ = ['generate_ai_response', 'FoodDatabase', 'estimate_nutrition'] 
\ No newline at end of file
+# Public names and the submodule each lives in. They are imported on first
+# access (PEP 562), so importing e.g. utils.db_manager does not pull in
+# pandas, PIL or google.generativeai.
+_EXPORTS = {
+    'generate_ai_response': ('.ai_helper', 'generate_ai_response'),
+    'FoodDatabase': ('.food_db', 'FoodDatabase'),
+    'estimate_nutrition': ('.nutrition_helper', 'estimate_nutrition_sync'),
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module, attribute = _EXPORTS[name]
+    value = getattr(importlib.import_module(module, __name__), attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,197 @@
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from config import AI_CACHE_PATH, AI_CACHE_MAX_ENTRIES, AI_CACHE_MEMORY_ENTRIES, AI_CACHE_POLICIES
+from .db_pool import get_pool
+from .db_storage import retry_on_locked
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_prompt(text):
+    """Collapse whitespace so re-indented f-string prompts map to the same key"""
+    return _WHITESPACE.sub(' ', text or '').strip()
+
+
+def make_key(model, prompt, context='', params=None):
+    """Content address of a request: model, normalized prompt, context hash and generation params"""
+    context_hash = hashlib.sha256(normalize_prompt(context).encode('utf-8')).hexdigest()
+    material = json.dumps(
+        [model, normalize_prompt(prompt), context_hash, params or {}],
+        sort_keys=True, separators=(',', ':')
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class AIResponseCache:
+    """
+    Persistent cache of Gemini responses.
+
+    Entries live in a SQLite table with a per-entry expiry and a last-access
+    time used to evict the least recently used rows beyond max_entries. A small
+    in-process LRU of serialized responses sits in front of it so repeated
+    lookups in the same process never touch the database. Which AITrainer
+    methods are cached, and for how long, comes from AI_CACHE_POLICIES.
+    """
+
+    def __init__(self, db_path=AI_CACHE_PATH, max_entries=AI_CACHE_MAX_ENTRIES,
+                 memory_entries=AI_CACHE_MEMORY_ENTRIES, policies=None):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.policies = dict(AI_CACHE_POLICIES if policies is None else policies)
+        self.pool = get_pool(db_path)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'expired': 0,
+            'evicted': 0
+        }
+        self._create_table()
+
+    def _create_table(self):
+        with self.pool.connection() as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS ai_cache (
+                key TEXT PRIMARY KEY,
+                method TEXT,
+                model TEXT,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_ai_cache_last_access ON ai_cache (last_access)')
+            conn.commit()
+
+    def is_enabled(self, method):
+        """Whether responses for an AITrainer method are cached (methods opt in via the policy)"""
+        policy = self.policies.get(method)
+        return bool(policy) and policy.get('enabled', True)
+
+    def ttl_for(self, method):
+        """Time to live in seconds for a method's entries (None keeps them until evicted)"""
+        return (self.policies.get(method) or {}).get('ttl')
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _remember(self, key, expires_at, text):
+        with self._lock:
+            self._memory[key] = (expires_at, text)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Cached response for a key, or None on a miss or an expired entry"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, text = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return json.loads(text)
+                del self._memory[key]
+
+        try:
+            with self.pool.connection() as conn:
+                row = conn.execute(
+                    'SELECT response, expires_at FROM ai_cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None:
+                    self._count('misses')
+                    return None
+                if row['expires_at'] is not None and row['expires_at'] <= now:
+                    conn.execute('DELETE FROM ai_cache WHERE key = ?', (key,))
+                    conn.commit()
+                    self._count('expired')
+                    self._count('misses')
+                    return None
+                conn.execute(
+                    'UPDATE ai_cache SET last_access = ?, hits = hits + 1 WHERE key = ?', (now, key)
+                )
+                conn.commit()
+        except Exception as e:
+            logger.error(f"AI cache read failed: {str(e)}")
+            self._count('misses')
+            return None
+
+        self._count('disk_hits')
+        self._remember(key, row['expires_at'], row['response'])
+        return json.loads(row['response'])
+
+    @retry_on_locked
+    def _store(self, key, method, model, text, now, expires_at):
+        with self.pool.connection() as conn:
+            conn.execute('''
+            INSERT INTO ai_cache (key, method, model, response, created_at, expires_at, last_access, hits)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+            ON CONFLICT (key) DO UPDATE SET
+                response = excluded.response,
+                created_at = excluded.created_at,
+                expires_at = excluded.expires_at,
+                last_access = excluded.last_access
+            ''', (key, method, model, text, now, expires_at, now))
+            evicted = conn.execute('''
+            DELETE FROM ai_cache WHERE key IN (
+                SELECT key FROM ai_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+            ''', (self.max_entries,)).rowcount
+            conn.commit()
+        return evicted
+
+    def put(self, key, response, method=None, model=None, ttl=None):
+        """Store a response; ttl in seconds (None keeps it until evicted)"""
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        text = json.dumps(response, separators=(',', ':'))
+        try:
+            evicted = self._store(key, method, model, text, now, expires_at)
+        except Exception as e:
+            logger.error(f"AI cache write failed: {str(e)}")
+            return
+        self._remember(key, expires_at, text)
+        self._count('stores')
+        if evicted:
+            self._count('evicted', evicted)
+
+    def invalidate(self, method=None):
+        """Remove all entries, or only those stored for one method"""
+        with self.pool.connection() as conn:
+            if method is None:
+                conn.execute('DELETE FROM ai_cache')
+            else:
+                conn.execute('DELETE FROM ai_cache WHERE method = ?', (method,))
+            conn.commit()
+        with self._lock:
+            self._memory.clear()
+
+    def get_stats(self):
+        """Hit/miss counters plus the hit ratio and number of stored entries"""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        try:
+            with self.pool.connection() as conn:
+                stats['entries'] = conn.execute('SELECT COUNT(*) FROM ai_cache').fetchone()[0]
+        except Exception as e:
+            logger.error(f"AI cache stats failed: {str(e)}")
+        return stats
@@ -1,24 +1,33 @@
-import google.generativeai as genai
-import os
 from dotenv import load_dotenv
 
+from .gemini_helper import get_genai
+from .rate_limiter import get_rate_limiter, estimate_tokens
+
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-
 def generate_ai_response(prompt, context="", model="gemini-pro"):
     """Generate an AI response using Gemini API."""
     try:
         # Initialize the model
-        model = genai.GenerativeModel(model)
+        # Gemini is imported and configured on the first call
+        model = get_genai().GenerativeModel(model)
         
         # Combine context and prompt
         full_prompt = f"{context}\n\n{prompt}" if context else prompt
         
-        # Generate response
-        response = model.generate_content(full_prompt)
+        # Generate response within the shared Gemini quota
+        limiter = get_rate_limiter()
+        ticket = limiter.acquire(estimate_tokens(full_prompt))
+        try:
+            response = model.generate_content(full_prompt)
+        except Exception as e:
+            if "quota" in str(e).lower() or "429" in str(e):
+                limiter.report_throttled()
+            # No usage is reported for a failed call; charge only its input
+            limiter.settle(ticket, estimate_tokens(full_prompt, output_tokens=0))
+            raise
+        limiter.settle(ticket, getattr(response.usage_metadata, 'total_token_count', None))
         
         return response.text
     except Exception as e:
@@ -0,0 +1,56 @@
+from .rate_limiter import set_current_user
+
+# Job kinds handled by the background queue
+WORKOUT_PROGRAM = 'workout_program'
+NUTRITION_PLAN = 'nutrition_plan'
+
+
+def _trainer(user_id):
+    from .resources import get_ai_trainer
+    # Charge the job's Gemini calls to the user who queued it
+    set_current_user(user_id)
+    trainer = get_ai_trainer()
+    if trainer is None:
+        raise RuntimeError("GEMINI_API_KEY is not set")
+    return trainer
+
+
+def workout_program_job(payload, user_id=None):
+    """Generate a workout program (saved by save_workout_program once the job completes)"""
+    program = _trainer(user_id).generate_workout_program(payload['user_input'])
+    if not program:
+        raise RuntimeError("No workout program was generated")
+    return {'program': program, 'program_id': None}
+
+
+def save_workout_program(result, payload, user_id=None, job_id=None):
+    """
+    Commit hook: with payload['save'], import the program into the workout
+    database. The import is keyed by job id, so a hook that runs again (a retried
+    _finish, or a requeued job) returns the program saved the first time.
+    """
+    if payload.get('save'):
+        from .resources import get_workout_db
+        result['program_id'] = get_workout_db().import_program(
+            result['program'], source_job_id=job_id
+        )['program_id']
+    return result
+
+
+def nutrition_plan_job(payload, user_id=None):
+    """Generate a nutrition plan for payload['user_data']"""
+    plan = _trainer(user_id).generate_nutrition_plan(payload['user_data'])
+    if not plan:
+        raise RuntimeError("No nutrition plan was generated")
+    return {'plan': plan}
+
+
+JOB_HANDLERS = {
+    WORKOUT_PROGRAM: workout_program_job,
+    NUTRITION_PLAN: nutrition_plan_job
+}
+
+# Side effects applied by the worker that holds the job's lease; idempotent by job id
+JOB_COMMITS = {
+    WORKOUT_PROGRAM: save_workout_program
+}
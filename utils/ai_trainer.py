@@ -1,21 +1,49 @@
-import google.generativeai as genai
 import os
 import json
 import requests
 from typing import Dict, List, Any
 
+from .ai_cache import make_key
+from .gemini_transport import GeminiTransport
+from .rate_limiter import get_rate_limiter, estimate_tokens, RateLimitTimeout, INTERACTIVE, BACKGROUND
+from config import GEMINI_BACKGROUND_METHODS
+
 class AITrainer:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache=None, transport=None, limiter=None):
         self.api_key = api_key
+        # Shared persistent response cache unless one is passed in
+        if cache is None:
+            from .resources import get_ai_cache
+            cache = get_ai_cache()
+        self.cache = cache
         self.base_url = "https://generativelanguage.googleapis.com/v1beta/models"
         self.model = "gemini-2.0-flash"
+        # The key travels in a header, not the URL, so it never appears in
+        # exception messages or logs that include the request URL
         self.headers = {
-            'Content-Type': 'application/json'
+            'Content-Type': 'application/json',
+            'x-goog-api-key': api_key
         }
+        # Keep-alive session with timeouts, retries and a circuit breaker
+        self.transport = transport or GeminiTransport(headers=self.headers)
+        self.transport.session.headers.update(self.headers)
+        # Process-wide RPM/TPM budget shared with the other Gemini call sites
+        self.limiter = limiter or get_rate_limiter()
+
+    def _acquire(self, full_prompt: str, priority: str):
+        """Wait for quota; returns the limiter ticket"""
+        return self.limiter.acquire(estimate_tokens(full_prompt), priority)
 
-    def _make_api_request(self, prompt: str, context: str = "") -> Dict:
-        """Make API request to Gemini."""
-        url = f"{self.base_url}/{self.model}:generateContent?key={self.api_key}"
+    def _note_error(self, error):
+        """Pause every caller when the API still answers 429 after the transport's retries"""
+        response = getattr(error, 'response', None)
+        if response is not None and response.status_code == 429:
+            self.limiter.report_throttled()
+
+    def _make_api_request(self, prompt: str, context: str = "", cache_method: str = None,
+                          priority: str = None) -> Dict:
+        """Make API request to Gemini, answering from the response cache when cache_method opts in."""
+        url = f"{self.base_url}/{self.model}:generateContent"
         
         full_prompt = f"{context}\n\n{prompt}" if context else prompt
         
@@ -25,13 +53,61 @@ class AITrainer:
             }]
         }
         
+        cache_key = None
+        if cache_method and self.cache and self.cache.is_enabled(cache_method):
+            generation_params = {k: v for k, v in payload.items() if k != 'contents'}
+            cache_key = make_key(self.model, prompt, context, generation_params)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        if priority is None:
+            priority = BACKGROUND if cache_method in GEMINI_BACKGROUND_METHODS else INTERACTIVE
+        ticket = None
         try:
-            response = requests.post(url, headers=self.headers, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            ticket = self._acquire(full_prompt, priority)
+            result = self.transport.post_json(url, payload)
+        except (requests.exceptions.RequestException, RateLimitTimeout) as e:
+            self._note_error(e)
+            # No usage is reported for a failed call; charge only its input
+            self.limiter.settle(ticket, estimate_tokens(full_prompt, output_tokens=0))
             print(f"API request error: {e}")
             return None
+        self.limiter.settle(ticket, (result or {}).get('usageMetadata', {}).get('totalTokenCount'))
+        
+        if cache_key and result and 'candidates' in result:
+            self.cache.put(cache_key, result, method=cache_method, model=self.model,
+                           ttl=self.cache.ttl_for(cache_method))
+        return result
+
+    def stream_api_request(self, prompt: str, context: str = ""):
+        """Stream a Gemini reply via streamGenerateContent, yielding text chunks as they arrive."""
+        url = f"{self.base_url}/{self.model}:streamGenerateContent?alt=sse"
+        
+        full_prompt = f"{context}\n\n{prompt}" if context else prompt
+        
+        payload = {
+            "contents": [{
+                "parts": [{"text": full_prompt}]
+            }]
+        }
+        
+        ticket = None
+        usage = None
+        try:
+            ticket = self._acquire(full_prompt, INTERACTIVE)
+            for event in self.transport.stream_events(url, payload):
+                usage = event.get('usageMetadata', {}).get('totalTokenCount', usage)
+                for candidate in event.get('candidates', [])[:1]:
+                    for part in candidate.get('content', {}).get('parts', []):
+                        if part.get('text'):
+                            yield part['text']
+        except (requests.exceptions.RequestException, RateLimitTimeout, ValueError) as e:
+            self._note_error(e)
+            print(f"API stream error: {e}")
+        finally:
+            # A stream that failed before reporting usage is charged for its input only
+            self.limiter.settle(ticket, usage or estimate_tokens(full_prompt, output_tokens=0))
 
     def _parse_json_response(self, response_text: str) -> Dict:
         """Helper method to parse JSON from response text."""
@@ -112,7 +188,7 @@ class AITrainer:
         """
 
         try:
-            response = self._make_api_request(prompt)
+            response = self._make_api_request(prompt, cache_method='generate_workout_program')
             if response and 'candidates' in response:
                 return self._parse_json_response(response['candidates'][0]['content']['parts'][0]['text'])
             return None
@@ -184,7 +260,7 @@ class AITrainer:
         """
 
         try:
-            response = self._make_api_request(prompt)
+            response = self._make_api_request(prompt, cache_method='generate_nutrition_plan')
             if response and 'candidates' in response:
                 return self._parse_json_response(response['candidates'][0]['content']['parts'][0]['text'])
             return None
@@ -211,7 +287,7 @@ class AITrainer:
         """
 
         try:
-            response = self._make_api_request(prompt)
+            response = self._make_api_request(prompt, cache_method='analyze_workout_performance')
             if response and 'candidates' in response:
                 return self._parse_json_response(response['candidates'][0]['content']['parts'][0]['text'])
             return None
@@ -238,7 +314,7 @@ class AITrainer:
         """
 
         try:
-            response = self._make_api_request(prompt)
+            response = self._make_api_request(prompt, cache_method='generate_form_tips')
             if response and 'candidates' in response:
                 return self._parse_json_response(response['candidates'][0]['content']['parts'][0]['text'])
             return None
@@ -272,7 +348,7 @@ class AITrainer:
         """
 
         try:
-            response = self._make_api_request(prompt)
+            response = self._make_api_request(prompt, cache_method='suggest_workout_modifications')
             if response and 'candidates' in response:
                 return self._parse_json_response(response['candidates'][0]['content']['parts'][0]['text'])
             return None
@@ -300,7 +376,7 @@ class AITrainer:
         """
 
         try:
-            response = self._make_api_request(prompt)
+            response = self._make_api_request(prompt, cache_method='analyze_nutrition_log')
             if response and 'candidates' in response:
                 return self._parse_json_response(response['candidates'][0]['content']['parts'][0]['text'])
             return None
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+from config import AI_MAX_CONCURRENCY
+
+
+class AsyncAITrainer:
+    """
+    asyncio front end for fanning out independent AITrainer calls.
+
+    Each call runs the wrapped trainer's method in a worker thread
+    (asyncio.to_thread), so it shares that trainer's keep-alive session,
+    response cache, retries and circuit breaker. A semaphore bounds how many
+    calls are in flight at once. The *_sync methods are the facade for
+    Streamlit scripts, which have no running event loop.
+    """
+
+    def __init__(self, trainer, max_concurrency=AI_MAX_CONCURRENCY):
+        self.trainer = trainer
+        self.max_concurrency = max_concurrency
+
+    async def _call(self, semaphore, method, *args):
+        async with semaphore:
+            return await asyncio.to_thread(getattr(self.trainer, method), *args)
+
+    async def gather(self, calls):
+        """Run (method name, args) pairs concurrently; results come back in call order"""
+        # One semaphore per batch: asyncio primitives belong to the loop that uses them
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.gather(*(self._call(semaphore, method, *args) for method, args in calls))
+
+    async def form_tips_for_many(self, exercise_names):
+        """generate_form_tips for several exercises at once, as {name: tips or None}"""
+        names = list(dict.fromkeys(exercise_names))
+        results = await self.gather([('generate_form_tips', (name,)) for name in names])
+        return dict(zip(names, results))
+
+    @staticmethod
+    def run(coroutine):
+        """Run a coroutine to completion from synchronous code"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+        # Called from inside a running loop: finish the work on a separate thread
+        result = {}
+
+        def runner():
+            try:
+                result['value'] = asyncio.run(coroutine)
+            except BaseException as e:
+                result['error'] = e
+
+        thread = threading.Thread(target=runner)
+        thread.start()
+        thread.join()
+        if 'error' in result:
+            raise result['error']
+        return result['value']
+
+    def gather_sync(self, calls):
+        return self.run(self.gather(calls))
+
+    def form_tips_for_many_sync(self, exercise_names):
+        return self.run(self.form_tips_for_many(exercise_names))
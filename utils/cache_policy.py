@@ -0,0 +1,133 @@
+import copy
+import time
+import inspect
+import logging
+import threading
+from functools import wraps
+from collections import OrderedDict
+
+from config import DATA_CACHE_POLICIES, DATA_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+USER = 'user'
+
+
+class DataCache:
+    """
+    Process-wide cache of read-mostly datasets (user summaries, workout
+    statistics, food categories, the exercise library).
+
+    Each dataset has a declared policy in DATA_CACHE_POLICIES: a TTL and a
+    scope. "user" datasets are keyed by user id, so one user's write only
+    drops that user's entries; "global" datasets are shared. The write APIs
+    in db_manager and workout_db call invalidate() after they commit, so
+    reruns are served warm until the data actually changes. A load racing
+    with an invalidation is not stored, and None (the readers' failure
+    value) is never cached. Hits return a deep copy, as st.cache_data does,
+    so callers may mutate what they get.
+    """
+
+    def __init__(self, policies=None, max_entries=DATA_CACHE_MAX_ENTRIES):
+        self.policies = dict(DATA_CACHE_POLICIES if policies is None else policies)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'invalidated': 0, 'evicted': 0}
+
+    def get_or_load(self, dataset, user_id, params, loader):
+        """The cached value for (dataset, user, params), calling loader() on a miss"""
+        policy = self.policies.get(dataset)
+        if policy is None:
+            return loader()
+        key = (dataset, user_id if policy.get('scope') == USER else None, params)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return copy.deepcopy(entry[1])
+                del self._entries[key]
+                self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            generation = self._generations.get(dataset, 0)
+
+        value = loader()
+        if value is None:
+            return None
+        with self._lock:
+            # Skip the store if a write invalidated the dataset while we were loading
+            if self._generations.get(dataset, 0) == generation:
+                self._entries[key] = (time.monotonic() + policy['ttl'], copy.deepcopy(value))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats['evicted'] += 1
+        return value
+
+    def invalidate(self, *datasets, user_id=None):
+        """Drop cached entries of datasets; for "user" datasets only user_id's, if given"""
+        with self._lock:
+            for dataset in datasets:
+                self._generations[dataset] = self._generations.get(dataset, 0) + 1
+                per_user = user_id is not None and self.policies.get(dataset, {}).get('scope') == USER
+                stale = [
+                    key for key in self._entries
+                    if key[0] == dataset and (not per_user or key[1] == user_id)
+                ]
+                for key in stale:
+                    del self._entries[key]
+                self.stats['invalidated'] += len(stale)
+
+    def clear(self):
+        """Drop every entry (e.g. after the database was reset)"""
+        with self._lock:
+            for dataset in self.policies:
+                self._generations[dataset] = self._generations.get(dataset, 0) + 1
+            self.stats['invalidated'] += len(self._entries)
+            self._entries.clear()
+
+    def get_stats(self):
+        """Hit/miss counters, hit ratio and number of live entries"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+data_cache = DataCache()
+
+
+def invalidate(*datasets, user_id=None):
+    """Invalidate datasets in the shared data cache (called by write APIs after commit)"""
+    data_cache.invalidate(*datasets, user_id=user_id)
+
+
+def cached(dataset, user_arg=None):
+    """
+    Serve a read function or method from the shared data cache under dataset's
+    policy. user_arg names the parameter holding the user id for "user" scoped
+    datasets; the remaining arguments (and the instance, for methods) are part
+    of the key.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            owner = arguments.pop('self', None)
+            user_id = arguments.pop(user_arg, None) if user_arg else None
+            params = (func.__qualname__, id(owner) if owner is not None else None, repr(sorted(arguments.items())))
+            return data_cache.get_or_load(dataset, user_id, params, lambda: func(*args, **kwargs))
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -2,32 +2,158 @@ import sqlite3
 import hashlib
 import os
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 import re
 
+from .db_pool import get_pool, close_pool
+from .db_storage import connect, retry_on_locked, stop_checkpointer
+from .db_migrations import Migration, apply_migrations
+from .resources import registry
+from .cache_policy import cached, invalidate, data_cache
+
+DB_PATH = 'fitness_app.db'
+
+# Ordered schema migrations for fitness_app.db, applied at startup
+APP_MIGRATIONS = [
+    Migration(1, 'indexes for date and per-user history queries', [
+        'CREATE INDEX IF NOT EXISTS idx_nutrition_logs_date_time ON nutrition_logs (date, time)',
+        'CREATE INDEX IF NOT EXISTS idx_nutrition_logs_user_date ON nutrition_logs (user_id, date)',
+        'CREATE INDEX IF NOT EXISTS idx_workout_logs_user_date ON workout_logs (user_id, date)',
+        'CREATE INDEX IF NOT EXISTS idx_progress_tracking_user_date ON progress_tracking (user_id, date)',
+        'CREATE INDEX IF NOT EXISTS idx_daily_goals_user_modified ON daily_goals (user_id, date_modified)',
+        'CREATE INDEX IF NOT EXISTS idx_daily_goals_modified ON daily_goals (date_modified)'
+    ]),
+    Migration(2, 'per-day nutrition totals', [
+        '''
+        CREATE TABLE IF NOT EXISTS nutrition_daily_totals (
+            user_id INTEGER NOT NULL DEFAULT 0,
+            date TEXT NOT NULL,
+            meal_type TEXT NOT NULL DEFAULT '',
+            entries INTEGER NOT NULL DEFAULT 0,
+            calories REAL NOT NULL DEFAULT 0,
+            protein REAL NOT NULL DEFAULT 0,
+            carbs REAL NOT NULL DEFAULT 0,
+            fat REAL NOT NULL DEFAULT 0,
+            fiber REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, date, meal_type)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_nutrition_daily_totals_date ON nutrition_daily_totals (date)',
+        '''
+        INSERT INTO nutrition_daily_totals
+            (user_id, date, meal_type, entries, calories, protein, carbs, fat, fiber)
+        SELECT IFNULL(user_id, 0), date, IFNULL(meal_type, ''), COUNT(*),
+               IFNULL(SUM(calories), 0), IFNULL(SUM(protein), 0), IFNULL(SUM(carbs), 0),
+               IFNULL(SUM(fat), 0), IFNULL(SUM(fiber), 0)
+        FROM nutrition_logs
+        WHERE date IS NOT NULL
+        GROUP BY IFNULL(user_id, 0), date, IFNULL(meal_type, '')
+        '''
+    ]),
+]
+
+NUTRIENT_COLUMNS = ('calories', 'protein', 'carbs', 'fat', 'fiber')
+
+# Queries on the request path that must be served by an index (see db_migrations.find_table_scans)
+APP_HOT_QUERIES = {
+    'get_logs_by_date': ('SELECT * FROM nutrition_logs WHERE date = ? ORDER BY time', ('2024-01-01',)),
+    'get_user_logs_by_date': (
+        'SELECT * FROM nutrition_logs WHERE date = ? AND user_id = ? ORDER BY time', ('2024-01-01', 1)
+    ),
+    'get_daily_goals': ('SELECT calories, protein, carbs, fat FROM daily_goals ORDER BY date_modified DESC LIMIT 1', ()),
+    'user_by_username': ('SELECT * FROM users WHERE username = ?', ('user',)),
+    'summary_workout_logs': ('SELECT * FROM workout_logs WHERE user_id = ? ORDER BY date DESC LIMIT 5', (1,)),
+    'summary_nutrition_logs': ('SELECT * FROM nutrition_logs WHERE user_id = ? ORDER BY date DESC LIMIT 5', (1,)),
+    'summary_progress': ('SELECT * FROM progress_tracking WHERE user_id = ? ORDER BY date DESC', (1,)),
+    'summary_goals': ('SELECT * FROM daily_goals WHERE user_id = ? ORDER BY date_modified DESC LIMIT 1', (1,)),
+    'stats_weekly_workouts': (
+        "SELECT COUNT(*), SUM(duration) FROM workout_logs WHERE user_id = ? AND date >= date('now', '-7 days')",
+        (1,)
+    ),
+    'stats_today_nutrition': (
+        "SELECT SUM(calories) FROM nutrition_daily_totals WHERE user_id = ? AND date = date('now')",
+        (1,)
+    ),
+    'nutrition_totals_range': (
+        'SELECT date, SUM(calories) FROM nutrition_daily_totals WHERE date BETWEEN ? AND ? GROUP BY date',
+        ('2024-01-01', '2024-01-31')
+    ),
+}
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _add_to_daily_totals(cursor, user_id, date, meal_type, nutrients):
+    """Fold one nutrition log row into nutrition_daily_totals (same transaction as the insert)"""
+    cursor.execute('''
+        INSERT INTO nutrition_daily_totals
+        (user_id, date, meal_type, entries, calories, protein, carbs, fat, fiber)
+        VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, date, meal_type) DO UPDATE SET
+            entries = entries + 1,
+            calories = calories + excluded.calories,
+            protein = protein + excluded.protein,
+            carbs = carbs + excluded.carbs,
+            fat = fat + excluded.fat,
+            fiber = fiber + excluded.fiber
+    ''', (
+        user_id or 0,
+        date,
+        meal_type or '',
+        *[nutrients.get(column) or 0 for column in NUTRIENT_COLUMNS]
+    ))
+
+def _insert_food_logs(cursor, log_entries):
+    """Insert nutrition_logs rows and fold them into the daily totals (caller commits)"""
+    cursor.executemany('''
+        INSERT INTO nutrition_logs
+        (user_id, time, date, food_name, meal_type, serving_size, calories, protein, carbs, fat, fiber)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(
+        log_entry.get('user_id'),
+        log_entry['time'],
+        log_entry['date'],
+        log_entry['food_name'],
+        log_entry['meal_type'],
+        log_entry['serving_size'],
+        log_entry['calories'],
+        log_entry['protein'],
+        log_entry['carbs'],
+        log_entry['fat'],
+        log_entry['fiber']
+    ) for log_entry in log_entries])
+    for log_entry in log_entries:
+        _add_to_daily_totals(
+            cursor, log_entry.get('user_id'), log_entry['date'], log_entry['meal_type'], log_entry
+        )
+
+def _sum_totals(rows):
+    """Add up nutrient columns over totals rows"""
+    totals = {column: 0 for column in NUTRIENT_COLUMNS}
+    totals['entries'] = 0
+    for row in rows:
+        for column in totals:
+            totals[column] += row[column]
+    return totals
+
 class DatabaseManager:
     def __init__(self):
-        self.db_path = 'fitness_app.db'
-        self.conn = None
+        self.db_path = DB_PATH
+        self.pool = None
         self._connect()
         self._create_tables()
     
     def _connect(self):
-        """Create a database connection with proper settings"""
+        """Attach to the shared connection pool for the database"""
         try:
             # Ensure the database directory exists
             db_dir = os.path.dirname(self.db_path)
             if db_dir and not os.path.exists(db_dir):
                 os.makedirs(db_dir)
             
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.conn.row_factory = sqlite3.Row
-            self.conn.execute("PRAGMA foreign_keys = ON")
+            self.pool = get_pool(self.db_path)
             logger.info(f"Connected to database at {self.db_path}")
         except Exception as e:
             logger.error(f"Database connection error: {str(e)}")
@@ -36,108 +162,108 @@ class DatabaseManager:
     def _create_tables(self):
         """Create all required tables if they don't exist"""
         try:
-            cursor = self.conn.cursor()
-            
-            # Create users table
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                email TEXT,
-                password_hash TEXT NOT NULL,
-                height REAL,
-                weight REAL,
-                age INTEGER,
-                gender TEXT,
-                fitness_goal TEXT,
-                activity_level TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-            
-            # Create other tables...
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS workout_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                workout_type TEXT,
-                duration INTEGER,
-                calories_burned INTEGER,
-                date DATE,
-                notes TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-            ''')
-            
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS nutrition_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                time TEXT,
-                date TEXT,
-                food_name TEXT,
-                meal_type TEXT,
-                serving_size REAL,
-                calories REAL,
-                protein REAL,
-                carbs REAL,
-                fat REAL,
-                fiber REAL,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-            ''')
-            
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS progress_tracking (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                weight REAL,
-                body_fat REAL,
-                muscle_mass REAL,
-                date DATE,
-                notes TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-            ''')
-            
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS daily_goals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                calories INTEGER,
-                protein REAL,
-                carbs REAL,
-                fat REAL,
-                date_modified TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-            ''')
-            
-            self.conn.commit()
+            with self.pool.connection() as conn:
+                self._create_schema(conn)
+                apply_migrations(conn, APP_MIGRATIONS)
             logger.info("Database tables created successfully")
         except Exception as e:
             logger.error(f"Error creating tables: {str(e)}")
             raise
 
-    def __del__(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
-            logger.info("Database connection closed")
+    @staticmethod
+    def _create_schema(conn):
+        """Create the base tables on the given connection"""
+        cursor = conn.cursor()
+        # Create users table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            email TEXT,
+            password_hash TEXT NOT NULL,
+            height REAL,
+            weight REAL,
+            age INTEGER,
+            gender TEXT,
+            fitness_goal TEXT,
+            activity_level TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        
+        # Create other tables...
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS workout_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            workout_type TEXT,
+            duration INTEGER,
+            calories_burned INTEGER,
+            date DATE,
+            notes TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''')
+        
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS nutrition_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            time TEXT,
+            date TEXT,
+            food_name TEXT,
+            meal_type TEXT,
+            serving_size REAL,
+            calories REAL,
+            protein REAL,
+            carbs REAL,
+            fat REAL,
+            fiber REAL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''')
+        
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS progress_tracking (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            weight REAL,
+            body_fat REAL,
+            muscle_mass REAL,
+            date DATE,
+            notes TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''')
+        
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_goals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            calories INTEGER,
+            protein REAL,
+            carbs REAL,
+            fat REAL,
+            date_modified TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''')
+        conn.commit()
 
     def get_daily_goals(self):
         """Get daily nutrition goals"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT calories, protein, carbs, fat 
-                FROM daily_goals 
-                ORDER BY date_modified DESC 
-                LIMIT 1
-            ''')
-            result = cursor.fetchone()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT calories, protein, carbs, fat 
+                    FROM daily_goals 
+                    ORDER BY date_modified DESC 
+                    LIMIT 1
+                ''')
+                result = cursor.fetchone()
             if result:
                 return dict(result)
             return None
@@ -148,19 +274,22 @@ class DatabaseManager:
     def save_daily_goals(self, goals):
         """Save daily nutrition goals"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO daily_goals 
-                (calories, protein, carbs, fat, date_modified)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                goals['calories'],
-                goals['protein'],
-                goals['carbs'],
-                goals['fat'],
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            ))
-            self.conn.commit()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO daily_goals 
+                    (calories, protein, carbs, fat, date_modified)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (
+                    goals['calories'],
+                    goals['protein'],
+                    goals['carbs'],
+                    goals['fat'],
+                    datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                ))
+                conn.commit()
+            # Goals are not stored per user, so every summary may be stale
+            invalidate('user_summary')
             return True
         except Exception as e:
             logger.error(f"Error saving daily goals: {str(e)}")
@@ -168,65 +297,141 @@ class DatabaseManager:
 
     def add_food_log(self, log_entry):
         """Add a food log entry"""
+        return self.add_food_logs([log_entry])
+
+    def add_food_logs(self, log_entries):
+        """Add several food log entries (e.g. one analyzed meal) in a single transaction"""
+        if not log_entries:
+            return True
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO nutrition_logs 
-                (time, date, food_name, meal_type, serving_size, calories, protein, carbs, fat, fiber)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                log_entry['time'],
-                log_entry['date'],
-                log_entry['food_name'],
-                log_entry['meal_type'],
-                log_entry['serving_size'],
-                log_entry['calories'],
-                log_entry['protein'],
-                log_entry['carbs'],
-                log_entry['fat'],
-                log_entry['fiber']
-            ))
-            self.conn.commit()
+            with self.pool.connection() as conn:
+                _insert_food_logs(conn.cursor(), log_entries)
+                conn.commit()
+            for user_id in {log_entry.get('user_id') for log_entry in log_entries}:
+                invalidate('user_summary', user_id=user_id)
             return True
         except Exception as e:
-            logger.error(f"Error adding food log: {str(e)}")
+            logger.error(f"Error adding food logs: {str(e)}")
             return False
 
-    def get_logs_by_date(self, date):
-        """Get nutrition logs for a specific date"""
+    def get_logs_by_date(self, date, user_id=None):
+        """Get nutrition logs for a specific date (one user's, if user_id is given)"""
+        user_filter = 'AND user_id = ?' if user_id is not None else ''
+        params = (date,) + ((user_id,) if user_id is not None else ())
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT * FROM nutrition_logs 
-                WHERE date = ? 
-                ORDER BY time
-            ''', (date,))
-            return [dict(row) for row in cursor.fetchall()]
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT * FROM nutrition_logs 
+                    WHERE date = ? {user_filter}
+                    ORDER BY time
+                ''', params)
+                return [dict(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Error getting logs by date: {str(e)}")
             return []
 
-    def clear_logs_by_date(self, date):
-        """Clear nutrition logs for a specific date"""
+    def clear_logs_by_date(self, date, user_id=None):
+        """Clear nutrition logs for a specific date (only user_id's, if given)"""
+        user_filter = 'AND user_id = ?' if user_id is not None else ''
+        params = (date,) + ((user_id,) if user_id is not None else ())
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                DELETE FROM nutrition_logs 
-                WHERE date = ?
-            ''', (date,))
-            self.conn.commit()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    DELETE FROM nutrition_logs 
+                    WHERE date = ? {user_filter}
+                ''', params)
+                cursor.execute(f'DELETE FROM nutrition_daily_totals WHERE date = ? {user_filter}', params)
+                conn.commit()
+            invalidate('user_summary', user_id=user_id)
             return True
         except Exception as e:
             logger.error(f"Error clearing logs by date: {str(e)}")
             return False
 
+    def get_totals_by_day(self, start_date, end_date, user_id=None):
+        """
+        Per-day nutrition totals for an inclusive date range, read from
+        nutrition_daily_totals. Without a user_id all users are combined,
+        matching get_logs_by_date.
+        """
+        sums = ', '.join(f'SUM({column}) AS {column}' for column in NUTRIENT_COLUMNS)
+        user_filter = 'AND user_id = ?' if user_id is not None else ''
+        params = (start_date, end_date) + ((user_id,) if user_id is not None else ())
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT date, SUM(entries) AS entries, {sums}
+                    FROM nutrition_daily_totals
+                    WHERE date BETWEEN ? AND ? {user_filter}
+                    GROUP BY date
+                    ORDER BY date
+                ''', params)
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error getting nutrition totals: {str(e)}")
+            return []
+
+    def get_daily_totals(self, date, user_id=None):
+        """Nutrition totals for one day, overall and per meal type"""
+        user_filter = 'AND user_id = ?' if user_id is not None else ''
+        params = (date,) + ((user_id,) if user_id is not None else ())
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT meal_type, entries, {', '.join(NUTRIENT_COLUMNS)}
+                    FROM nutrition_daily_totals
+                    WHERE date = ? {user_filter}
+                ''', params)
+                rows = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Error getting daily totals: {str(e)}")
+            rows = []
+
+        meals = {}
+        for row in rows:
+            meals.setdefault(row['meal_type'], []).append(row)
+        totals = _sum_totals(rows)
+        totals['meals'] = {meal: _sum_totals(meal_rows) for meal, meal_rows in meals.items()}
+        return totals
+
+    def get_week_totals(self, date, user_id=None):
+        """Per-day and overall nutrition totals for the Monday-Sunday week containing date"""
+        day = datetime.strptime(str(date), '%Y-%m-%d').date()
+        start = day - timedelta(days=day.weekday())
+        return self._range_summary(start, start + timedelta(days=6), user_id)
+
+    def get_month_totals(self, date, user_id=None):
+        """Per-day and overall nutrition totals for the calendar month containing date"""
+        day = datetime.strptime(str(date), '%Y-%m-%d').date()
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return self._range_summary(start, end, user_id)
+
+    def _range_summary(self, start, end, user_id):
+        days = self.get_totals_by_day(start.isoformat(), end.isoformat(), user_id)
+        return {
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat(),
+            'days': days,
+            'totals': _sum_totals(days)
+        }
+
+    def get_pool_stats(self):
+        """Get connection pool counters (checkouts, waits, open connections)"""
+        return self.pool.get_stats()
+
+def db_connection():
+    """Check out a pooled connection to the app database (use as a context manager)"""
+    return get_pool(DB_PATH).connection()
+
 def get_db():
-    """Get a database connection"""
+    """Get a standalone database connection; the caller must close it"""
     try:
-        conn = sqlite3.connect('fitness_app.db', check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON")
-        return conn
+        return connect(DB_PATH, row_factory=sqlite3.Row, foreign_keys=True)
     except Exception as e:
         logger.error(f"Error creating database connection: {str(e)}")
         raise
@@ -234,11 +439,19 @@ def get_db():
 def reset_database():
     """Reset the database by removing the file and recreating it"""
     try:
-        # Close any existing connections
-        if os.path.exists('fitness_app.db'):
-            os.remove('fitness_app.db')
+        # Close any existing connections, including the shared DatabaseManager's pool
+        registry.invalidate('db_manager')
+        close_pool(DB_PATH)
+        stop_checkpointer(DB_PATH)
+        if os.path.exists(DB_PATH):
+            os.remove(DB_PATH)
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(DB_PATH + suffix):
+                    os.remove(DB_PATH + suffix)
             logger.info("Removed existing database file")
         
+        data_cache.clear()
+
         # Create new database
         db = DatabaseManager()
         logger.info("Database reset complete")
@@ -285,9 +498,10 @@ def create_user(username, name, password, email=None, weight=None, height=None,
     if len(password) < 6:
         return False, "Password must be at least 6 characters long"
     
+    pool = get_pool(DB_PATH)
     conn = None
     try:
-        conn = get_db()
+        conn = pool.checkout()
         cursor = conn.cursor()
         
         # Check if username exists
@@ -343,7 +557,7 @@ def create_user(username, name, password, email=None, weight=None, height=None,
         return False, f"Error creating account: {str(e)}"
     finally:
         if conn:
-            conn.close()
+            pool.checkin(conn)
 
 def verify_user(username, password):
     """
@@ -355,9 +569,10 @@ def verify_user(username, password):
     if not username or not password:
         return False, "Username and password are required"
     
+    pool = get_pool(DB_PATH)
     conn = None
     try:
-        conn = get_db()
+        conn = pool.checkout()
         cursor = conn.cursor()
         
         # Get user
@@ -384,13 +599,14 @@ def verify_user(username, password):
         return False, f"Error during verification: {str(e)}"
     finally:
         if conn:
-            conn.close()
+            pool.checkin(conn)
 
 def get_user_by_id(user_id):
     """Get user by ID"""
+    pool = get_pool(DB_PATH)
     conn = None
     try:
-        conn = get_db()
+        conn = pool.checkout()
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
         user = cursor.fetchone()
@@ -401,162 +617,155 @@ def get_user_by_id(user_id):
         return None
     finally:
         if conn:
-            conn.close()
+            pool.checkin(conn)
 
+@retry_on_locked
 def update_user_profile(user_id, data):
     """Update user profile information"""
-    conn = get_db()
-    c = conn.cursor()
+    with db_connection() as conn:
+        c = conn.cursor()
     
-    valid_fields = [
-        'name', 'height', 'weight', 'age', 'gender',
-        'fitness_goal', 'activity_level'
-    ]
+        valid_fields = [
+            'name', 'height', 'weight', 'age', 'gender',
+            'fitness_goal', 'activity_level'
+        ]
     
-    updates = []
-    values = []
+        updates = []
+        values = []
     
-    for field in valid_fields:
-        if field in data:
-            updates.append(f"{field} = ?")
-            values.append(data[field])
+        for field in valid_fields:
+            if field in data:
+                updates.append(f"{field} = ?")
+                values.append(data[field])
     
-    if updates:
-        updates.append("updated_at = CURRENT_TIMESTAMP")
-        query = f"UPDATE users SET {', '.join(updates)} WHERE id = ?"
-        values.append(user_id)
+        if updates:
+            updates.append("updated_at = CURRENT_TIMESTAMP")
+            query = f"UPDATE users SET {', '.join(updates)} WHERE id = ?"
+            values.append(user_id)
         
-        c.execute(query, values)
-        conn.commit()
+            c.execute(query, values)
+            conn.commit()
+    invalidate('user_summary', user_id=user_id)
     
     return get_user_by_id(user_id)
 
+@retry_on_locked
 def log_workout(user_id, workout_data):
     """Log a workout session"""
-    conn = get_db()
-    c = conn.cursor()
+    with db_connection() as conn:
+        c = conn.cursor()
     
-    c.execute('''
-        INSERT INTO workout_logs 
-        (user_id, workout_type, duration, calories_burned, date, notes)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (
-        user_id,
-        workout_data['type'],
-        workout_data['duration'],
-        workout_data['calories_burned'],
-        workout_data.get('date', datetime.now().date()),
-        workout_data.get('notes', '')
-    ))
+        c.execute('''
+            INSERT INTO workout_logs 
+            (user_id, workout_type, duration, calories_burned, date, notes)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            user_id,
+            workout_data['type'],
+            workout_data['duration'],
+            workout_data['calories_burned'],
+            workout_data.get('date', datetime.now().date()),
+            workout_data.get('notes', '')
+        ))
     
-    conn.commit()
-    conn.close()
+        conn.commit()
+    invalidate('user_summary', user_id=user_id)
 
+@retry_on_locked
 def log_nutrition(user_id, nutrition_data):
     """Log nutrition information"""
-    conn = get_db()
-    c = conn.cursor()
-    
+    now = datetime.now()
     # Support both old and new nutrition logging formats
     if 'food_items' in nutrition_data:
-        # New format
-        c.execute('''
-            INSERT INTO nutrition_logs 
-            (user_id, meal_type, food_items, calories, protein, carbs, fats, date)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            user_id,
-            nutrition_data['meal_type'],
-            json.dumps(nutrition_data['food_items']),
-            nutrition_data['calories'],
-            nutrition_data['protein'],
-            nutrition_data['carbs'],
-            nutrition_data['fats'],
-            nutrition_data.get('date', datetime.now().date())
-        ))
+        # New format: one row for the whole meal, named after its items
+        food_name = ', '.join(
+            str(item.get('name', '')) if isinstance(item, dict) else str(item)
+            for item in nutrition_data['food_items']
+        )
+        fat = nutrition_data['fats']
     else:
         # Old format
-        c.execute('''
-            INSERT INTO nutrition_logs 
-            (user_id, time, date, food_name, meal_type, serving_size, 
-             calories, protein, carbs, fat, fiber)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            user_id,
-            nutrition_data.get('time', datetime.now().strftime('%H:%M')),
-            nutrition_data.get('date', datetime.now().date()),
-            nutrition_data.get('food_name', ''),
-            nutrition_data['meal_type'],
-            nutrition_data.get('serving_size', 1.0),
-            nutrition_data['calories'],
-            nutrition_data['protein'],
-            nutrition_data['carbs'],
-            nutrition_data['fat'],
-            nutrition_data.get('fiber', 0.0)
-        ))
-    
-    conn.commit()
-    conn.close()
+        food_name = nutrition_data.get('food_name', '')
+        fat = nutrition_data['fat']
+    log_entry = {
+        'user_id': user_id,
+        'time': nutrition_data.get('time', now.strftime('%H:%M')),
+        'date': nutrition_data.get('date', now.date()),
+        'food_name': food_name,
+        'meal_type': nutrition_data['meal_type'],
+        'serving_size': nutrition_data.get('serving_size', 1.0),
+        'calories': nutrition_data['calories'],
+        'protein': nutrition_data['protein'],
+        'carbs': nutrition_data['carbs'],
+        'fat': fat,
+        'fiber': nutrition_data.get('fiber', 0.0)
+    }
+    with db_connection() as conn:
+        # Same insert path as DatabaseManager.add_food_logs: the row and its
+        # daily totals commit together
+        _insert_food_logs(conn.cursor(), [log_entry])
+        conn.commit()
+    invalidate('user_summary', user_id=user_id)
 
+@retry_on_locked
 def track_progress(user_id, progress_data):
     """Track user progress metrics"""
-    conn = get_db()
-    c = conn.cursor()
+    with db_connection() as conn:
+        c = conn.cursor()
     
-    c.execute('''
-        INSERT INTO progress_tracking 
-        (user_id, weight, body_fat, muscle_mass, date, notes)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (
-        user_id,
-        progress_data['weight'],
-        progress_data.get('body_fat'),
-        progress_data.get('muscle_mass'),
-        progress_data.get('date', datetime.now().date()),
-        progress_data.get('notes', '')
-    ))
+        c.execute('''
+            INSERT INTO progress_tracking 
+            (user_id, weight, body_fat, muscle_mass, date, notes)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            user_id,
+            progress_data['weight'],
+            progress_data.get('body_fat'),
+            progress_data.get('muscle_mass'),
+            progress_data.get('date', datetime.now().date()),
+            progress_data.get('notes', '')
+        ))
     
-    conn.commit()
-    conn.close()
+        conn.commit()
+    invalidate('user_summary', user_id=user_id)
 
+@cached('user_summary', user_arg='user_id')
 def get_user_stats(user_id):
     """Get user statistics and progress"""
-    conn = get_db()
-    c = conn.cursor()
-    
-    # Get latest progress tracking
-    c.execute('''
-        SELECT * FROM progress_tracking 
-        WHERE user_id = ? 
-        ORDER BY date DESC 
-        LIMIT 1
-    ''', (user_id,))
-    latest_progress = c.fetchone()
+    with db_connection() as conn:
+        c = conn.cursor()
     
-    # Get workout summary for the current week
-    c.execute('''
-        SELECT COUNT(*) as workout_count, 
-               SUM(duration) as total_duration,
-               SUM(calories_burned) as total_calories
-        FROM workout_logs 
-        WHERE user_id = ? 
-        AND date >= date('now', '-7 days')
-    ''', (user_id,))
-    workout_summary = c.fetchone()
+        # Get latest progress tracking
+        c.execute('''
+            SELECT * FROM progress_tracking 
+            WHERE user_id = ? 
+            ORDER BY date DESC 
+            LIMIT 1
+        ''', (user_id,))
+        latest_progress = c.fetchone()
     
-    # Get nutrition summary for today
-    c.execute('''
-        SELECT SUM(calories) as total_calories,
-               SUM(protein) as total_protein,
-               SUM(carbs) as total_carbs,
-               SUM(fat) as total_fats
-        FROM nutrition_logs 
-        WHERE user_id = ? 
-        AND date = date('now')
-    ''', (user_id,))
-    nutrition_summary = c.fetchone()
+        # Get workout summary for the current week
+        c.execute('''
+            SELECT COUNT(*) as workout_count, 
+                   SUM(duration) as total_duration,
+                   SUM(calories_burned) as total_calories
+            FROM workout_logs 
+            WHERE user_id = ? 
+            AND date >= date('now', '-7 days')
+        ''', (user_id,))
+        workout_summary = c.fetchone()
     
-    conn.close()
+        # Get nutrition summary for today
+        c.execute('''
+            SELECT SUM(calories) as total_calories,
+                   SUM(protein) as total_protein,
+                   SUM(carbs) as total_carbs,
+                   SUM(fat) as total_fats
+            FROM nutrition_daily_totals 
+            WHERE user_id = ? 
+            AND date = date('now')
+        ''', (user_id,))
+        nutrition_summary = c.fetchone()
     
     return {
         'progress': dict(latest_progress) if latest_progress else None,
@@ -567,9 +776,10 @@ def get_user_stats(user_id):
 def get_user_by_username(username):
     """Get user by username"""
     logger.info(f"Fetching user by username: {username}")
+    pool = get_pool(DB_PATH)
     conn = None
     try:
-        conn = get_db()
+        conn = pool.checkout()
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
         user = cursor.fetchone()
@@ -584,7 +794,7 @@ def get_user_by_username(username):
         return None
     finally:
         if conn:
-            conn.close()
+            pool.checkin(conn)
 
 # Reset and reinitialize the database when the module is imported
 # reset_database() 
\ No newline at end of file
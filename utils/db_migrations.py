@@ -0,0 +1,132 @@
+import sqlite3
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class Migration:
+    """A numbered schema change: a list of SQL statements or a callable taking the connection"""
+
+    def __init__(self, version, name, steps):
+        self.version = version
+        self.name = name
+        self.steps = steps
+
+    def apply(self, conn):
+        if callable(self.steps):
+            self.steps(conn)
+            return
+        for statement in self.steps:
+            conn.execute(statement)
+
+
+def get_schema_version(conn):
+    """Highest applied migration version (0 for a fresh database)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn, migrations):
+    """
+    Apply every migration newer than the recorded schema version, in order.
+    Each migration runs in its own write transaction and re-checks the version
+    after taking the lock, so concurrent startups apply it exactly once.
+    """
+    versions = [m.version for m in migrations]
+    if versions != sorted(set(versions)):
+        raise ValueError("Migration versions must be unique and in ascending order")
+
+    if conn.in_transaction:
+        conn.commit()
+    current = get_schema_version(conn)
+    conn.commit()
+
+    applied = []
+    for migration in migrations:
+        if migration.version <= current:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            current = get_schema_version(conn)
+            if migration.version <= current:
+                conn.rollback()
+                continue
+            migration.apply(conn)
+            conn.execute(
+                'INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+                (migration.version, migration.name, datetime.now().isoformat())
+            )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Migration {migration.version} ({migration.name}) failed: {str(e)}")
+            raise
+        current = migration.version
+        applied.append(migration.version)
+        logger.info(f"Applied migration {migration.version}: {migration.name}")
+    return applied
+
+
+def explain_query_plan(conn, sql, params=()):
+    """Return the detail column of EXPLAIN QUERY PLAN for a query"""
+    return [row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()]
+
+
+def is_table_scan(detail):
+    """A plan step that reads a whole table instead of searching an index"""
+    detail = detail.upper()
+    return detail.startswith('SCAN ') and 'USING' not in detail and 'CONSTANT ROW' not in detail
+
+
+def find_table_scans(conn, hot_queries):
+    """
+    Check registered hot queries against the live schema.
+    hot_queries maps a name to (sql, params); returns {name: [scan steps]} for offenders.
+    """
+    offenders = {}
+    for name, (sql, params) in hot_queries.items():
+        scans = [detail for detail in explain_query_plan(conn, sql, params) if is_table_scan(detail)]
+        if scans:
+            offenders[name] = scans
+    return offenders
+
+
+def check_databases():
+    """Migrate both databases in a scratch directory and report hot queries that scan"""
+    import tempfile
+    import os
+    from .db_manager import APP_MIGRATIONS, APP_HOT_QUERIES, DatabaseManager
+    from .workout_db import WORKOUT_MIGRATIONS, WORKOUT_HOT_QUERIES, WorkoutDatabase
+
+    offenders = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'app.db'))
+        DatabaseManager._create_schema(conn)
+        apply_migrations(conn, APP_MIGRATIONS)
+        offenders.update(find_table_scans(conn, APP_HOT_QUERIES))
+        conn.close()
+
+        conn = sqlite3.connect(os.path.join(tmp, 'workout.db'))
+        WorkoutDatabase._create_schema(conn)
+        apply_migrations(conn, WORKOUT_MIGRATIONS)
+        offenders.update(find_table_scans(conn, WORKOUT_HOT_QUERIES))
+        conn.close()
+    return offenders
+
+
+if __name__ == '__main__':
+    import sys
+    problems = check_databases()
+    for query_name, steps in problems.items():
+        print(f"{query_name}: {'; '.join(steps)}")
+    if problems:
+        sys.exit(1)
+    print("All hot queries use an index")
@@ -0,0 +1,185 @@
+import sqlite3
+import threading
+import queue
+import time
+import logging
+from contextlib import contextmanager
+
+from config import DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_HEALTH_CHECK_INTERVAL
+from .db_storage import connect
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the pool timeout"""
+
+
+class ConnectionPool:
+    """Bounded checkout/checkin pool of SQLite connections for one database file"""
+
+    def __init__(self, db_path, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._last_used = {}
+        self._closed = False
+        self.stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'created': 0,
+            'discarded': 0,
+            'timeouts': 0
+        }
+
+    def _new_connection(self):
+        """Open a new connection configured by the storage settings layer"""
+        return connect(self.db_path, row_factory=sqlite3.Row, foreign_keys=True)
+
+    def _is_healthy(self, conn):
+        """Run a trivial query on connections that have been idle for a while"""
+        last_used = self._last_used.get(id(conn), 0)
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding unhealthy connection to {self.db_path}: {str(e)}")
+            return False
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+            self.stats['discarded'] += 1
+
+    def checkout(self):
+        """Take a connection from the pool, opening a new one while below the size limit"""
+        if self._closed:
+            raise PoolTimeout(f"Connection pool for {self.db_path} is closed")
+
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        conn = self._new_connection()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                    with self._lock:
+                        self.stats['created'] += 1
+                else:
+                    started = time.monotonic()
+                    with self._lock:
+                        self.stats['waits'] += 1
+                    try:
+                        conn = self._idle.get(timeout=self.timeout)
+                    except queue.Empty:
+                        with self._lock:
+                            self.stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"Timed out after {self.timeout}s waiting for a connection to {self.db_path}"
+                        )
+                    finally:
+                        with self._lock:
+                            self.stats['wait_time'] += time.monotonic() - started
+
+            if self._is_healthy(conn):
+                with self._lock:
+                    self.stats['checkouts'] += 1
+                return conn
+            self._discard(conn)
+
+    def checkin(self, conn):
+        """Return a connection to the pool, rolling back anything left uncommitted"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        if self._closed:
+            self._discard(conn)
+            return
+
+        self._last_used[id(conn)] = time.monotonic()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out and always checks it back in"""
+        conn = self.checkout()
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            raise
+        finally:
+            self.checkin(conn)
+
+    def close(self):
+        """Close all idle connections; connections still checked out close on checkin"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def get_stats(self):
+        """Snapshot of the pool counters"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['open'] = self._created
+        stats['idle'] = self._idle.qsize()
+        stats['in_use'] = stats['open'] - stats['idle']
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path, size=None):
+    """Get the shared pool for a database file, creating it on first use"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(db_path, size=size or DB_POOL_SIZE)
+            _pools[db_path] = pool
+        return pool
+
+
+def close_pool(db_path):
+    """Close and forget the shared pool for a database file"""
+    with _pools_lock:
+        pool = _pools.pop(db_path, None)
+    if pool:
+        pool.close()
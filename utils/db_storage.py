@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+import random
+import time
+import logging
+from functools import wraps
+
+from config import SQLITE_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+
+def apply_pragmas(conn, settings=None):
+    """Apply journal mode, durability and cache PRAGMAs to a connection"""
+    settings = {**SQLITE_SETTINGS, **(settings or {})}
+    conn.execute(f"PRAGMA busy_timeout = {int(settings['busy_timeout_ms'])}")
+    mode = conn.execute(f"PRAGMA journal_mode = {settings['journal_mode']}").fetchone()[0]
+    if mode.upper() != settings['journal_mode'].upper():
+        logger.warning(f"Requested journal_mode {settings['journal_mode']} but SQLite is using {mode}")
+    conn.execute(f"PRAGMA synchronous = {settings['synchronous']}")
+    # A negative cache_size is interpreted by SQLite as KiB rather than pages
+    conn.execute(f"PRAGMA cache_size = -{int(settings['cache_size_kb'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(settings['mmap_size'])}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+def connect(db_path, row_factory=None, foreign_keys=False, settings=None):
+    """Open a SQLite connection configured with the shared storage settings"""
+    merged = {**SQLITE_SETTINGS, **(settings or {})}
+    conn = sqlite3.connect(
+        db_path,
+        timeout=merged['busy_timeout_ms'] / 1000,
+        check_same_thread=False
+    )
+    if row_factory is not None:
+        conn.row_factory = row_factory
+    apply_pragmas(conn, merged)
+    if foreign_keys:
+        conn.execute("PRAGMA foreign_keys = ON")
+    start_checkpointer(db_path, merged)
+    return conn
+
+
+def is_locked_error(error):
+    """Whether an OperationalError is a transient lock/busy condition"""
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def retry_on_locked(func=None, attempts=None, base_delay=None, max_delay=None):
+    """
+    Retry a database call with jittered exponential backoff while SQLite reports
+    the database as locked or busy. When the wrapped function is a method of an
+    object holding a single ``conn``, its open transaction is rolled back before
+    the next attempt.
+    """
+    attempts = attempts or SQLITE_SETTINGS['retry_attempts']
+    base_delay = base_delay or SQLITE_SETTINGS['retry_base_delay']
+    max_delay = max_delay or SQLITE_SETTINGS['retry_max_delay']
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            for attempt in range(attempts):
+                try:
+                    return fn(*args, **kwargs)
+                except sqlite3.OperationalError as e:
+                    if not is_locked_error(e) or attempt == attempts - 1:
+                        raise
+                    conn = getattr(args[0], 'conn', None) if args else None
+                    if isinstance(conn, sqlite3.Connection) and conn.in_transaction:
+                        conn.rollback()
+                    delay = min(max_delay, base_delay * (2 ** attempt))
+                    delay = random.uniform(delay / 2, delay)
+                    logger.warning(
+                        f"{fn.__name__}: database busy (attempt {attempt + 1}/{attempts}), "
+                        f"retrying in {delay:.3f}s"
+                    )
+                    time.sleep(delay)
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+class Checkpointer(threading.Thread):
+    """Daemon thread that periodically folds the WAL back into the main database file"""
+
+    def __init__(self, db_path, interval, mode='PASSIVE'):
+        super().__init__(name=f"wal-checkpoint:{db_path}", daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self.mode = mode
+        self._stop_event = threading.Event()
+        self.last_result = None
+
+    def checkpoint(self, mode=None):
+        """Run one checkpoint; returns (busy, wal_pages, checkpointed_pages)"""
+        conn = sqlite3.connect(self.db_path, timeout=SQLITE_SETTINGS['busy_timeout_ms'] / 1000)
+        try:
+            self.last_result = conn.execute(
+                f"PRAGMA wal_checkpoint({mode or self.mode})"
+            ).fetchone()
+            return self.last_result
+        finally:
+            conn.close()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.checkpoint()
+            except sqlite3.Error as e:
+                logger.warning(f"WAL checkpoint failed for {self.db_path}: {str(e)}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_checkpointers = {}
+_checkpointers_lock = threading.Lock()
+
+
+def start_checkpointer(db_path, settings=None):
+    """Start the periodic checkpoint thread for a database file once per process"""
+    settings = {**SQLITE_SETTINGS, **(settings or {})}
+    interval = settings['checkpoint_interval']
+    if not interval or db_path == ':memory:' or settings['journal_mode'].upper() != 'WAL':
+        return None
+    with _checkpointers_lock:
+        checkpointer = _checkpointers.get(db_path)
+        if checkpointer is None or not checkpointer.is_alive():
+            checkpointer = Checkpointer(db_path, interval)
+            checkpointer.start()
+            _checkpointers[db_path] = checkpointer
+        return checkpointer
+
+
+def stop_checkpointer(db_path):
+    """Stop the checkpoint thread for a database file, if one is running"""
+    with _checkpointers_lock:
+        checkpointer = _checkpointers.pop(db_path, None)
+    if checkpointer:
+        checkpointer.stop()
@@ -0,0 +1,213 @@
+import time
+import logging
+import threading
+
+import numpy as np
+from PIL import Image
+
+from config import (
+    FOOD_CLASSIFIER_ENABLED, FOOD_CLASSIFIER_WEIGHTS, FOOD_CLASSIFIER_ALPHA, FOOD_CLASSIFIER_MIN_CONFIDENCE,
+    FOOD_CLASSIFIER_TOP_K, FOOD_CLASSIFIER_BATCH_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+INPUT_SIZE = 224
+
+# ImageNet food classes and the food database entry each one stands for
+IMAGENET_FOODS = {
+    924: ('guacamole', 'Avocado'),
+    925: ('consomme', 'Bouillon'),
+    927: ('trifle', 'Sponge cake'),
+    928: ('ice cream', 'Ice cream'),
+    933: ('cheeseburger', 'Hamburger'),
+    935: ('mashed potato', 'Potatoes Mashed'),
+    936: ('head cabbage', 'Steamed cabbage'),
+    937: ('broccoli', 'Broccoli'),
+    938: ('cauliflower', 'Cauliflower'),
+    939: ('zucchini', 'Squash'),
+    940: ('spaghetti squash', 'Squash'),
+    941: ('acorn squash', 'Squash'),
+    942: ('butternut squash', 'Squash'),
+    943: ('cucumber', 'Cucumbers'),
+    944: ('artichoke', 'Artichoke'),
+    945: ('bell pepper', 'Peppers Raw, green, sweet'),
+    947: ('mushroom', 'Mushrooms'),
+    948: ('Granny Smith', 'Apples, raw'),
+    949: ('strawberry', 'Strawberries'),
+    950: ('orange', 'Oranges'),
+    952: ('fig', 'Fresh, raw figs'),
+    953: ('pineapple', 'Pineapple'),
+    954: ('banana', 'Banana'),
+    959: ('carbonara', 'Spaghetti'),
+    960: ('chocolate sauce', 'Chocolate syrup'),
+    963: ('pizza', 'Pizza'),
+    964: ('potpie', 'Pot-pie'),
+    966: ('red wine', 'Wine'),
+    967: ('espresso', 'Coffee'),
+    987: ('corn', 'Corn')
+}
+
+
+def preprocess_food_image(images):
+    """
+    Resize RGB PIL images to 224x224 and scale pixels to [-1, 1] as MobileNetV2
+    expects, stacked into one float32 batch.
+    """
+    batch = np.empty((len(images), INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+    for position, image in enumerate(images):
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        batch[position] = np.asarray(image.resize((INPUT_SIZE, INPUT_SIZE), Image.Resampling.BILINEAR))
+    batch /= 127.5
+    batch -= 1.0
+    return batch
+
+
+class FoodClassifier:
+    """
+    MobileNetV2 (ImageNet) run on the CPU as a first pass before Gemini Vision.
+
+    The model is built on first use, once per process, and photos are scored
+    in batches. A photo whose most likely food class reaches min_confidence is
+    answered from the food database entry mapped to that class; anything less
+    certain (mixed plates, dishes ImageNet does not know) returns None so the
+    caller falls back to the remote vision model. If TensorFlow or the weights
+    are unavailable the classifier disables itself and everything falls back.
+    """
+
+    def __init__(self, food_db, weights=FOOD_CLASSIFIER_WEIGHTS, alpha=FOOD_CLASSIFIER_ALPHA,
+                 min_confidence=FOOD_CLASSIFIER_MIN_CONFIDENCE, top_k=FOOD_CLASSIFIER_TOP_K,
+                 batch_size=FOOD_CLASSIFIER_BATCH_SIZE, enabled=FOOD_CLASSIFIER_ENABLED):
+        self.food_db = food_db
+        self.weights = weights
+        self.alpha = alpha
+        self.min_confidence = min_confidence
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self.enabled = enabled
+        self._model = None
+        self._lock = threading.Lock()
+        self.foods = self._resolve_foods()
+        self.stats = {'images': 0, 'batches': 0, 'confident': 0, 'fallbacks': 0, 'load_seconds': 0.0,
+                      'inference_seconds': 0.0}
+
+    def _resolve_foods(self):
+        """class index -> (label, food database record) for labels found in the table"""
+        foods = {}
+        for index, (label, query) in IMAGENET_FOODS.items():
+            results = self.food_db.search_food(query, limit=1)
+            if results:
+                foods[index] = (label, results[0])
+            else:
+                logger.warning(f"No food database entry for classifier label {label!r} ({query!r})")
+        return foods
+
+    def _load(self):
+        """Build the model on first use; returns None once loading has failed"""
+        if self._model is not None or not self.enabled:
+            return self._model
+        started = time.perf_counter()
+        try:
+            import tensorflow as tf
+            model = tf.keras.applications.MobileNetV2(
+                input_shape=(INPUT_SIZE, INPUT_SIZE, 3), alpha=self.alpha, weights=self.weights
+            )
+            # A traced graph with a variable batch dimension avoids eager per-layer overhead
+            infer = tf.function(
+                lambda batch: model(batch, training=False),
+                input_signature=[tf.TensorSpec((None, INPUT_SIZE, INPUT_SIZE, 3), tf.float32)]
+            )
+            # Trace once so the first real photo does not pay for graph building
+            infer(np.zeros((1, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32))
+        except Exception as e:
+            logger.error(f"Food classifier unavailable, using Gemini Vision only: {str(e)}")
+            self.enabled = False
+            return None
+        self._model = infer
+        self.stats['load_seconds'] = time.perf_counter() - started
+        logger.info(f"Loaded food classifier in {self.stats['load_seconds']:.1f}s")
+        return infer
+
+    @property
+    def available(self):
+        with self._lock:
+            return self._load() is not None
+
+    def predict(self, images):
+        """(N, 1000) class probabilities for PIL images, scored batch_size at a time"""
+        with self._lock:
+            model = self._load()
+            if model is None:
+                return None
+            started = time.perf_counter()
+            probabilities = []
+            for start in range(0, len(images), self.batch_size):
+                batch = preprocess_food_image(images[start:start + self.batch_size])
+                probabilities.append(model(batch).numpy())
+                self.stats['batches'] += 1
+            self.stats['images'] += len(images)
+            self.stats['inference_seconds'] += time.perf_counter() - started
+        return np.concatenate(probabilities)
+
+    def classify(self, images):
+        """
+        Per image, a dict with the best food 'label', its 'food' database record,
+        'confidence', whether it is 'confident' enough to skip Gemini, and the
+        top_k 'candidates'. Returns None per image when the model is unavailable.
+        """
+        if not images:
+            return []
+        probabilities = self.predict(images)
+        if probabilities is None:
+            return [None] * len(images)
+        food_classes = np.fromiter(self.foods, dtype=np.intp)
+        results = []
+        for row in probabilities:
+            best = food_classes[np.argmax(row[food_classes])]
+            label, food = self.foods[best]
+            confidence = float(row[best])
+            top = np.argsort(row)[::-1][:self.top_k]
+            results.append({
+                'label': label,
+                'food': food,
+                'confidence': confidence,
+                'confident': confidence >= self.min_confidence,
+                'candidates': [
+                    (self.foods[index][0] if index in self.foods else None, float(row[index])) for index in top
+                ]
+            })
+            self.stats['confident' if confidence >= self.min_confidence else 'fallbacks'] += 1
+        return results
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['ms_per_image'] = 1000 * stats['inference_seconds'] / stats['images'] if stats['images'] else 0.0
+        stats['enabled'] = self.enabled
+        return stats
+
+
+def local_analysis(prediction):
+    """
+    A confident classifier prediction as an analysis shaped like the Gemini one
+    (meal, food-database items, cache distance), using the entry's listed serving.
+    """
+    food = prediction['food']
+    item = {
+        'name': prediction['label'],
+        'food_name': food['Food'],
+        'food_id': food['food_id'],
+        'grams': float(food['Grams']),
+        'source': 'database',
+        'calories': float(food['Calories']),
+        'protein': float(food['Protein']),
+        'carbs': float(food['Carbs']),
+        'fat': float(food['Fat']),
+        'fiber': float(food['Fiber'])
+    }
+    meal = {
+        'items': [{key: item[key] for key in ('name', 'grams', 'calories', 'protein', 'carbs', 'fat', 'fiber')}],
+        'confidence': prediction['confidence'],
+        'notes': f"Recognized on-device as {prediction['label']}; nutrients are for one {food['Measure']} serving."
+    }
+    return {'meal': meal, 'items': [item], 'distance': None, 'local': True}
@@ -1,15 +1,53 @@
+import time
 import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from config import FOOD_SEARCH_FUZZY_THRESHOLD, FOOD_SEARCH_FUZZY_MAX_EDITS, FOOD_SNAPSHOT_DIR
+from .food_search import FoodSearchIndex
+from .food_snapshot import load_snapshot, write_snapshot
+from .cache_policy import cached, invalidate
+
+# Columns held in the float32 nutrient matrices, in column order
+NUTRIENT_COLUMNS = ['Calories', 'Protein', 'Fat', 'Sat.Fat', 'Fiber', 'Carbs']
+NUMERIC_COLUMNS = ['Grams'] + NUTRIENT_COLUMNS
+TEXT_COLUMNS = ['Food', 'Measure', 'Category']
+
 class FoodDatabase:
-    def __init__(self):
-        self.db_path = Path('data/food_database.csv')
+    def __init__(self, db_path='data/food_database.csv', snapshot_dir=FOOD_SNAPSHOT_DIR):
+        self.db_path = Path(db_path)
+        self.snapshot_dir = Path(snapshot_dir)
         self.foods_df = None
+        self.load_stats = {}
+        self.search_index = FoodSearchIndex([])
+        self._columns = {}
+        self._size = 0
+        self.nutrients = np.zeros((0, len(NUTRIENT_COLUMNS)), dtype=np.float32)
+        self.per_gram = self.nutrients
+        self.grams = np.zeros(0, dtype=np.float32)
         self.load_database()
         
     def load_database(self):
-        """Load and preprocess the food database"""
+        """Load the food database from its compiled snapshot, rebuilding it from the CSV if stale"""
+        started = time.perf_counter()
+        arrays, meta = load_snapshot(self.db_path, self.snapshot_dir)
+        if arrays is not None:
+            self._load_snapshot_arrays(arrays, meta)
+            source = 'snapshot'
+        else:
+            self._load_csv()
+            self._build_indexes()
+            self._save_snapshot()
+            source = 'csv'
+        invalidate('food_categories')
+        self.load_stats = {
+            'source': source,
+            'rows': self._size,
+            'seconds': time.perf_counter() - started
+        }
+
+    def _load_csv(self):
+        """Parse and clean data/food_database.csv"""
         try:
             self.foods_df = pd.read_csv(self.db_path)
             # Clean up column names
@@ -23,71 +61,146 @@ class FoodDatabase:
                     self.foods_df[col] = self.foods_df[col].replace('t', '0.1')
                     # Convert to numeric, replacing errors with 0
                     self.foods_df[col] = pd.to_numeric(self.foods_df[col], errors='coerce').fillna(0)
+                    # float64 throughout so CSV and snapshot loads produce identical rows
+                    self.foods_df[col] = self.foods_df[col].astype(np.float64)
             
         except Exception as e:
             print(f"Error loading food database: {e}")
             self.foods_df = pd.DataFrame()
+
+    def _save_snapshot(self):
+        """Write the parsed table as memory-mappable arrays for the next load"""
+        columns = list(self.foods_df.columns)
+        if self.foods_df.empty or set(columns) != set(TEXT_COLUMNS + NUMERIC_COLUMNS):
+            return
+        arrays = {col: self.foods_df[col].fillna('').astype(str).to_numpy(dtype=str) for col in TEXT_COLUMNS}
+        arrays['numeric'] = self.foods_df[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+        arrays['nutrients'] = self.nutrients
+        arrays['per_gram'] = self.per_gram
+        try:
+            write_snapshot(self.db_path, self.snapshot_dir, arrays, columns)
+        except OSError as e:
+            print(f"Error writing food database snapshot: {e}")
+
+    def _load_snapshot_arrays(self, arrays, meta):
+        """Rebuild foods_df and the indexes from memory-mapped snapshot arrays"""
+        data = {col: arrays[col] for col in TEXT_COLUMNS}
+        for position, col in enumerate(NUMERIC_COLUMNS):
+            data[col] = arrays['numeric'][:, position]
+        self.foods_df = pd.DataFrame(data, columns=meta['columns'])
+        self._build_indexes(nutrients=arrays['nutrients'], per_gram=arrays['per_gram'])
+
+    def _build_indexes(self, nutrients=None, per_gram=None):
+        """
+        Build the name index, row records and nutrient matrices from foods_df.
+        Precomputed (e.g. memory-mapped) matrices are used as-is when given.
+        """
+        if self.foods_df.empty or 'Food' not in self.foods_df.columns:
+            self.search_index = FoodSearchIndex([])
+            self._columns = {}
+            self._size = 0
+            return
+        self.search_index = FoodSearchIndex(self.foods_df['Food'].fillna('').tolist())
+        # Plain per-column lists; rows are assembled only for foods actually returned
+        self._columns = {col: self.foods_df[col].tolist() for col in self.foods_df.columns}
+        self._size = len(self.foods_df)
+
+        self.grams = self.foods_df['Grams'].to_numpy(dtype=np.float32)
+        if nutrients is not None and per_gram is not None:
+            self.nutrients = nutrients
+            self.per_gram = per_gram
+            return
+
+        # Row i of each matrix is food_id i; per_gram rows are zero where Grams is 0
+        self.nutrients = np.ascontiguousarray(
+            self.foods_df.reindex(columns=NUTRIENT_COLUMNS, fill_value=0).to_numpy(dtype=np.float32)
+        )
+        self.per_gram = np.zeros_like(self.nutrients)
+        np.divide(self.nutrients, self.grams[:, None], out=self.per_gram, where=self.grams[:, None] > 0)
     
-    def search_food(self, query, limit=10):
-        """Search for foods by name"""
+    def _record(self, food_id):
+        """One food as a dict of its columns plus its food_id"""
+        record = {col: values[food_id] for col, values in self._columns.items()}
+        record['food_id'] = int(food_id)
+        return record
+
+    def search_food(self, query, limit=10, fuzzy=False, threshold=FOOD_SEARCH_FUZZY_THRESHOLD,
+                    max_edits=FOOD_SEARCH_FUZZY_MAX_EDITS):
+        """Search for foods by name; fuzzy=True also matches misspelled words"""
         if self.foods_df is None or self.foods_df.empty:
             return []
         
-        # Convert query to lowercase for case-insensitive search
-        query = query.lower()
-        mask = self.foods_df['Food'].str.lower().str.contains(query, na=False)
-        matches = self.foods_df[mask].head(limit)
-        
-        # Convert to list of dictionaries
-        return matches.to_dict('records')
+        # Ranked token/prefix lookup; rows come from the prebuilt records
+        positions = self.search_index.search(
+            query, limit, fuzzy=fuzzy, threshold=threshold, max_edits=max_edits
+        )
+        return [self._record(i) for i in positions]
     
+    @cached('food_categories')
     def get_categories(self):
         """Get list of all unique food categories"""
         if self.foods_df is None or self.foods_df.empty:
             return []
         return sorted(self.foods_df['Category'].unique().tolist())
     
+    @cached('food_categories')
     def get_foods_by_category(self, category):
         """Get all foods in a specific category"""
         if self.foods_df is None or self.foods_df.empty:
             return []
         
-        category_foods = self.foods_df[self.foods_df['Category'] == category]
-        return category_foods.to_dict('records')
+        ids = np.flatnonzero(self.foods_df['Category'].to_numpy() == category)
+        return [self._record(i) for i in ids]
     
     def get_foods_by_nutrient(self, nutrient, min_value=None, max_value=None, limit=10):
         """Get foods filtered by nutrient value"""
         if self.foods_df is None or self.foods_df.empty:
             return []
         
-        df = self.foods_df.copy()
-        
+        ids = self.filter_by_nutrient(nutrient, min_value, max_value)
+        # Stable sort keeps file order among equal values, like DataFrame.nlargest
+        values = self.nutrients[ids, NUTRIENT_COLUMNS.index(nutrient)]
+        top = ids[np.argsort(-values, kind='stable')[:limit]]
+        return [self._record(i) for i in top]
+
+    def filter_by_nutrient(self, nutrient, min_value=None, max_value=None):
+        """food_ids whose per-serving nutrient value lies in [min_value, max_value]"""
+        column = self.nutrients[:, NUTRIENT_COLUMNS.index(nutrient)]
+        mask = np.ones(len(column), dtype=bool)
         if min_value is not None:
-            df = df[df[nutrient] >= min_value]
+            mask &= column >= min_value
         if max_value is not None:
-            df = df[df[nutrient] <= max_value]
-            
-        return df.nlargest(limit, nutrient).to_dict('records')
+            mask &= column <= max_value
+        return np.flatnonzero(mask)
+
+    def scale_servings(self, food_ids, grams):
+        """Nutrients for N foods at N gram amounts, as an (N, len(NUTRIENT_COLUMNS)) float32 array"""
+        food_ids = np.asarray(food_ids, dtype=np.intp)
+        grams = np.asarray(grams, dtype=np.float32)
+        return self.per_gram[food_ids] * grams[:, None]
+
+    def day_totals(self, food_ids, grams):
+        """Summed nutrients for a day's (or meal's) foods with one matrix-vector product"""
+        amounts = np.bincount(
+            np.asarray(food_ids, dtype=np.intp),
+            weights=np.asarray(grams, dtype=np.float64),
+            minlength=len(self.per_gram)
+        ).astype(np.float32)
+        totals = amounts @ self.per_gram
+        return dict(zip(NUTRIENT_COLUMNS, totals.tolist()))
     
     def calculate_serving(self, food_id, desired_grams):
         """Calculate nutritional values for a custom serving size"""
         if self.foods_df is None or self.foods_df.empty:
             return None
             
-        food = self.foods_df.iloc[food_id]
-        if food is None:
+        if not 0 <= food_id < self._size:
             return None
             
-        # Calculate multiplier based on desired grams
-        multiplier = desired_grams / food['Grams']
+        values = self.scale_servings([food_id], [desired_grams])[0]
         
         return {
-            'Food': food['Food'],
+            'Food': self._columns['Food'][food_id],
             'Measure': f"{desired_grams}g",
-            'Calories': food['Calories'] * multiplier,
-            'Protein': food['Protein'] * multiplier,
-            'Fat': food['Fat'] * multiplier,
-            'Sat.Fat': food['Sat.Fat'] * multiplier,
-            'Fiber': food['Fiber'] * multiplier,
-            'Carbs': food['Carbs'] * multiplier
+            **dict(zip(NUTRIENT_COLUMNS, values.tolist()))
         } 
\ No newline at end of file
@@ -0,0 +1,219 @@
+import re
+import heapq
+from bisect import bisect_left
+from collections import defaultdict, Counter
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Match quality of a query token against a food name token
+EXACT = 3
+PREFIX = 2
+INFIX = 1
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens of a food name or query"""
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def trigrams(token):
+    """Character trigrams of a token, padded so short words and word starts count"""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_levenshtein(a, b, max_distance):
+    """Edit distance between a and b, or None as soon as it must exceed max_distance"""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if min(current) > max_distance:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+class FoodSearchIndex:
+    """
+    In-memory search index over food names, built once per food table.
+
+    Every name is split into tokens. An inverted index maps each token to the
+    foods containing it, and a sorted copy of the vocabulary answers prefix
+    lookups with bisect, which is what a prefix trie gives us at a fraction of
+    the memory. A query token matches a food token exactly, as a prefix (the
+    word being typed) or, as a last resort, anywhere inside it. Foods matching
+    every query token are ranked by summed match quality, then by shorter name.
+
+    Fuzzy mode adds misspelled tokens: vocabulary tokens sharing enough
+    character trigrams with the query token are re-ranked by a bounded edit
+    distance and match with a quality below any exact, prefix or infix hit.
+    """
+
+    def __init__(self, names):
+        self.names = [str(name) for name in names]
+        self._doc_tokens = [frozenset(tokenize(name)) for name in self.names]
+
+        # Rank of each food among equally good matches: shorter names first
+        order = sorted(range(len(self.names)), key=lambda doc: (len(self.names[doc]), doc))
+        self._rank = [0] * len(self.names)
+        for rank, doc in enumerate(order):
+            self._rank[doc] = rank
+
+        # Postings are appended in rank order, so each list is already sorted by rank
+        postings = defaultdict(list)
+        for doc in order:
+            for token in self._doc_tokens[doc]:
+                postings[token].append(doc)
+        self._postings = dict(postings)
+        self._vocab = sorted(self._postings)
+
+        # Trigram -> positions in self._vocab, for fuzzy candidate generation
+        trigram_postings = defaultdict(list)
+        self._trigram_counts = []
+        for position, token in enumerate(self._vocab):
+            token_trigrams = trigrams(token)
+            self._trigram_counts.append(len(token_trigrams))
+            for trigram in token_trigrams:
+                trigram_postings[trigram].append(position)
+        self._trigrams = dict(trigram_postings)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _fuzzy(self, token, threshold, max_edits):
+        """
+        Misspelling candidates for a query token as {vocab_token: similarity}.
+        Candidates need a trigram similarity of at least threshold and an edit
+        distance of at most max_edits; similarity is 1 - distance / length.
+        """
+        query_trigrams = trigrams(token)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self._trigrams.get(trigram, ()))
+
+        if max_edits is None:
+            max_edits = max(1, len(token) // 4)
+        matches = {}
+        for position, count in shared.items():
+            union = len(query_trigrams) + self._trigram_counts[position] - count
+            if count / union < threshold:
+                continue
+            vocab_token = self._vocab[position]
+            distance = bounded_levenshtein(token, vocab_token, max_edits)
+            if distance:
+                matches[vocab_token] = 1 - distance / max(len(token), len(vocab_token))
+        return matches
+
+    def _expand(self, token, infix=False, fuzzy=None):
+        """
+        Vocabulary tokens matching a query token, as {vocab_token: quality}.
+        fuzzy is None or a (threshold, max_edits) pair enabling misspelling matches.
+        """
+        matches = {}
+        start = bisect_left(self._vocab, token)
+        for vocab_token in self._vocab[start:]:
+            if not vocab_token.startswith(token):
+                break
+            matches[vocab_token] = EXACT if vocab_token == token else PREFIX
+        if infix:
+            for vocab_token in self._vocab:
+                if vocab_token not in matches and token in vocab_token:
+                    matches[vocab_token] = INFIX
+        if fuzzy:
+            for vocab_token, similarity in self._fuzzy(token, *fuzzy).items():
+                matches.setdefault(vocab_token, similarity)
+        return matches
+
+    def _single_token(self, matches, limit):
+        """Top foods for one query token, walking quality tiers lazily"""
+        results = []
+        seen = set()
+        for quality in sorted(set(matches.values()), reverse=True):
+            lists = [self._postings[t] for t, q in matches.items() if q == quality]
+            for doc in heapq.merge(*lists, key=self._rank.__getitem__):
+                if doc not in seen:
+                    seen.add(doc)
+                    results.append(doc)
+                    if len(results) >= limit:
+                        return results
+        return results
+
+    def _multi_token(self, expansions, limit):
+        """Top foods matching every query token, scored by summed match quality"""
+        # Enumerate candidates from the most selective query token only
+        sizes = [sum(len(self._postings[t]) for t in matches) for matches in expansions]
+        pivot = sizes.index(min(sizes))
+        others_best = sum(max(matches.values()) for i, matches in enumerate(expansions) if i != pivot)
+        keyed = [(matches, frozenset(matches)) for matches in expansions]
+
+        scored = []
+        seen = set()
+        for quality in sorted(set(expansions[pivot].values()), reverse=True):
+            # Candidates arrive in rank order within a tier, so once `limit` foods
+            # reach the best score still possible, nothing later can displace them
+            bound = quality + others_best
+            reached = sum(1 for score, _, _ in scored if -score >= bound)
+            if reached >= limit:
+                break
+            lists = [self._postings[t] for t, q in expansions[pivot].items() if q == quality]
+            for doc in heapq.merge(*lists, key=self._rank.__getitem__):
+                if doc in seen:
+                    continue
+                seen.add(doc)
+                score = self._score(doc, keyed)
+                if score:
+                    scored.append((-score, self._rank[doc], doc))
+                    if score >= bound:
+                        reached += 1
+                        if reached >= limit:
+                            break
+            else:
+                continue
+            break
+        return [doc for _, _, doc in heapq.nsmallest(limit, scored)]
+
+    def _score(self, doc, expansions):
+        """Summed best match quality of each query token, or 0 if any token is unmatched"""
+        doc_tokens = self._doc_tokens[doc]
+        score = 0
+        for matches, keys in expansions:
+            hits = doc_tokens.intersection(keys)
+            if not hits:
+                return 0
+            score += max(matches[t] for t in hits)
+        return score
+
+    def search(self, query, limit=10, fuzzy=False, threshold=0.3, max_edits=None):
+        """
+        Positions of the best matching foods for a query, best first (at most limit).
+        With fuzzy=True, misspelled tokens are matched when exact, prefix and
+        infix matches leave fewer than limit results.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or limit <= 0:
+            return []
+
+        results = []
+        # Infix and fuzzy matching scan more of the vocabulary, so only fall back to them when needed
+        passes = [(False, None), (True, None)]
+        if fuzzy:
+            passes.append((True, (threshold, max_edits)))
+        for infix, fuzzy_options in passes:
+            expansions = [self._expand(token, infix, fuzzy_options) for token in tokens]
+            if not all(expansions):
+                continue
+            if len(tokens) == 1:
+                results = self._single_token(expansions[0], limit)
+            else:
+                results = self._multi_token(expansions, limit)
+            if len(results) >= limit:
+                break
+        return results
@@ -0,0 +1,113 @@
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the snapshot files changes
+SNAPSHOT_VERSION = 1
+META_FILE = 'meta.json'
+
+
+def csv_fingerprint(csv_path, with_hash=True):
+    """mtime, size and (optionally) SHA-256 of the source CSV"""
+    stat = os.stat(csv_path)
+    fingerprint = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(csv_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        fingerprint['sha256'] = digest.hexdigest()
+    return fingerprint
+
+
+def _read_meta(snapshot_dir):
+    try:
+        with open(Path(snapshot_dir) / META_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(snapshot_dir, meta):
+    """Replace meta.json atomically so readers never see a half-written file"""
+    path = Path(snapshot_dir) / META_FILE
+    tmp = path.with_name(f"{META_FILE}.{os.getpid()}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, path)
+
+
+def write_snapshot(csv_path, snapshot_dir, arrays, columns):
+    """
+    Save arrays as .npy files next to a meta.json describing the CSV they came from.
+    File names carry the CSV hash, and meta.json is swapped in last, so a reader
+    always sees either the old complete snapshot or the new one.
+    """
+    snapshot_dir = Path(snapshot_dir)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    fingerprint = csv_fingerprint(csv_path)
+    prefix = fingerprint['sha256'][:16]
+
+    files = {}
+    for name, array in arrays.items():
+        filename = f"{prefix}.{name}.npy"
+        tmp = snapshot_dir / f"{filename}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.save(f, np.ascontiguousarray(array), allow_pickle=False)
+        os.replace(tmp, snapshot_dir / filename)
+        files[name] = filename
+
+    previous = _read_meta(snapshot_dir)
+    _write_meta(snapshot_dir, {
+        'version': SNAPSHOT_VERSION,
+        'source': str(csv_path),
+        'columns': columns,
+        'rows': len(next(iter(arrays.values()))) if arrays else 0,
+        'files': files,
+        **fingerprint
+    })
+
+    # Remove files from the snapshot this one replaced
+    if previous and previous.get('files'):
+        for filename in set(previous['files'].values()) - set(files.values()):
+            try:
+                (snapshot_dir / filename).unlink()
+            except OSError:
+                pass
+
+
+def load_snapshot(csv_path, snapshot_dir):
+    """
+    Memory-map the snapshot arrays if they still match the CSV, else return None.
+    A matching mtime and size is trusted; otherwise the CSV is hashed, and an
+    unchanged hash (e.g. after a checkout touched the file) just refreshes meta.json.
+    """
+    meta = _read_meta(snapshot_dir)
+    if not meta or meta.get('version') != SNAPSHOT_VERSION:
+        return None, None
+    try:
+        fingerprint = csv_fingerprint(csv_path, with_hash=False)
+    except OSError:
+        return None, None
+
+    if (fingerprint['mtime_ns'], fingerprint['size']) != (meta.get('mtime_ns'), meta.get('size')):
+        fingerprint = csv_fingerprint(csv_path)
+        if fingerprint['sha256'] != meta.get('sha256'):
+            return None, None
+        _write_meta(snapshot_dir, {**meta, **fingerprint})
+
+    try:
+        arrays = {
+            name: np.load(Path(snapshot_dir) / filename, mmap_mode='r', allow_pickle=False)
+            for name, filename in meta['files'].items()
+        }
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable food snapshot in {snapshot_dir}: {str(e)}")
+        return None, None
+    return arrays, meta
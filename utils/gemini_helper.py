@@ -1,30 +1,61 @@
-import google.generativeai as genai
+import asyncio
+import threading
 from config import GEMINI_API_KEY, GEMINI_MODEL, GEMINI_VISION_MODEL
+from .rate_limiter import get_rate_limiter, estimate_tokens
 
-# Configure the Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
+_genai = None
+_genai_lock = threading.Lock()
+
+def get_genai():
+    """google.generativeai, imported and configured with GEMINI_API_KEY on first use"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                # The SDK takes ~0.5s to import, so pages that never call Gemini don't pay for it
+                import google.generativeai as genai
+                genai.configure(api_key=GEMINI_API_KEY)
+                _genai = genai
+    return _genai
 
 class GeminiHelper:
     @staticmethod
     def get_text_model():
         """Get the text-only Gemini model."""
-        return genai.GenerativeModel(GEMINI_MODEL)
+        return get_genai().GenerativeModel(GEMINI_MODEL)
 
     @staticmethod
     def get_vision_model():
         """Get the multimodal Gemini model for vision tasks."""
-        return genai.GenerativeModel(GEMINI_VISION_MODEL)
+        return get_genai().GenerativeModel(GEMINI_VISION_MODEL)
+
+    @staticmethod
+    async def _generate(model, contents, prompt, images, temperature):
+        """One call within the shared Gemini quota; the ticket is settled with the reported usage"""
+        limiter = get_rate_limiter()
+        # acquire() blocks while the request is queued, so it waits off the event loop
+        ticket = await asyncio.to_thread(limiter.acquire, estimate_tokens(prompt, images=images))
+        usage = None
+        try:
+            response = await model.generate_content_async(contents, generation_config={"temperature": temperature})
+            usage = getattr(response.usage_metadata, 'total_token_count', None)
+        except Exception as e:
+            if "quota" in str(e).lower() or "429" in str(e):
+                limiter.report_throttled()
+            raise
+        finally:
+            # A failed call reports no usage and produced no output: charge only its input
+            limiter.settle(ticket, usage or estimate_tokens(prompt, images=images, output_tokens=0))
+        return response.text
 
     @staticmethod
     async def generate_response(prompt, temperature=0.7):
         """Generate a text response using Gemini."""
         model = GeminiHelper.get_text_model()
-        response = await model.generate_content(prompt, temperature=temperature)
-        return response.text
+        return await GeminiHelper._generate(model, prompt, prompt, 0, temperature)
 
     @staticmethod
     async def analyze_image(image_data, prompt, temperature=0.7):
         """Analyze an image and generate a response using Gemini Vision."""
         model = GeminiHelper.get_vision_model()
-        response = await model.generate_content([prompt, image_data], temperature=temperature)
-        return response.text 
\ No newline at end of file
+        return await GeminiHelper._generate(model, [prompt, image_data], prompt, 1, temperature) 
\ No newline at end of file
@@ -0,0 +1,197 @@
+import json
+import time
+import random
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    GEMINI_CONNECT_TIMEOUT, GEMINI_READ_TIMEOUT, GEMINI_POOL_SIZE, GEMINI_MAX_RETRIES,
+    GEMINI_BACKOFF_BASE, GEMINI_BACKOFF_MAX, GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_RESET
+)
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling the API while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service for a while.
+
+    After failure_threshold consecutive failed calls the circuit opens and
+    allow() refuses calls for reset_timeout seconds. Then a single trial call is
+    let through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=GEMINI_BREAKER_FAILURES, reset_timeout=GEMINI_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go out now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            # Open, or half-open with the trial call still in flight
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Gemini circuit opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class GeminiTransport:
+    """
+    Keep-alive HTTP client for the Gemini REST API.
+
+    One requests.Session with a pooled adapter is reused for every call, so
+    requests after the first skip the TCP and TLS handshakes. Each call has a
+    connect and a read timeout, 429/5xx responses and connection errors are
+    retried with jittered exponential backoff (honouring Retry-After), and a
+    circuit breaker fails calls fast while the API keeps failing.
+    """
+
+    def __init__(self, connect_timeout=GEMINI_CONNECT_TIMEOUT, read_timeout=GEMINI_READ_TIMEOUT,
+                 max_retries=GEMINI_MAX_RETRIES, backoff_base=GEMINI_BACKOFF_BASE,
+                 backoff_max=GEMINI_BACKOFF_MAX, pool_size=GEMINI_POOL_SIZE, breaker=None,
+                 headers=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        # Retries are handled here so they share the backoff and breaker logic
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(headers or {'Content-Type': 'application/json'})
+        self._lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'attempts': 0,
+            'retries': 0,
+            'failures': 0,
+            'short_circuited': 0
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to sleep before retry number attempt (0-based)"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        # Full jitter keeps concurrent sessions from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def post(self, url, payload, stream=False):
+        """
+        POST payload as JSON and return the successful requests.Response.
+        Raises requests.exceptions.RequestException (CircuitOpenError while the
+        circuit is open) once retries are exhausted or on a non-retryable error.
+        """
+        self._count('requests')
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            raise CircuitOpenError('Gemini API circuit is open; skipping request')
+
+        attempt = 0
+        while True:
+            self._count('attempts')
+            response = None
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout, stream=stream)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    self.breaker.record_success()
+                    return response
+                # Report the endpoint without its query string
+                error = requests.exceptions.HTTPError(
+                    f"{response.status_code} Error for url: {response.url.split('?')[0]}", response=response
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            except requests.exceptions.HTTPError:
+                # 4xx other than 429: the request itself is wrong, retrying won't help
+                self.breaker.record_success()
+                raise
+            except requests.exceptions.RequestException:
+                self.breaker.record_failure()
+                raise
+
+            if attempt >= self.max_retries:
+                self._count('failures')
+                self.breaker.record_failure()
+                raise error
+            delay = self._backoff(attempt, response)
+            if response is not None:
+                response.close()
+            logger.warning(f"Gemini request failed ({error}); retry {attempt + 1} in {delay:.2f}s")
+            self._count('retries')
+            attempt += 1
+            time.sleep(delay)
+
+    def post_json(self, url, payload):
+        """POST payload and return the decoded JSON body"""
+        return self.post(url, payload).json()
+
+    def stream_events(self, url, payload):
+        """
+        POST payload to an alt=sse endpoint and yield each server-sent event's
+        JSON data as it arrives. Retries only cover opening the stream; an error
+        mid-stream raises requests.exceptions.RequestException.
+        """
+        response = self.post(url, payload, stream=True)
+        data = []
+        try:
+            # chunk_size=None yields each chunk of the chunked SSE body as it arrives
+            for line in response.iter_lines(chunk_size=None):
+                line = line.decode('utf-8')
+                if line.startswith('data:'):
+                    data.append(line[5:].strip())
+                elif not line and data:
+                    yield json.loads('\n'.join(data))
+                    data = []
+            if data:
+                yield json.loads('\n'.join(data))
+        finally:
+            response.close()
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,183 @@
+import time
+import hashlib
+import logging
+import threading
+
+import numpy as np
+from PIL import Image
+
+from config import VISION_CACHE_PATH, VISION_CACHE_MAX_DISTANCE, VISION_CACHE_MAX_ENTRIES
+from .db_pool import get_pool
+from .db_storage import retry_on_locked
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+BAND_BITS = 8
+BANDS = HASH_BITS // BAND_BITS
+
+
+def dhash(image, hash_size=8):
+    """
+    64-bit difference hash: shrink to (hash_size + 1) x hash_size grayscale and
+    set one bit per pixel brighter than its right-hand neighbour. Re-encoding,
+    rescaling and small brightness changes leave most bits unchanged.
+    """
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BOX)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def hamming(a, b):
+    """Number of differing bits between two hashes"""
+    return (a ^ b).bit_count()
+
+
+def bands(image_hash):
+    """The hash split into BANDS values of BAND_BITS bits, most significant first"""
+    mask = (1 << BAND_BITS) - 1
+    return [(image_hash >> (HASH_BITS - BAND_BITS * (i + 1))) & mask for i in range(BANDS)]
+
+
+def prompt_key(*parts):
+    """Cache namespace for a model, prompt and generation config, so changing any of them misses"""
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+
+class ImageAnalysisCache:
+    """
+    Persistent cache of Food Vision analyses keyed on a perceptual image hash.
+
+    A lookup returns the stored analysis of the closest earlier image within
+    max_distance bits, so re-uploads, re-encodes and repeated "Analyze" clicks
+    never reach the API. Each hash is also stored as BANDS exact-match band
+    values: two hashes within max_distance < BANDS bits share at least one band
+    (pigeonhole), so candidates come from an indexed band lookup rather than a
+    scan, and only those are compared bit by bit.
+    """
+
+    def __init__(self, db_path=VISION_CACHE_PATH, max_distance=VISION_CACHE_MAX_DISTANCE,
+                 max_entries=VISION_CACHE_MAX_ENTRIES):
+        if not 0 <= max_distance < BANDS:
+            raise ValueError(f"max_distance must be between 0 and {BANDS - 1}")
+        self.db_path = db_path
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.pool = get_pool(db_path)
+        self._lock = threading.Lock()
+        self.stats = {'exact_hits': 0, 'near_hits': 0, 'misses': 0, 'stores': 0, 'evicted': 0}
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.pool.connection() as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS vision_cache (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                image_hash TEXT NOT NULL,
+                prompt_key TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (prompt_key, image_hash)
+            )
+            ''')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS vision_cache_bands (
+                entry_id INTEGER NOT NULL REFERENCES vision_cache (id) ON DELETE CASCADE,
+                band INTEGER NOT NULL,
+                value INTEGER NOT NULL,
+                PRIMARY KEY (band, value, entry_id)
+            ) WITHOUT ROWID
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_vision_cache_last_access ON vision_cache (last_access)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_vision_cache_bands_entry ON vision_cache_bands (entry_id)')
+            conn.commit()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def lookup(self, image_hash, key):
+        """(response, distance) of the nearest cached analysis within max_distance, or (None, None)"""
+        # One primary-key probe per band; UNION drops entries matching on several bands
+        probes = ' UNION '.join(
+            'SELECT entry_id FROM vision_cache_bands WHERE band = ? AND value = ?' for _ in range(BANDS)
+        )
+        params = [value for pair in enumerate(bands(image_hash)) for value in pair] + [key]
+        try:
+            with self.pool.connection() as conn:
+                candidates = conn.execute(f'''
+                WITH matches (entry_id) AS ({probes})
+                SELECT e.id, e.image_hash, e.response
+                FROM matches m JOIN vision_cache e ON e.id = m.entry_id
+                WHERE e.prompt_key = ?
+                ''', params).fetchall()
+                best = None
+                for row in candidates:
+                    distance = hamming(image_hash, int(row['image_hash'], 16))
+                    if distance <= self.max_distance and (best is None or distance < best[0]):
+                        best = (distance, row)
+                if best is None:
+                    self._count('misses')
+                    return None, None
+                conn.execute(
+                    'UPDATE vision_cache SET last_access = ?, hits = hits + 1 WHERE id = ?',
+                    (time.time(), best[1]['id'])
+                )
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Vision cache lookup failed: {str(e)}")
+            self._count('misses')
+            return None, None
+        self._count('exact_hits' if best[0] == 0 else 'near_hits')
+        return best[1]['response'], best[0]
+
+    @retry_on_locked
+    def _store(self, image_hash, key, response, now):
+        with self.pool.connection() as conn:
+            hex_hash = f"{image_hash:016x}"
+            entry_id = conn.execute('''
+            INSERT INTO vision_cache (image_hash, prompt_key, response, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (prompt_key, image_hash) DO UPDATE SET
+                response = excluded.response, created_at = excluded.created_at,
+                last_access = excluded.last_access
+            RETURNING id
+            ''', (hex_hash, key, response, now, now)).fetchone()[0]
+            conn.executemany(
+                'INSERT OR IGNORE INTO vision_cache_bands (entry_id, band, value) VALUES (?, ?, ?)',
+                [(entry_id, band, value) for band, value in enumerate(bands(image_hash))]
+            )
+            stale = [row[0] for row in conn.execute(
+                'SELECT id FROM vision_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?',
+                (self.max_entries,)
+            ).fetchall()]
+            if stale:
+                marks = ', '.join('?' for _ in stale)
+                conn.execute(f'DELETE FROM vision_cache_bands WHERE entry_id IN ({marks})', stale)
+                conn.execute(f'DELETE FROM vision_cache WHERE id IN ({marks})', stale)
+            conn.commit()
+        return len(stale)
+
+    def store(self, image_hash, key, response):
+        """Remember the analysis of an image, evicting the least recently used beyond max_entries"""
+        try:
+            evicted = self._store(image_hash, key, response, time.time())
+        except Exception as e:
+            logger.error(f"Vision cache write failed: {str(e)}")
+            return
+        self._count('stores')
+        if evicted:
+            self._count('evicted', evicted)
+
+    def get_stats(self):
+        """Hit/miss counters, hit ratio and number of stored analyses"""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['exact_hits'] + stats['near_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['exact_hits'] + stats['near_hits']) / lookups if lookups else 0.0
+        with self.pool.connection() as conn:
+            stats['entries'] = conn.execute('SELECT COUNT(*) FROM vision_cache').fetchone()[0]
+        return stats
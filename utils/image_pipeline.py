@@ -0,0 +1,158 @@
+import io
+import time
+import logging
+import threading
+
+from PIL import Image, ImageOps
+
+from config import VISION_MAX_SIZE, VISION_BYTE_BUDGET, VISION_MIN_QUALITY, VISION_MAX_QUALITY
+from .image_cache import dhash
+
+logger = logging.getLogger(__name__)
+
+
+class PreparedImage:
+    """A decoded, oriented and downscaled image plus the JPEG bytes to send for it"""
+
+    __slots__ = ('image', 'data', 'mime_type', 'quality', 'dhash', 'bytes_in', 'decode_ms', 'encode_ms',
+                 'encodes')
+
+    def __init__(self, image, data, quality, bytes_in, decode_ms, encode_ms, encodes):
+        self.image = image
+        self.data = data
+        self.mime_type = 'image/jpeg'
+        self.quality = quality
+        self.dhash = dhash(image)
+        self.bytes_in = bytes_in
+        self.decode_ms = decode_ms
+        self.encode_ms = encode_ms
+        self.encodes = encodes
+
+    @property
+    def bytes_sent(self):
+        return len(self.data)
+
+    def as_part(self):
+        """Inline-data content part for google.generativeai generate_content"""
+        return {'mime_type': self.mime_type, 'data': self.data}
+
+    def summary(self):
+        return (f"{self.image.width}x{self.image.height}, {self.bytes_sent / 1024:.0f} KB sent "
+                f"(q{self.quality}), decoded in {self.decode_ms:.0f} ms")
+
+
+class PipelineStats:
+    """Running totals across every image prepared in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.bytes_in = 0
+        self.bytes_sent = 0
+        self.decode_ms = 0.0
+        self.encode_ms = 0.0
+
+    def add(self, prepared):
+        with self._lock:
+            self.images += 1
+            self.bytes_in += prepared.bytes_in
+            self.bytes_sent += prepared.bytes_sent
+            self.decode_ms += prepared.decode_ms
+            self.encode_ms += prepared.encode_ms
+
+    def get_stats(self):
+        with self._lock:
+            images = self.images or 1
+            return {
+                'images': self.images,
+                'bytes_in': self.bytes_in,
+                'bytes_sent': self.bytes_sent,
+                'mean_bytes_sent': self.bytes_sent / images,
+                'mean_decode_ms': self.decode_ms / images,
+                'mean_encode_ms': self.encode_ms / images
+            }
+
+
+stats = PipelineStats()
+
+
+def decode(source, max_size=VISION_MAX_SIZE):
+    """
+    Decode bytes, a file object or a PIL image into an upright RGB image no
+    larger than max_size. JPEGs use draft mode, so the decoder itself skips
+    detail (scaling by 1/2, 1/4 or 1/8) instead of decoding full resolution
+    and throwing most of it away.
+    """
+    if isinstance(source, Image.Image):
+        image = source
+    else:
+        image = Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source)
+        if image.format == 'JPEG':
+            # Request the final thumbnail size; draft picks the smallest DCT scale still covering it
+            scale = min(1.0, max_size / max(image.size))
+            image.draft('RGB', (int(image.width * scale), int(image.height * scale)))
+    # Phone photos are stored sideways with an EXIF orientation tag
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    if image.width > max_size or image.height > max_size:
+        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    return image
+
+
+def encode(image, byte_budget=VISION_BYTE_BUDGET, min_quality=VISION_MIN_QUALITY,
+           max_quality=VISION_MAX_QUALITY):
+    """
+    JPEG-encode at the highest quality that fits byte_budget (binary search over
+    quality, reusing one buffer). If even min_quality is too large the image is
+    shrunk and searched again. Returns (bytes, quality, image, encodes).
+    """
+    buffer = io.BytesIO()
+    encodes = 0
+
+    def size_at(quality):
+        nonlocal encodes
+        buffer.seek(0)
+        buffer.truncate()
+        image.save(buffer, format='JPEG', quality=quality, optimize=True)
+        encodes += 1
+        return buffer.tell()
+
+    while True:
+        if size_at(max_quality) <= byte_budget:
+            return buffer.getvalue(), max_quality, image, encodes
+        low, high, best = min_quality, max_quality - 1, None
+        while low <= high:
+            quality = (low + high) // 2
+            if size_at(quality) <= byte_budget:
+                best, low = quality, quality + 1
+            else:
+                high = quality - 1
+        if best is not None:
+            if best != quality:
+                size_at(best)
+            return buffer.getvalue(), best, image, encodes
+        if min(image.size) <= 64:
+            size_at(min_quality)
+            return buffer.getvalue(), min_quality, image, encodes
+        image = image.resize((image.width * 3 // 4, image.height * 3 // 4), Image.Resampling.LANCZOS)
+
+
+def prepare_image(source, max_size=VISION_MAX_SIZE, byte_budget=VISION_BYTE_BUDGET):
+    """Decode once and JPEG-encode within byte_budget for upload to the vision model"""
+    bytes_in = len(source) if isinstance(source, (bytes, bytearray, memoryview)) else 0
+    started = time.perf_counter()
+    image = decode(source, max_size)
+    decoded = time.perf_counter()
+    data, quality, image, encodes = encode(image, byte_budget)
+    encoded = time.perf_counter()
+
+    prepared = PreparedImage(
+        image, data, quality, bytes_in,
+        decode_ms=(decoded - started) * 1000,
+        encode_ms=(encoded - decoded) * 1000,
+        encodes=encodes
+    )
+    stats.add(prepared)
+    logger.info(f"Prepared image: {prepared.summary()}, {encodes} encode(s) in {prepared.encode_ms:.0f} ms")
+    return prepared
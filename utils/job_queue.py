@@ -0,0 +1,360 @@
+import json
+import time
+import socket
+import logging
+import threading
+
+from config import (
+    JOB_DB_PATH, JOB_WORKERS, JOB_MAX_ATTEMPTS, JOB_RETRY_DELAY, JOB_POLL_INTERVAL, JOB_LEASE_SECONDS
+)
+from .db_pool import get_pool
+from .db_storage import retry_on_locked
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+JOB_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        user_id INTEGER,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        run_after REAL NOT NULL,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        heartbeat_at REAL,
+        finished_at REAL,
+        worker TEXT,
+        error TEXT
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, run_after, id)',
+    'CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, created_at)',
+    '''
+    CREATE TABLE IF NOT EXISTS job_results (
+        job_id INTEGER PRIMARY KEY REFERENCES jobs (id) ON DELETE CASCADE,
+        result TEXT NOT NULL
+    )
+    '''
+]
+
+
+class JobQueue:
+    """
+    SQLite-backed queue for slow work such as AI program generation.
+
+    Pages enqueue a job and return immediately; a pool of worker threads claims
+    queued jobs one at a time (a single UPDATE ... RETURNING, so two workers
+    never take the same job), runs the handler registered for the job's kind
+    and stores its JSON result in job_results. A handler that raises is retried
+    with exponential backoff until max_attempts, then the job is marked failed.
+    Running jobs refresh a heartbeat; jobs whose heartbeat is older than
+    JOB_LEASE_SECONDS (e.g. the process died) are put back in the queue.
+
+    A claim is a lease held by (worker, attempt). Heartbeats, failures and the
+    final result only apply while the worker still holds it, so a worker whose
+    job was reclaimed discards its result. Side effects (such as saving a
+    generated program) belong in the kind's commit hook, which runs only after
+    the lease check. The hook writes to its own database, which does not
+    commit together with jobs.db, so it may run again (a retried _finish, or a
+    requeued job) and must be idempotent by job id.
+    """
+
+    def __init__(self, db_path=JOB_DB_PATH, workers=JOB_WORKERS, max_attempts=JOB_MAX_ATTEMPTS,
+                 retry_delay=JOB_RETRY_DELAY, poll_interval=JOB_POLL_INTERVAL,
+                 lease_seconds=JOB_LEASE_SECONDS):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.pool = get_pool(db_path)
+        self.handlers = {}
+        self.commits = {}
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._last_reclaim = 0.0
+        self.stats = {'enqueued': 0, 'completed': 0, 'retried': 0, 'failed': 0, 'reclaimed': 0, 'lease_lost': 0}
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.pool.connection() as conn:
+            for statement in JOB_TABLES:
+                conn.execute(statement)
+            conn.commit()
+
+    def register(self, kind, handler, commit=None):
+        """
+        Run handler(payload, user_id=...) for jobs of this kind; it must return
+        JSON-serializable data. commit(result, payload, user_id=..., job_id=...),
+        if given, applies the result's side effects once the lease is confirmed
+        and returns the result to store; it must be idempotent by job_id.
+        """
+        self.handlers[kind] = handler
+        if commit is not None:
+            self.commits[kind] = commit
+
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for number in range(self.workers):
+                thread = threading.Thread(
+                    target=self._work, name=f"job-worker-{number}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def shutdown(self, timeout=5.0):
+        """Stop the workers; a job in progress finishes or is reclaimed after its lease"""
+        self._stopping.set()
+        self._wakeup.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    @retry_on_locked
+    def enqueue(self, kind, payload, user_id=None, max_attempts=None):
+        """Queue a job and return its id"""
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind {kind!r}")
+        now = time.time()
+        with self.pool.connection() as conn:
+            cursor = conn.execute('''
+            INSERT INTO jobs (kind, user_id, payload, max_attempts, run_after, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', (kind, user_id, json.dumps(payload), max_attempts or self.max_attempts, now, now))
+            conn.commit()
+            job_id = cursor.lastrowid
+        self._count('enqueued')
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """Job status as a dict (result decoded once done), or None if there is no such job"""
+        with self.pool.connection() as conn:
+            row = conn.execute('''
+            SELECT j.*, r.result FROM jobs j LEFT JOIN job_results r ON r.job_id = j.id
+            WHERE j.id = ?
+            ''', (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def jobs_for_user(self, user_id, kind=None, limit=20):
+        """A user's most recent jobs, newest first"""
+        query = '''
+        SELECT j.*, r.result FROM jobs j LEFT JOIN job_results r ON r.job_id = j.id
+        WHERE j.user_id IS ?
+        '''
+        params = [user_id]
+        if kind:
+            query += ' AND j.kind = ?'
+            params.append(kind)
+        query += ' ORDER BY j.created_at DESC LIMIT ?'
+        params.append(limit)
+        with self.pool.connection() as conn:
+            return [self._job(row) for row in conn.execute(query, params).fetchall()]
+
+    @staticmethod
+    def _job(row):
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    @retry_on_locked
+    def _claim(self, worker):
+        """Atomically mark the oldest runnable job as running and return it"""
+        now = time.time()
+        with self.pool.connection() as conn:
+            row = conn.execute('''
+            UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?,
+                started_at = ?, heartbeat_at = ?
+            WHERE id = (
+                SELECT id FROM jobs WHERE status = 'queued' AND run_after <= ?
+                ORDER BY run_after, id LIMIT 1
+            )
+            RETURNING id, kind, user_id, payload, attempts, max_attempts, worker
+            ''', (worker, now, now, now)).fetchone()
+            conn.commit()
+        return dict(row) if row else None
+
+    # Matches a job only while this claim (worker and attempt) still holds its lease
+    LEASE = "id = ? AND worker = ? AND attempts = ? AND status = 'running'"
+
+    @staticmethod
+    def _lease(job):
+        return (job['id'], job['worker'], job['attempts'])
+
+    @retry_on_locked
+    def _finish(self, job, result):
+        """Mark the job done and store its result; returns False if the lease was lost"""
+        with self.pool.connection() as conn:
+            # BEGIN IMMEDIATE holds the write lock, so the job cannot be reclaimed
+            # between the lease check and the commit hook
+            conn.execute('BEGIN IMMEDIATE')
+            owned = conn.execute(
+                f"UPDATE jobs SET status = 'done', finished_at = ?, error = NULL WHERE {self.LEASE}",
+                (time.time(), *self._lease(job))
+            ).rowcount
+            if not owned:
+                conn.rollback()
+                return False
+            commit = self.commits.get(job['kind'])
+            if commit is not None:
+                result = commit(result, json.loads(job['payload']), user_id=job['user_id'], job_id=job['id'])
+            conn.execute(
+                'INSERT OR REPLACE INTO job_results (job_id, result) VALUES (?, ?)',
+                (job['id'], json.dumps(result))
+            )
+            conn.commit()
+        return True
+
+    @retry_on_locked
+    def _fail(self, job, error):
+        """
+        Requeue with backoff, or mark failed once the job is out of attempts.
+        Returns None (and changes nothing) if the lease was lost.
+        """
+        now = time.time()
+        with self.pool.connection() as conn:
+            if job['attempts'] < job['max_attempts']:
+                delay = self.retry_delay * 2 ** (job['attempts'] - 1)
+                owned = conn.execute(
+                    f"UPDATE jobs SET status = 'queued', run_after = ?, error = ? WHERE {self.LEASE}",
+                    (now + delay, error, *self._lease(job))
+                ).rowcount
+                retried = True
+            else:
+                owned = conn.execute(
+                    f"UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE {self.LEASE}",
+                    (now, error, *self._lease(job))
+                ).rowcount
+                retried = False
+            conn.commit()
+        return retried if owned else None
+
+    @retry_on_locked
+    def _heartbeat(self, job):
+        """Extend the lease; returns False once another worker has reclaimed the job"""
+        with self.pool.connection() as conn:
+            owned = conn.execute(
+                f'UPDATE jobs SET heartbeat_at = ? WHERE {self.LEASE}', (time.time(), *self._lease(job))
+            ).rowcount
+            conn.commit()
+        return bool(owned)
+
+    @retry_on_locked
+    def _reclaim_stale(self):
+        """Put running jobs whose worker stopped heartbeating back in the queue"""
+        now = time.time()
+        with self.pool.connection() as conn:
+            reclaimed = conn.execute(
+                "UPDATE jobs SET status = 'queued', run_after = ? WHERE status = 'running' AND heartbeat_at < ?",
+                (now, now - self.lease_seconds)
+            ).rowcount
+            conn.commit()
+        if reclaimed:
+            logger.warning(f"Requeued {reclaimed} job(s) with an expired lease")
+            with self._lock:
+                self.stats['reclaimed'] += reclaimed
+
+    def _run(self, job):
+        """Run one claimed job's handler, heartbeating while it works"""
+        handler = self.handlers.get(job['kind'])
+        if handler is None:
+            raise ValueError(f"No handler registered for job kind {job['kind']!r}")
+        done = threading.Event()
+
+        def beat():
+            while not done.wait(self.lease_seconds / 3):
+                try:
+                    if not self._heartbeat(job):
+                        logger.warning(f"Job {job['id']} lease lost; its result will be discarded")
+                        return
+                except Exception as e:
+                    logger.error(f"Job {job['id']} heartbeat failed: {str(e)}")
+
+        beater = threading.Thread(target=beat, daemon=True)
+        beater.start()
+        try:
+            return handler(json.loads(job['payload']), user_id=job['user_id'])
+        finally:
+            done.set()
+
+    def _work(self):
+        worker = f"{socket.gethostname()}:{threading.current_thread().name}"
+        while not self._stopping.is_set():
+            try:
+                if time.time() - self._last_reclaim > self.lease_seconds / 2:
+                    self._last_reclaim = time.time()
+                    self._reclaim_stale()
+                job = self._claim(worker)
+            except Exception as e:
+                logger.error(f"Job queue unavailable: {str(e)}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            try:
+                result = self._run(job)
+            except Exception as e:
+                logger.error(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed: {str(e)}")
+                try:
+                    retried = self._fail(job, str(e))
+                except Exception as db_error:
+                    logger.error(f"Could not record failure of job {job['id']}: {str(db_error)}")
+                    continue
+                if retried is None:
+                    self._count('lease_lost')
+                else:
+                    self._count('retried' if retried else 'failed')
+                continue
+            try:
+                if self._finish(job, result):
+                    self._count('completed')
+                else:
+                    logger.warning(f"Job {job['id']} was reclaimed by another worker; discarding this result")
+                    self._count('lease_lost')
+            except Exception as e:
+                logger.error(f"Could not store result of job {job['id']}: {str(e)}")
+                try:
+                    retried = self._fail(job, str(e))
+                except Exception as db_error:
+                    logger.error(f"Could not record failure of job {job['id']}: {str(db_error)}")
+                    continue
+                if retried is not None:
+                    self._count('retried' if retried else 'failed')
+
+    def get_stats(self):
+        """Job counts by status plus this process's enqueue/completion counters"""
+        with self.pool.connection() as conn:
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+            oldest = conn.execute(
+                "SELECT MIN(created_at) FROM jobs WHERE status = 'queued'"
+            ).fetchone()[0]
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update({status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)})
+        stats['oldest_queued_seconds'] = time.time() - oldest if oldest else 0.0
+        stats['workers'] = len(self._threads)
+        return stats
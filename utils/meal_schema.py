@@ -0,0 +1,150 @@
+import json
+
+MEAL_TYPES = ["Breakfast", "Lunch", "Dinner", "Snack"]
+
+# Structured Food Vision output; also sent to Gemini as its response_schema
+MEAL_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'items': {
+            'type': 'array',
+            'description': 'Each distinct food visible in the photo',
+            'maxItems': 12,
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'name': {'type': 'string', 'description': 'Common name, e.g. "scrambled eggs"', 'minLength': 1},
+                    'grams': {'type': 'number', 'description': 'Estimated portion weight in grams',
+                              'minimum': 0, 'maximum': 5000},
+                    'calories': {'type': 'number', 'minimum': 0, 'maximum': 10000},
+                    'protein': {'type': 'number', 'minimum': 0, 'maximum': 1000},
+                    'carbs': {'type': 'number', 'minimum': 0, 'maximum': 1000},
+                    'fat': {'type': 'number', 'minimum': 0, 'maximum': 1000},
+                    'fiber': {'type': 'number', 'minimum': 0, 'maximum': 500}
+                },
+                'required': ['name', 'grams', 'calories', 'protein', 'carbs', 'fat']
+            }
+        },
+        'meal_type': {'type': 'string', 'enum': MEAL_TYPES},
+        'confidence': {'type': 'number', 'description': 'Confidence in the estimate, 0 to 1',
+                       'minimum': 0, 'maximum': 1},
+        'notes': {'type': 'string', 'description': 'Key micronutrients and health benefits, briefly'}
+    },
+    'required': ['items', 'confidence']
+}
+
+# Keywords Gemini's response_schema understands; the rest are only checked locally
+GEMINI_SCHEMA_KEYS = {'type', 'description', 'properties', 'required', 'items', 'enum', 'maxItems', 'minItems'}
+
+
+class SchemaError(ValueError):
+    """A model response that does not match the expected schema"""
+
+
+def response_schema(schema=MEAL_SCHEMA):
+    """The schema restricted to the keywords the Gemini API accepts"""
+    if isinstance(schema, dict):
+        return {
+            key: ({name: response_schema(sub) for name, sub in value.items()} if key == 'properties'
+                  else response_schema(value))
+            for key, value in schema.items() if key in GEMINI_SCHEMA_KEYS
+        }
+    return schema
+
+
+def compile_schema(schema, path='$'):
+    """
+    Turn a JSON Schema (the subset used here) into a validator function once,
+    so each response is checked by plain closures rather than re-interpreting
+    the schema. The validator returns the value with unknown object keys
+    dropped and integers widened to float, or raises SchemaError naming the
+    offending path.
+    """
+    kind = schema.get('type')
+    checks = []
+
+    if 'enum' in schema:
+        allowed = set(schema['enum'])
+
+        def check_enum(value):
+            if value not in allowed:
+                raise SchemaError(f"{path}: {value!r} is not one of {sorted(allowed)}")
+        checks.append(check_enum)
+    if 'minimum' in schema or 'maximum' in schema:
+        low, high = schema.get('minimum', float('-inf')), schema.get('maximum', float('inf'))
+
+        def check_range(value):
+            if not low <= value <= high:
+                raise SchemaError(f"{path}: {value} is outside [{low}, {high}]")
+        checks.append(check_range)
+
+    if kind == 'object':
+        fields = {name: compile_schema(sub, f"{path}.{name}") for name, sub in schema.get('properties', {}).items()}
+        required = schema.get('required', [])
+
+        def validate(value):
+            if not isinstance(value, dict):
+                raise SchemaError(f"{path}: expected an object")
+            for name in required:
+                if name not in value:
+                    raise SchemaError(f"{path}: missing required field {name!r}")
+            return {name: fields[name](item) for name, item in value.items() if name in fields}
+    elif kind == 'array':
+        item_validator = compile_schema(schema.get('items', {}), f"{path}[]")
+        min_items, max_items = schema.get('minItems', 0), schema.get('maxItems')
+
+        def validate(value):
+            if not isinstance(value, list):
+                raise SchemaError(f"{path}: expected an array")
+            if len(value) < min_items or (max_items is not None and len(value) > max_items):
+                raise SchemaError(f"{path}: {len(value)} items is out of bounds")
+            return [item_validator(item) for item in value]
+    elif kind in ('number', 'integer'):
+        def validate(value):
+            # bool is an int subclass but never a valid quantity
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise SchemaError(f"{path}: expected a number")
+            if kind == 'integer' and not float(value).is_integer():
+                raise SchemaError(f"{path}: expected an integer")
+            for check in checks:
+                check(value)
+            return int(value) if kind == 'integer' else float(value)
+        return validate
+    elif kind == 'string':
+        min_length = schema.get('minLength', 0)
+
+        def validate(value):
+            if not isinstance(value, str):
+                raise SchemaError(f"{path}: expected a string")
+            value = value.strip()
+            if len(value) < min_length:
+                raise SchemaError(f"{path}: string is too short")
+            for check in checks:
+                check(value)
+            return value
+        return validate
+    elif kind == 'boolean':
+        def validate(value):
+            if not isinstance(value, bool):
+                raise SchemaError(f"{path}: expected a boolean")
+            return value
+    else:
+        def validate(value):
+            return value
+
+    return validate
+
+
+validate_meal = compile_schema(MEAL_SCHEMA)
+
+
+def parse_meal(text):
+    """Parse and validate a JSON-mode meal response, raising SchemaError if it is malformed"""
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError) as e:
+        raise SchemaError(f"Response is not valid JSON: {str(e)}")
+    meal = validate_meal(data)
+    for item in meal['items']:
+        item.setdefault('fiber', 0.0)
+    return meal
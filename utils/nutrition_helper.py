@@ -1,73 +1,147 @@
-from .gemini_helper import GeminiHelper
-import json
-from PIL import Image
-import io
+import asyncio
+from datetime import datetime
+
+from config import GEMINI_VISION_MODEL
+from .gemini_helper import get_genai
+from .image_pipeline import prepare_image
+from .image_cache import prompt_key
+from .meal_schema import MEAL_SCHEMA, response_schema, parse_meal
+from .rate_limiter import get_rate_limiter, estimate_tokens
+from .resources import get_vision_cache
+
+MEAL_PROMPT = """Identify each distinct food in this photo and estimate its portion.
+For every item give its common name, estimated weight in grams and the calories,
+protein, carbs, fat and fiber (grams) of that portion. Be conservative and base
+portions on what is visible. Also give the likely meal type, your confidence
+between 0 and 1, and one or two sentences on key micronutrients and benefits."""
+
+# JSON mode constrained by the meal schema; no markdown for the page to scrape
+MEAL_GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "max_output_tokens": 1024,
+    "response_mime_type": "application/json",
+    "response_schema": response_schema(MEAL_SCHEMA)
+}
+
+NUTRIENT_FIELDS = ['calories', 'protein', 'carbs', 'fat', 'fiber']
+
+
+def analyze_meal(prepared, on_retry=None, max_retries=3):
+    """
+    Structured analysis of a PreparedImage: returns (meal, cache distance or None)
+    where meal is a validated MEAL_SCHEMA dict. Answers near-duplicate photos from
+    the vision cache. Makes no Streamlit calls; raises on failure.
+    """
+    cache = get_vision_cache()
+    cache_key = prompt_key(GEMINI_VISION_MODEL, MEAL_PROMPT, MEAL_GENERATION_CONFIG)
+    cached, distance = cache.lookup(prepared.dhash, cache_key)
+    if cached is not None:
+        return parse_meal(cached), distance
+
+    model = get_genai().GenerativeModel(GEMINI_VISION_MODEL)
+    limiter = get_rate_limiter()
+    for attempt in range(max_retries):
+        ticket, usage = None, None
+        try:
+            ticket = limiter.acquire(
+                estimate_tokens(MEAL_PROMPT, images=1, output_tokens=MEAL_GENERATION_CONFIG["max_output_tokens"])
+            )
+            response = model.generate_content(
+                [MEAL_PROMPT, prepared.as_part()],
+                generation_config=MEAL_GENERATION_CONFIG
+            )
+            usage = getattr(response.usage_metadata, 'total_token_count', None)
+            # Only responses that validate are cached
+            meal = parse_meal(response.text)
+            cache.store(prepared.dhash, cache_key, response.text)
+            return meal, None
+        except Exception as e:
+            if "quota" in str(e).lower() or "429" in str(e):
+                limiter.report_throttled(2)
+            if attempt == max_retries - 1:
+                raise
+            if on_retry:
+                on_retry(attempt + 1, e)
+        finally:
+            # A failed call reports no usage and produced no output: charge only its input
+            limiter.settle(ticket, usage or estimate_tokens(MEAL_PROMPT, images=1, output_tokens=0))
+
+
+def match_foods(meal, food_db):
+    """
+    Map each recognized item onto its closest FoodDatabase row. Matched items
+    take the table's per-gram nutrients scaled to the estimated grams; items
+    with no match keep the model's own estimate.
+    """
+    matched = []
+    for item in meal['items']:
+        results = food_db.search_food(item['name'], limit=1) or food_db.search_food(item['name'], limit=1, fuzzy=True)
+        food = results[0] if results else None
+        serving = None
+        if food and food['Grams'] > 0 and item['grams'] > 0:
+            serving = food_db.calculate_serving(food['food_id'], item['grams'])
+        if serving:
+            nutrients = {field: float(serving[field.capitalize()]) for field in NUTRIENT_FIELDS}
+        else:
+            nutrients = {field: item[field] for field in NUTRIENT_FIELDS}
+            food = None
+        matched.append({
+            'name': item['name'],
+            'food_name': food['Food'] if food else item['name'],
+            'food_id': food['food_id'] if food else None,
+            'grams': item['grams'],
+            'source': 'database' if food else 'estimate',
+            **nutrients
+        })
+    return matched
+
+
+def meal_totals(items):
+    """Summed nutrients over matched (or raw) meal items"""
+    return {field: sum(item.get(field, 0) for item in items) for field in NUTRIENT_FIELDS}
+
+
+def meal_log_entries(items, meal_type, user_id=None, when=None):
+    """nutrition_logs rows for matched meal items, ready for DatabaseManager.add_food_logs"""
+    when = when or datetime.now()
+    return [{
+        'user_id': user_id,
+        'time': when.strftime("%H:%M"),
+        'date': when.date().isoformat(),
+        'food_name': item['food_name'],
+        'meal_type': meal_type,
+        'serving_size': item['grams'],
+        **{field: item[field] for field in NUTRIENT_FIELDS}
+    } for item in items]
+
 
 async def estimate_nutrition(image_data):
     """
     Estimate nutrition information from a food image using Gemini Vision API.
     Returns a dictionary with estimated nutrition values and confidence score.
     """
-    try:
-        # Prepare the prompt for the vision model
-        prompt = """
-        Analyze this food image and provide nutritional information in the following JSON format:
-        {
-            "calories": number (estimated calories),
-            "protein": number (grams of protein),
-            "carbs": number (grams of carbohydrates),
-            "fat": number (grams of fat),
-            "confidence": number (between 0 and 1, indicating confidence in the estimation)
-        }
-        Be conservative in your estimates and provide realistic values based on typical serving sizes.
-        Consider the portion size visible in the image.
-        If multiple food items are present, provide combined nutritional values.
-        """
-        
-        # Get response from Gemini Vision
-        response = await GeminiHelper.analyze_image(image_data, prompt)
-        
-        # Parse the JSON response
-        # Find the first occurrence of a JSON-like structure
-        start_idx = response.find('{')
-        end_idx = response.rfind('}') + 1
-        json_str = response[start_idx:end_idx]
-        
-        # Parse the JSON data
-        nutrition_data = json.loads(json_str)
-        
-        # Ensure all required fields are present with default values
-        required_fields = {
-            'calories': 0,
-            'protein': 0,
-            'carbs': 0,
-            'fat': 0,
-            'confidence': 0.5
-        }
-        
-        for field, default_value in required_fields.items():
-            if field not in nutrition_data or not isinstance(nutrition_data[field], (int, float)):
-                nutrition_data[field] = default_value
-        
-        return nutrition_data
-        
-    except Exception as e:
-        raise Exception(f"Error estimating nutrition: {str(e)}")
+    return await asyncio.to_thread(estimate_nutrition_sync, image_data)
+
 
 def estimate_nutrition_sync(image_data):
     """
-    Synchronous wrapper for estimate_nutrition function.
+    Synchronous nutrition estimate for a food image.
     Args:
         image_data: Either a PIL Image object or bytes of image data
     Returns:
-        Dictionary containing nutrition information
+        Dictionary with combined calories, protein, carbs, fat and a confidence score
     """
-    import asyncio
-    
-    # If image_data is a PIL Image, convert it to bytes
-    if isinstance(image_data, Image.Image):
-        img_byte_arr = io.BytesIO()
-        image_data.save(img_byte_arr, format='JPEG')
-        image_data = img_byte_arr.getvalue()
-    
-    return asyncio.run(estimate_nutrition(image_data)) 
\ No newline at end of file
+    try:
+        # Decode, orient, downscale and encode within the upload byte budget in one pass
+        prepared = prepare_image(image_data)
+        meal, _ = analyze_meal(prepared)
+    except Exception as e:
+        raise Exception(f"Error estimating nutrition: {str(e)}")
+    totals = meal_totals(meal['items'])
+    return {
+        'calories': totals['calories'],
+        'protein': totals['protein'],
+        'carbs': totals['carbs'],
+        'fat': totals['fat'],
+        'confidence': meal['confidence']
+    }
@@ -0,0 +1,29 @@
+import importlib
+
+# Navigation entries in menu order: (label, page module, option_menu icon).
+# Home is rendered inline by app.py, so it has no module.
+NAV_PAGES = [
+    ('Home', None, 'house'),
+    ('Exercise Library', 'pages.exercise_library', 'activity'),
+    ('Workout Planner', 'pages.workout_planner', 'calendar-check'),
+    ('Nutrition Tracker', 'pages.nutrition_tracker', 'calculator'),
+    ('AI Coach', 'pages.ai_coach', 'robot'),
+    ('Food Vision', 'pages.food_vision', 'camera'),
+]
+
+LOGIN_PAGE = ('Login', 'pages.auth')
+
+PAGE_MODULES = {label: module for label, module, _ in NAV_PAGES if module}
+PAGE_MODULES[LOGIN_PAGE[0]] = LOGIN_PAGE[1]
+
+NAV_LABELS = [label for label, _, _ in NAV_PAGES]
+NAV_ICONS = [icon for _, _, icon in NAV_PAGES]
+
+
+def load_page(label):
+    """
+    The app() function of a page, importing its module on first use. Only the
+    page being shown is imported, so a run never pays for the others' heavy
+    dependencies; later runs find the module already in sys.modules.
+    """
+    return importlib.import_module(PAGE_MODULES[label]).app
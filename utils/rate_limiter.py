@@ -0,0 +1,222 @@
+import time
+import logging
+import threading
+import contextvars
+from collections import OrderedDict, deque
+
+from config import (
+    GEMINI_RPM, GEMINI_TPM, GEMINI_OUTPUT_TOKEN_ESTIMATE, GEMINI_IMAGE_TOKENS,
+    GEMINI_QUEUE_TIMEOUTS
+)
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, most urgent first
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+# User the current script run (or worker thread copying its context) acts for
+_current_user = contextvars.ContextVar('gemini_user', default=None)
+
+
+def set_current_user(user_id):
+    """Attribute Gemini calls made from this context to user_id for fair queuing"""
+    _current_user.set(user_id)
+
+
+def estimate_tokens(text='', images=0, output_tokens=GEMINI_OUTPUT_TOKEN_ESTIMATE):
+    """Rough token cost of a request: ~4 characters per token plus images and expected output"""
+    return len(text or '') // 4 + images * GEMINI_IMAGE_TOKENS + output_tokens
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a request waited longer than its queue timeout"""
+
+
+class TokenBucket:
+    """Continuously refilling bucket of `per_minute` units, holding at most one minute's worth"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount units are available (0 if they are now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        """Return over-estimated units (or charge more when amount is negative)"""
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Ticket:
+    __slots__ = ('user', 'priority', 'tokens', 'enqueued', 'admitted')
+
+    def __init__(self, user, priority, tokens):
+        self.user = user
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.admitted = None
+
+
+class GeminiRateLimiter:
+    """
+    Process-wide admission control for the shared Gemini API key.
+
+    Every call site acquires a ticket before calling the API. A ticket needs one
+    unit from the requests-per-minute bucket and its estimated tokens from the
+    tokens-per-minute bucket; settle() corrects the token charge once the
+    response reports its real usage. Waiting requests are served strictly by
+    priority class (interactive before background) and round-robin across users
+    within a class, so one user's burst cannot starve the others. A 429 seen by
+    any caller can pause all admissions through report_throttled().
+    """
+
+    def __init__(self, rpm=GEMINI_RPM, tpm=GEMINI_TPM, queue_timeouts=None):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.queue_timeouts = dict(GEMINI_QUEUE_TIMEOUTS if queue_timeouts is None else queue_timeouts)
+        # priority -> OrderedDict(user -> deque of waiting tickets); dict order is the round-robin order
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+        self._waits = {priority: deque(maxlen=1000) for priority in PRIORITIES}
+        self.stats = {
+            'admitted': 0,
+            'timed_out': 0,
+            'throttled': 0,
+            'max_queue_depth': 0,
+            'max_wait': 0.0
+        }
+
+    def _depth(self):
+        return sum(len(waiting) for queue in self._queues.values() for waiting in queue.values())
+
+    def _head(self):
+        """Next ticket to admit: first waiting user of the most urgent non-empty class"""
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            if queue:
+                return next(iter(queue.values()))[0]
+        return None
+
+    def _dequeue(self, ticket):
+        queue = self._queues[ticket.priority]
+        waiting = queue[ticket.user]
+        waiting.remove(ticket)
+        if not waiting:
+            del queue[ticket.user]
+        elif ticket.admitted is not None:
+            # Served: this user goes to the back of the rotation
+            queue.move_to_end(ticket.user)
+
+    def acquire(self, tokens, priority=INTERACTIVE, user=None, timeout=None):
+        """
+        Block until the request may be sent and return its Ticket.
+        Raises RateLimitTimeout after timeout seconds (default per priority class).
+        """
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority {priority!r}")
+        user = _current_user.get() if user is None else user
+        timeout = self.queue_timeouts.get(priority) if timeout is None else timeout
+        ticket = Ticket(user, priority, tokens)
+        deadline = ticket.enqueued + timeout if timeout is not None else None
+
+        with self._cond:
+            self._queues[priority].setdefault(user, deque()).append(ticket)
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self._depth())
+            while True:
+                now = time.monotonic()
+                delay = None
+                if self._head() is ticket:
+                    delay = max(
+                        self._blocked_until - now,
+                        self.requests.wait_time(1, now),
+                        self.tokens.wait_time(tokens, now)
+                    )
+                    if delay <= 0:
+                        self.requests.take(1, now)
+                        self.tokens.take(tokens, now)
+                        ticket.admitted = now
+                        self._dequeue(ticket)
+                        self._record_wait(ticket)
+                        self._cond.notify_all()
+                        return ticket
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._dequeue(ticket)
+                        self.stats['timed_out'] += 1
+                        self._cond.notify_all()
+                        raise RateLimitTimeout(
+                            f"Gemini request queued {now - ticket.enqueued:.1f}s without quota"
+                        )
+                    delay = remaining if delay is None else min(delay, remaining)
+                self._cond.wait(delay)
+
+    def _record_wait(self, ticket):
+        waited = ticket.admitted - ticket.enqueued
+        self._waits[ticket.priority].append(waited)
+        self.stats['admitted'] += 1
+        self.stats['max_wait'] = max(self.stats['max_wait'], waited)
+
+    def settle(self, ticket, actual_tokens):
+        """Replace a ticket's estimated token charge with the usage the API reported"""
+        if ticket is None or not actual_tokens:
+            return
+        with self._cond:
+            self.tokens.give_back(ticket.tokens - actual_tokens)
+            ticket.tokens = actual_tokens
+            self._cond.notify_all()
+
+    def report_throttled(self, retry_after=1.0):
+        """Hold all admissions for retry_after seconds after the API returned a quota error"""
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            self.stats['throttled'] += 1
+        logger.warning(f"Gemini quota error; pausing requests for {retry_after:.1f}s")
+
+    def get_stats(self):
+        """Admission counters plus current queue depth and wait times per priority class"""
+        with self._cond:
+            stats = dict(self.stats)
+            stats['queue_depth'] = {
+                priority: sum(len(waiting) for waiting in self._queues[priority].values())
+                for priority in PRIORITIES
+            }
+            stats['waiting_users'] = len({user for queue in self._queues.values() for user in queue})
+            for priority, waits in self._waits.items():
+                ordered = sorted(waits)
+                stats[f'{priority}_wait_mean'] = sum(ordered) / len(ordered) if ordered else 0.0
+                stats[f'{priority}_wait_p95'] = ordered[int(len(ordered) * 0.95)] if ordered else 0.0
+        return stats
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """The limiter shared by every Gemini call site in this process"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = GeminiRateLimiter()
+    return _limiter
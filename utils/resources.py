@@ -0,0 +1,171 @@
+import atexit
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceRegistry:
+    """
+    Process-wide registry of shared, thread-safe service objects.
+
+    Each resource is registered with a factory and an optional close function.
+    The first get() creates the instance; every Streamlit session and thread
+    after that receives the same object. invalidate() drops an instance (and
+    closes it) so the next get() builds a fresh one, e.g. after the food CSV
+    or the database file was replaced; shutdown() closes everything.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.RLock()
+        self.stats = {'created': 0, 'hits': 0, 'invalidated': 0}
+
+    def register(self, name, factory, close=None):
+        """Register how to build (and optionally close) a named resource"""
+        with self._lock:
+            self._factories[name] = (factory, close)
+
+    def get(self, name, *args):
+        """Shared instance for name (and factory arguments), created on first use"""
+        key = (name, args)
+        instance = self._instances.get(key)
+        if instance is not None:
+            self.stats['hits'] += 1
+            return instance
+        with self._lock:
+            instance = self._instances.get(key)
+            if instance is None:
+                factory, _ = self._factories[name]
+                instance = factory(*args)
+                self._instances[key] = instance
+                self.stats['created'] += 1
+                logger.info(f"Created shared resource {name}")
+            else:
+                self.stats['hits'] += 1
+            return instance
+
+    def invalidate(self, name=None):
+        """Drop and close the instances of one resource (or all of them when name is None)"""
+        with self._lock:
+            keys = [key for key in self._instances if name is None or key[0] == name]
+            dropped = [(key[0], self._instances.pop(key)) for key in keys]
+            self.stats['invalidated'] += len(dropped)
+        for resource_name, instance in dropped:
+            _, close = self._factories[resource_name]
+            if close:
+                try:
+                    close(instance)
+                except Exception as e:
+                    logger.error(f"Error closing shared resource {resource_name}: {str(e)}")
+
+    def shutdown(self):
+        """Close every live instance (registered to run at interpreter exit)"""
+        self.invalidate()
+
+    def live(self):
+        """Names of the resources that currently have an instance"""
+        with self._lock:
+            return sorted({key[0] for key in self._instances})
+
+
+def _food_db():
+    from .food_db import FoodDatabase
+    return FoodDatabase()
+
+
+def _db_manager():
+    from .db_manager import DatabaseManager
+    return DatabaseManager()
+
+
+def _workout_db():
+    from .workout_db import WorkoutDatabase
+    return WorkoutDatabase()
+
+
+def _ai_cache():
+    from .ai_cache import AIResponseCache
+    return AIResponseCache()
+
+
+def _ai_trainer(api_key):
+    from .ai_trainer import AITrainer
+    return AITrainer(api_key)
+
+
+def _vision_cache():
+    from .image_cache import ImageAnalysisCache
+    return ImageAnalysisCache()
+
+
+def _food_classifier():
+    from .food_classifier import FoodClassifier
+    return FoodClassifier(get_food_db())
+
+
+def _job_queue():
+    from .job_queue import JobQueue
+    from .ai_jobs import JOB_HANDLERS, JOB_COMMITS
+    queue = JobQueue()
+    for kind, handler in JOB_HANDLERS.items():
+        queue.register(kind, handler, commit=JOB_COMMITS.get(kind))
+    queue.start()
+    return queue
+
+
+registry = ResourceRegistry()
+registry.register('food_db', _food_db)
+registry.register('db_manager', _db_manager)
+registry.register('workout_db', _workout_db, close=lambda db: db.close())
+registry.register('ai_cache', _ai_cache)
+registry.register('ai_trainer', _ai_trainer, close=lambda trainer: trainer.transport.close())
+registry.register('vision_cache', _vision_cache)
+registry.register('food_classifier', _food_classifier)
+registry.register('job_queue', _job_queue, close=lambda queue: queue.shutdown())
+atexit.register(registry.shutdown)
+
+
+def get_food_db():
+    """Shared FoodDatabase (read-only after load)"""
+    return registry.get('food_db')
+
+
+def get_db_manager():
+    """Shared DatabaseManager (connections come from its pool)"""
+    return registry.get('db_manager')
+
+
+def get_workout_db():
+    """Shared WorkoutDatabase (calls are serialized on its connection lock)"""
+    return registry.get('workout_db')
+
+
+def get_ai_cache():
+    """Shared persistent cache of Gemini responses"""
+    return registry.get('ai_cache')
+
+
+def get_ai_trainer(api_key=None):
+    """Shared AITrainer for an API key (defaults to GEMINI_API_KEY); None if no key is set"""
+    api_key = api_key or os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        return None
+    return registry.get('ai_trainer', api_key)
+
+
+def get_job_queue():
+    """Shared background JobQueue with its workers running"""
+    return registry.get('job_queue')
+
+
+def get_vision_cache():
+    """Shared perceptual-hash cache of Food Vision analyses"""
+    return registry.get('vision_cache')
+
+
+def get_food_classifier():
+    """Shared on-device FoodClassifier (model built on first prediction)"""
+    return registry.get('food_classifier')
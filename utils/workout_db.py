@@ -1,14 +1,175 @@
 import sqlite3
+import threading
+import weakref
+import atexit
+import time
 from datetime import datetime
 import json
+import logging
+from functools import wraps
+
+from config import EXERCISE_LOG_BUFFER_ROWS, EXERCISE_LOG_BUFFER_SECONDS
+from .db_storage import connect, retry_on_locked
+from .db_migrations import Migration, apply_migrations
+from . import workout_stats
+from .cache_policy import cached, invalidate
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'fitness_data.db'
+
+# Ordered schema migrations for fitness_data.db, applied at startup
+WORKOUT_MIGRATIONS = [
+    Migration(1, 'indexes for exercise lookups, program days and set history', [
+        'CREATE INDEX IF NOT EXISTS idx_exercises_name ON exercises (name)',
+        'CREATE INDEX IF NOT EXISTS idx_workout_days_program ON workout_days (program_id, day_number)',
+        'CREATE INDEX IF NOT EXISTS idx_workout_exercises_day_order ON workout_exercises (workout_day_id, order_in_workout)',
+        'CREATE INDEX IF NOT EXISTS idx_exercise_logs_exercise ON exercise_logs (exercise_id, workout_log_id)',
+        'CREATE INDEX IF NOT EXISTS idx_exercise_logs_workout_log ON exercise_logs (workout_log_id)',
+        'CREATE INDEX IF NOT EXISTS idx_workout_logs_date ON workout_logs (date)'
+    ]),
+    Migration(2, 'materialized workout statistics', workout_stats.create_stats_tables),
+    Migration(3, 'separate NULL and empty exercise count buckets', workout_stats.recreate_exercise_counts),
+    Migration(4, 'background job that imported each program', [
+        'ALTER TABLE workout_programs ADD COLUMN source_job_id INTEGER',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_workout_programs_source_job ON workout_programs (source_job_id) '
+        'WHERE source_job_id IS NOT NULL'
+    ]),
+]
+
+# Queries on the request path that must be served by an index (see db_migrations.find_table_scans)
+WORKOUT_HOT_QUERIES = {
+    'get_workout_days': ('SELECT * FROM workout_days WHERE program_id = ?', (1,)),
+    'get_workout_exercises': ('''
+        SELECT we.*, e.name, e.muscle_group, e.equipment
+        FROM workout_exercises we
+        JOIN exercises e ON we.exercise_id = e.id
+        WHERE we.workout_day_id = ?
+        ORDER BY we.order_in_workout
+    ''', (1,)),
+    'get_exercise_progress': ('''
+        SELECT wl.date, MAX(el.weight), MAX(el.reps)
+        FROM exercise_logs el
+        JOIN workout_logs wl ON el.workout_log_id = wl.id
+        JOIN exercises e ON el.exercise_id = e.id
+        WHERE e.name = ?
+        GROUP BY wl.date
+        ORDER BY wl.date
+    ''', ('Squats',)),
+    'exercise_by_name': ('SELECT id FROM exercises WHERE name = ?', ('Squats',)),
+    'workouts_this_month': ("SELECT COUNT(*) FROM workout_logs WHERE date >= date('now', 'start of month')", ()),
+}
+
+# Columns an exercise set must provide as numbers before it is buffered
+EXERCISE_SET_FIELDS = ('workout_log_id', 'exercise_id', 'set_number', 'reps', 'weight')
+
+def synchronized(method):
+    """Serialize calls on the instance lock; one WorkoutDatabase connection is shared by all threads"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class ExerciseSetBuffer:
+    """
+    Write-behind buffer for exercise_logs. Sets accumulate in memory and are
+    written with one executemany transaction once max_rows is reached, when the
+    oldest buffered set is max_age seconds old, on flush(), or at interpreter exit.
+    """
+
+    def __init__(self, db, max_rows=EXERCISE_LOG_BUFFER_ROWS, max_age=EXERCISE_LOG_BUFFER_SECONDS):
+        self.db = db
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self._rows = []
+        self._lock = threading.Lock()
+        self._timer = None
+        self._oldest = None
+        _live_buffers.add(self)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, log_data):
+        """Buffer one set; flushes immediately if a threshold has been crossed"""
+        with self._lock:
+            self._rows.append(dict(log_data))
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._rows) >= self.max_rows
+            expired = time.monotonic() - self._oldest >= self.max_age
+            if not full and not expired and self._timer is None:
+                self._timer = threading.Timer(self.max_age, self._flush_quietly)
+                self._timer.daemon = True
+                self._timer.start()
+        if full or expired:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered set in a single transaction; returns the number written"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            rows, self._rows = self._rows, []
+            self._oldest = None
+            if not rows:
+                return 0
+            try:
+                self.db.log_exercise_sets(rows)
+            except Exception:
+                # The transaction was rolled back: keep the sets (every user's)
+                # so the next flush writes them
+                self._rows = rows + self._rows
+                self._oldest = time.monotonic()
+                # Retry after max_age even if no further sets arrive
+                self._timer = threading.Timer(self.max_age, self._flush_quietly)
+                self._timer.daemon = True
+                self._timer.start()
+                raise
+        return len(rows)
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception(f"Error flushing buffered exercise sets; {len(self)} kept for the next flush")
+
+    def close(self):
+        """Flush outstanding sets and checkpoint the WAL so they survive shutdown"""
+        if self.db.conn is None:
+            return
+        self.flush()
+        self.db.checkpoint()
+
+
+_live_buffers = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_buffers_at_exit():
+    for buffer in list(_live_buffers):
+        try:
+            buffer.close()
+        except Exception:
+            logger.exception(f"Error flushing exercise sets at shutdown; {len(buffer)} sets lost")
+
 
 class WorkoutDatabase:
     def __init__(self):
-        self.conn = sqlite3.connect('fitness_data.db', check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn = connect(DB_PATH)
         self.create_tables()
+        self.set_buffer = ExerciseSetBuffer(self)
 
     def create_tables(self):
-        cursor = self.conn.cursor()
+        self._create_schema(self.conn)
+        apply_migrations(self.conn, WORKOUT_MIGRATIONS)
+
+    @staticmethod
+    def _create_schema(conn):
+        cursor = conn.cursor()
         
         # Exercise Library Table
         cursor.execute('''
@@ -127,8 +288,10 @@ class WorkoutDatabase:
         )
         ''')
 
-        self.conn.commit()
+        conn.commit()
 
+    @synchronized
+    @retry_on_locked
     def add_exercise(self, exercise_data):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -146,8 +309,11 @@ class WorkoutDatabase:
             exercise_data.get('is_custom', False)
         ))
         self.conn.commit()
+        invalidate('exercise_library')
         return cursor.lastrowid
 
+    @cached('exercise_library')
+    @synchronized
     def get_exercises(self, muscle_group=None, equipment=None):
         cursor = self.conn.cursor()
         query = 'SELECT * FROM exercises'
@@ -168,6 +334,8 @@ class WorkoutDatabase:
         columns = [description[0] for description in cursor.description]
         return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
+    @synchronized
+    @retry_on_locked
     def create_workout_program(self, program_data):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -187,15 +355,22 @@ class WorkoutDatabase:
         self.conn.commit()
         return cursor.lastrowid
 
+    @synchronized
+    @retry_on_locked
     def add_workout_day(self, program_id, day_data):
         cursor = self.conn.cursor()
         cursor.execute('''
         INSERT INTO workout_days (program_id, day_number, name)
         VALUES (?, ?, ?)
         ''', (program_id, day_data['day_number'], day_data['name']))
+        day_id = cursor.lastrowid
+        workout_stats.record_day_numbers(cursor, [day_data['day_number']])
         self.conn.commit()
-        return cursor.lastrowid
+        invalidate('workout_stats')
+        return day_id
 
+    @synchronized
+    @retry_on_locked
     def add_workout_exercise(self, day_id, exercise_data):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -216,6 +391,8 @@ class WorkoutDatabase:
         ))
         self.conn.commit()
 
+    @synchronized
+    @retry_on_locked
     def log_workout(self, workout_data):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -232,16 +409,39 @@ class WorkoutDatabase:
             workout_data.get('rating', None)
         ))
         log_id = cursor.lastrowid
+        workout_stats.record_workout(
+            cursor, workout_data['date'], workout_data['start_time'], workout_data['end_time']
+        )
         self.conn.commit()
+        invalidate('workout_stats')
         return log_id
 
+    @synchronized
+    @retry_on_locked
     def log_exercise_set(self, log_data):
         cursor = self.conn.cursor()
         cursor.execute('''
         INSERT INTO exercise_logs (workout_log_id, exercise_id, set_number,
                                  reps, weight, rpe, notes)
         VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        ''', self._exercise_log_row(log_data))
+        workout_stats.record_sets(cursor, [log_data['exercise_id']])
+        self.conn.commit()
+        invalidate('workout_stats')
+
+    @staticmethod
+    def _validate_exercise_set(log_data):
+        """Raise ValueError for a set that could not be inserted"""
+        missing = [field for field in EXERCISE_SET_FIELDS if log_data.get(field) is None]
+        if missing:
+            raise ValueError(f"Exercise set is missing {', '.join(missing)}")
+        for field in EXERCISE_SET_FIELDS:
+            if not isinstance(log_data[field], (int, float)) or isinstance(log_data[field], bool):
+                raise ValueError(f"Exercise set field {field} must be a number, got {log_data[field]!r}")
+
+    @staticmethod
+    def _exercise_log_row(log_data):
+        return (
             log_data['workout_log_id'],
             log_data['exercise_id'],
             log_data['set_number'],
@@ -249,9 +449,44 @@ class WorkoutDatabase:
             log_data['weight'],
             log_data.get('rpe'),
             log_data.get('notes', '')
-        ))
-        self.conn.commit()
+        )
+
+    @synchronized
+    @retry_on_locked
+    def log_exercise_sets(self, sets):
+        """Insert many exercise sets with one executemany in a single transaction"""
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany('''
+            INSERT INTO exercise_logs (workout_log_id, exercise_id, set_number,
+                                     reps, weight, rpe, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [self._exercise_log_row(log_data) for log_data in sets])
+            workout_stats.record_sets(cursor, [log_data['exercise_id'] for log_data in sets])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        invalidate('workout_stats')
+
+    def queue_exercise_set(self, log_data):
+        """Add a set to the write-behind buffer instead of committing it immediately"""
+        # The buffer is shared by every session, so a bad set is rejected here
+        # rather than failing the batched insert for everyone
+        self._validate_exercise_set(log_data)
+        self.set_buffer.add(log_data)
 
+    def flush_exercise_sets(self):
+        """Write all buffered sets now (call at the end of a workout)"""
+        return self.set_buffer.flush()
+
+    @synchronized
+    def checkpoint(self, mode='TRUNCATE'):
+        """Fold the WAL into the database file so committed data is durable on disk"""
+        return self.conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+
+    @synchronized
+    @retry_on_locked
     def add_progress_photo(self, photo_data):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -264,6 +499,8 @@ class WorkoutDatabase:
         ))
         self.conn.commit()
 
+    @synchronized
+    @retry_on_locked
     def add_body_measurements(self, measurement_data):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -283,18 +520,180 @@ class WorkoutDatabase:
         ))
         self.conn.commit()
 
+    def _exercise_ids_by_name(self, cursor, names):
+        """Map exercise names to their lowest existing id, querying in chunks"""
+        ids = {}
+        names = list(names)
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            cursor.execute(f'''
+            SELECT name, MIN(id) FROM exercises
+            WHERE name IN ({placeholders})
+            GROUP BY name
+            ''', chunk)
+            ids.update({row[0]: row[1] for row in cursor.fetchall()})
+        return ids
+
+    @staticmethod
+    def _program_ids(cursor, program_id):
+        """The import_program result for a program that is already stored"""
+        cursor.execute('SELECT id FROM workout_days WHERE program_id = ? ORDER BY id', (program_id,))
+        day_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute('''
+        SELECT we.id, e.name, e.id
+        FROM workout_exercises we
+        JOIN workout_days wd ON we.workout_day_id = wd.id
+        JOIN exercises e ON we.exercise_id = e.id
+        WHERE wd.program_id = ?
+        ORDER BY we.id
+        ''', (program_id,))
+        rows = cursor.fetchall()
+        return {
+            'program_id': program_id,
+            'day_ids': day_ids,
+            'exercise_ids': {name: exercise_id for _, name, exercise_id in rows},
+            'workout_exercise_ids': [row[0] for row in rows]
+        }
+
+    @synchronized
+    @retry_on_locked
+    def import_program(self, program_data, source_job_id=None):
+        """
+        Save a generated program with all of its days and exercises in a single
+        transaction. Exercises are matched to existing rows by name and only
+        missing ones are inserted. Returns the ids of everything written.
+
+        With source_job_id the import is idempotent: if that job already
+        imported a program, nothing is written and its ids are returned.
+        """
+        now = datetime.now().isoformat()
+        difficulty = program_data.get('difficulty', 'intermediate')
+        days = program_data.get('workout_days', [])
+        cursor = self.conn.cursor()
+
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+
+            if source_job_id is not None:
+                # Checked under the write lock, so a concurrent retry cannot slip in
+                cursor.execute('SELECT id FROM workout_programs WHERE source_job_id = ?', (source_job_id,))
+                existing = cursor.fetchone()
+                if existing:
+                    ids = self._program_ids(cursor, existing[0])
+                    self.conn.rollback()
+                    return ids
+
+            cursor.execute('''
+            INSERT INTO workout_programs (name, description, created_date, last_modified,
+                                        frequency, duration_weeks, difficulty, tags, source_job_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                program_data['name'],
+                program_data.get('description', ''),
+                now,
+                now,
+                program_data.get('frequency', ''),
+                program_data.get('duration_weeks', 4),
+                difficulty,
+                json.dumps(program_data.get('tags', [])),
+                source_job_id
+            ))
+            program_id = cursor.lastrowid
+
+            cursor.executemany('''
+            INSERT INTO workout_days (program_id, day_number, name)
+            VALUES (?, ?, ?)
+            ''', [(program_id, day['day_number'], day['name']) for day in days])
+            cursor.execute('SELECT id FROM workout_days WHERE program_id = ? ORDER BY id', (program_id,))
+            day_ids = [row[0] for row in cursor.fetchall()]
+            workout_stats.record_day_numbers(cursor, [day['day_number'] for day in days])
+
+            # First occurrence of each exercise name supplies the row for new exercises
+            new_exercises = {}
+            for day in days:
+                for ex in day.get('exercises', []):
+                    new_exercises.setdefault(ex['name'], ex)
+
+            exercise_ids = self._exercise_ids_by_name(cursor, new_exercises)
+            missing = [name for name in new_exercises if name not in exercise_ids]
+            if missing:
+                cursor.executemany('''
+                INSERT INTO exercises (name, description, muscle_group, equipment,
+                                     difficulty, instructions, video_url, is_custom)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [(
+                    name,
+                    new_exercises[name].get('description', ''),
+                    new_exercises[name].get('muscle_group')
+                    or (new_exercises[name].get('target_muscles') or ['Unknown'])[0],
+                    new_exercises[name].get('equipment', 'Unknown'),
+                    difficulty,
+                    new_exercises[name].get('notes', ''),
+                    '',
+                    False
+                ) for name in missing])
+                exercise_ids.update(self._exercise_ids_by_name(cursor, missing))
+
+            workout_exercise_rows = []
+            for day_id, day in zip(day_ids, days):
+                for position, ex in enumerate(day.get('exercises', []), 1):
+                    workout_exercise_rows.append((
+                        day_id,
+                        exercise_ids[ex['name']],
+                        ex['sets'],
+                        json.dumps(ex['reps']),
+                        ex.get('rest_seconds', 60),
+                        ex.get('notes', ''),
+                        ex.get('order', position),
+                        ex.get('is_superset', False),
+                        ex.get('superset_group', None)
+                    ))
+            cursor.executemany('''
+            INSERT INTO workout_exercises (workout_day_id, exercise_id, sets, reps,
+                                         rest_seconds, notes, order_in_workout,
+                                         is_superset, superset_group)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', workout_exercise_rows)
+
+            workout_exercise_ids = []
+            if day_ids:
+                placeholders = ', '.join('?' for _ in day_ids)
+                cursor.execute(f'''
+                SELECT id FROM workout_exercises
+                WHERE workout_day_id IN ({placeholders})
+                ORDER BY id
+                ''', day_ids)
+                workout_exercise_ids = [row[0] for row in cursor.fetchall()]
+
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        invalidate('workout_stats', 'exercise_library')
+
+        return {
+            'program_id': program_id,
+            'day_ids': day_ids,
+            'exercise_ids': exercise_ids,
+            'workout_exercise_ids': workout_exercise_ids
+        }
+
+    @synchronized
     def get_workout_programs(self):
         cursor = self.conn.cursor()
         cursor.execute('SELECT * FROM workout_programs')
         columns = [description[0] for description in cursor.description]
         return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
+    @synchronized
     def get_workout_days(self, program_id):
         cursor = self.conn.cursor()
         cursor.execute('SELECT * FROM workout_days WHERE program_id = ?', (program_id,))
         columns = [description[0] for description in cursor.description]
         return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
+    @synchronized
     def get_workout_exercises(self, day_id):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -307,13 +706,16 @@ class WorkoutDatabase:
         columns = [description[0] for description in cursor.description]
         return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
+    @synchronized
+    @retry_on_locked
     def delete_program(self, program_id):
         """Delete a workout program and all related data."""
         cursor = self.conn.cursor()
         
         # First, get all workout days for this program
-        cursor.execute('SELECT id FROM workout_days WHERE program_id = ?', (program_id,))
-        day_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute('SELECT id, day_number FROM workout_days WHERE program_id = ?', (program_id,))
+        days = cursor.fetchall()
+        day_ids = [row[0] for row in days]
         
         # Delete workout exercises for each day
         for day_id in day_ids:
@@ -321,98 +723,36 @@ class WorkoutDatabase:
         
         # Delete workout days
         cursor.execute('DELETE FROM workout_days WHERE program_id = ?', (program_id,))
+        workout_stats.record_day_numbers(
+            cursor, [row[1] for row in days if row[1] is not None], delta=-1
+        )
         
         # Delete the program itself
         cursor.execute('DELETE FROM workout_programs WHERE id = ?', (program_id,))
         
         self.conn.commit()
+        invalidate('workout_stats')
 
+    @cached('workout_stats')
+    @synchronized
     def get_workout_statistics(self):
         """Get comprehensive workout statistics for visualization."""
-        cursor = self.conn.cursor()
-        
-        # Get basic stats
-        cursor.execute('SELECT COUNT(*) FROM workout_logs')
-        total_workouts = cursor.fetchone()[0]
-        
-        if total_workouts == 0:
-            return None
-            
-        # Get workouts this month
-        cursor.execute('''
-            SELECT COUNT(*) FROM workout_logs 
-            WHERE date >= date('now', 'start of month')
-        ''')
-        workouts_this_month = cursor.fetchone()[0]
-        
-        # Calculate average duration
-        cursor.execute('''
-            SELECT AVG(
-                (strftime('%s', end_time) - strftime('%s', start_time)) / 60
-            ) FROM workout_logs
-        ''')
-        avg_duration = round(cursor.fetchone()[0] or 0)
-        
-        # Calculate consistency (percentage of planned workouts completed)
-        cursor.execute('''
-            SELECT COUNT(DISTINCT date) * 100.0 / 
-            (SELECT COUNT(DISTINCT day_number) FROM workout_days)
-            FROM workout_logs
-            WHERE date >= date('now', '-30 days')
-        ''')
-        consistency = round(cursor.fetchone()[0] or 0)
-        
-        # Get weekly workout frequency
-        cursor.execute('''
-            SELECT strftime('%W', date) as week, COUNT(*) as workouts
-            FROM workout_logs
-            WHERE date >= date('now', '-12 weeks')
-            GROUP BY week
-            ORDER BY week
-        ''')
-        weekly_frequency = [{'week': row[0], 'workouts': row[1]} 
-                          for row in cursor.fetchall()]
-        
-        # Get muscle group distribution
-        cursor.execute('''
-            SELECT e.muscle_group, COUNT(*) as count
-            FROM exercise_logs el
-            JOIN exercises e ON el.exercise_id = e.id
-            GROUP BY e.muscle_group
-        ''')
-        muscle_groups = [{'muscle_group': row[0], 'count': row[1]} 
-                        for row in cursor.fetchall()]
-        
-        # Get exercise type distribution
-        cursor.execute('''
-            SELECT e.equipment as type, COUNT(*) as count
-            FROM exercise_logs el
-            JOIN exercises e ON el.exercise_id = e.id
-            GROUP BY e.equipment
-        ''')
-        exercise_types = [{'type': row[0], 'count': row[1]} 
-                         for row in cursor.fetchall()]
-        
-        # Get list of exercises for progress tracking
-        cursor.execute('''
-            SELECT DISTINCT e.name
-            FROM exercise_logs el
-            JOIN exercises e ON el.exercise_id = e.id
-            ORDER BY e.name
-        ''')
-        available_exercises = [row[0] for row in cursor.fetchall()]
-        
-        return {
-            'total_workouts': total_workouts,
-            'workouts_this_month': workouts_this_month,
-            'avg_duration': avg_duration,
-            'consistency': consistency,
-            'weekly_frequency': weekly_frequency,
-            'muscle_groups': muscle_groups,
-            'exercise_types': exercise_types,
-            'available_exercises': available_exercises
-        }
+        return workout_stats.read(self.conn)
+
+    @synchronized
+    @retry_on_locked
+    def rebuild_workout_statistics(self):
+        """Recompute the materialized statistics from the raw workout and set logs."""
+        try:
+            self.conn.execute('BEGIN IMMEDIATE')
+            workout_stats.rebuild(self.conn)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        invalidate('workout_stats')
 
+    @synchronized
     def get_exercise_progress(self, exercise_name):
         """Get progress data for a specific exercise."""
         cursor = self.conn.cursor()
@@ -439,5 +779,17 @@ class WorkoutDatabase:
             'reps': row[2]
         } for row in results]
 
+    def close(self):
+        """Flush buffered sets and close the connection; safe to call more than once"""
+        if getattr(self, 'conn', None) is None:
+            return
+        try:
+            self.set_buffer.close()
+        except Exception:
+            logger.exception(f"Error flushing exercise sets on close; {len(self.set_buffer)} sets lost")
+        with self.lock:
+            self.conn.close()
+            self.conn = None
+
     def __del__(self):
-        self.conn.close() 
\ No newline at end of file
+        self.close()
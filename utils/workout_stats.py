@@ -0,0 +1,206 @@
+from collections import Counter
+
+# Rollup tables behind WorkoutDatabase.get_workout_statistics. They are kept in
+# step with workout_logs, exercise_logs and workout_days by the write methods of
+# WorkoutDatabase, inside the same transaction as the write itself.
+STATS_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS stats_workouts_daily (
+        date TEXT PRIMARY KEY,
+        workouts INTEGER NOT NULL DEFAULT 0,
+        duration_minutes INTEGER NOT NULL DEFAULT 0,
+        timed_workouts INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stats_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_workouts INTEGER NOT NULL DEFAULT 0,
+        duration_minutes INTEGER NOT NULL DEFAULT 0,
+        timed_workouts INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    # value is stored as '' for a NULL column (a NULL cannot take part in the
+    # upsert's conflict target); is_null keeps NULL and '' as separate buckets,
+    # as the GROUP BY over the raw logs does
+    '''
+    CREATE TABLE IF NOT EXISTS stats_exercise_counts (
+        kind TEXT NOT NULL,
+        value TEXT NOT NULL,
+        is_null INTEGER NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (kind, value, is_null)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stats_day_numbers (
+        day_number INTEGER PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0
+    )
+    '''
+]
+
+# Minutes between HH:MM start/end times, matching the original AVG() expression
+DURATION_SQL = "(strftime('%s', ?) - strftime('%s', ?)) / 60"
+
+# Which exercises column feeds each stats_exercise_counts kind
+EXERCISE_COUNT_KINDS = {
+    'muscle_group': 'muscle_group',
+    'equipment': 'equipment',
+    'exercise': 'name'
+}
+
+
+def record_workout(cursor, date, start_time, end_time):
+    """Add one logged workout to the daily and total rollups"""
+    cursor.execute(f'SELECT {DURATION_SQL}', (end_time, start_time))
+    duration = cursor.fetchone()[0]
+    timed = 0 if duration is None else 1
+    duration = duration or 0
+
+    cursor.execute('''
+    INSERT INTO stats_workouts_daily (date, workouts, duration_minutes, timed_workouts)
+    VALUES (?, 1, ?, ?)
+    ON CONFLICT (date) DO UPDATE SET
+        workouts = workouts + 1,
+        duration_minutes = duration_minutes + excluded.duration_minutes,
+        timed_workouts = timed_workouts + excluded.timed_workouts
+    ''', (date, duration, timed))
+    cursor.execute('''
+    INSERT INTO stats_totals (id, total_workouts, duration_minutes, timed_workouts)
+    VALUES (1, 1, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        total_workouts = total_workouts + 1,
+        duration_minutes = duration_minutes + excluded.duration_minutes,
+        timed_workouts = timed_workouts + excluded.timed_workouts
+    ''', (duration, timed))
+
+
+def record_sets(cursor, exercise_ids):
+    """Add logged sets to the muscle group, equipment and exercise name counts"""
+    per_exercise = Counter(exercise_ids)
+    for kind, column in EXERCISE_COUNT_KINDS.items():
+        cursor.executemany(f'''
+        INSERT INTO stats_exercise_counts (kind, value, is_null, count)
+        SELECT ?, IFNULL({column}, ''), {column} IS NULL, ? FROM exercises WHERE id = ?
+        ON CONFLICT (kind, value, is_null) DO UPDATE SET count = count + excluded.count
+        ''', [(kind, count, exercise_id) for exercise_id, count in per_exercise.items()])
+
+
+def record_day_numbers(cursor, day_numbers, delta=1):
+    """Track how many program days use each day number (consistency denominator)"""
+    cursor.executemany('''
+    INSERT INTO stats_day_numbers (day_number, count) VALUES (?, ?)
+    ON CONFLICT (day_number) DO UPDATE SET count = count + excluded.count
+    ''', [(day_number, delta * count) for day_number, count in Counter(day_numbers).items()
+          if day_number is not None])
+    cursor.execute('DELETE FROM stats_day_numbers WHERE count <= 0')
+
+
+def create_stats_tables(conn):
+    """Create the rollup tables and fill them from the raw logs"""
+    for statement in STATS_TABLES:
+        conn.execute(statement)
+    rebuild(conn)
+
+
+def recreate_exercise_counts(conn):
+    """Rebuild stats_exercise_counts with the is_null key column (NULL and '' counted apart)"""
+    conn.execute('DROP TABLE IF EXISTS stats_exercise_counts')
+    for statement in STATS_TABLES:
+        conn.execute(statement)
+    rebuild(conn)
+
+
+def rebuild(conn):
+    """Recompute every rollup from workout_logs, exercise_logs and workout_days"""
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM stats_workouts_daily')
+    cursor.execute('DELETE FROM stats_totals')
+    cursor.execute('DELETE FROM stats_exercise_counts')
+    cursor.execute('DELETE FROM stats_day_numbers')
+
+    duration = "(strftime('%s', end_time) - strftime('%s', start_time)) / 60"
+    cursor.execute(f'''
+    INSERT INTO stats_workouts_daily (date, workouts, duration_minutes, timed_workouts)
+    SELECT date, COUNT(*), IFNULL(SUM({duration}), 0), COUNT({duration})
+    FROM workout_logs
+    GROUP BY date
+    ''')
+    cursor.execute(f'''
+    INSERT INTO stats_totals (id, total_workouts, duration_minutes, timed_workouts)
+    SELECT 1, COUNT(*), IFNULL(SUM({duration}), 0), COUNT({duration})
+    FROM workout_logs
+    ''')
+    for kind, column in EXERCISE_COUNT_KINDS.items():
+        cursor.execute(f'''
+        INSERT INTO stats_exercise_counts (kind, value, is_null, count)
+        SELECT ?, IFNULL(e.{column}, ''), e.{column} IS NULL, COUNT(*)
+        FROM exercise_logs el
+        JOIN exercises e ON el.exercise_id = e.id
+        GROUP BY e.{column}
+        ''', (kind,))
+    cursor.execute('''
+    INSERT INTO stats_day_numbers (day_number, count)
+    SELECT day_number, COUNT(*) FROM workout_days
+    WHERE day_number IS NOT NULL
+    GROUP BY day_number
+    ''')
+
+
+def read(conn):
+    """Build the get_workout_statistics result from the rollup tables"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT total_workouts, duration_minutes, timed_workouts FROM stats_totals WHERE id = 1')
+    totals = cursor.fetchone()
+    if not totals or totals[0] == 0:
+        return None
+    total_workouts, duration_minutes, timed_workouts = totals
+
+    cursor.execute('''
+    SELECT
+        (SELECT IFNULL(SUM(workouts), 0) FROM stats_workouts_daily
+         WHERE date >= date('now', 'start of month')),
+        (SELECT COUNT(*) FROM stats_workouts_daily
+         WHERE date >= date('now', '-30 days') AND workouts > 0) * 100.0 /
+        (SELECT COUNT(*) FROM stats_day_numbers WHERE count > 0)
+    ''')
+    workouts_this_month, consistency = cursor.fetchone()
+
+    cursor.execute('''
+    SELECT strftime('%W', date) as week, SUM(workouts)
+    FROM stats_workouts_daily
+    WHERE date >= date('now', '-12 weeks')
+    GROUP BY week
+    ORDER BY week
+    ''')
+    weekly_frequency = [{'week': row[0], 'workouts': row[1]} for row in cursor.fetchall()]
+
+    # NULL first, then by value: the order GROUP BY gives over the raw logs
+    cursor.execute('''
+    SELECT kind, value, is_null, count FROM stats_exercise_counts
+    WHERE count > 0
+    ORDER BY kind, is_null DESC, value
+    ''')
+    counts = {kind: [] for kind in EXERCISE_COUNT_KINDS}
+    for kind, value, is_null, count in cursor.fetchall():
+        counts[kind].append((None if is_null else value, count))
+
+    return {
+        'total_workouts': total_workouts,
+        'workouts_this_month': workouts_this_month,
+        'avg_duration': round(duration_minutes / timed_workouts) if timed_workouts else 0,
+        'consistency': round(consistency or 0),
+        'weekly_frequency': weekly_frequency,
+        'muscle_groups': [{'muscle_group': value, 'count': count} for value, count in counts['muscle_group']],
+        'exercise_types': [{'type': value, 'count': count} for value, count in counts['equipment']],
+        'available_exercises': [value for value, _ in counts['exercise']]
+    }
+
+
+if __name__ == '__main__':
+    from .workout_db import WorkoutDatabase
+    db = WorkoutDatabase()
+    db.rebuild_workout_statistics()
+    stats = db.get_workout_statistics()
+    print(f"Rebuilt workout statistics: {stats['total_workouts'] if stats else 0} workouts")